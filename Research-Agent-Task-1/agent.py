@@ -1,21 +1,120 @@
-from pydantic_ai import Agent
 from pydantic import BaseModel
-from typing import List
+from typing import List, TYPE_CHECKING
+from dataclasses import dataclass, field
 import asyncio  
 import os
-import logfire
+import sys
+import time
 from dotenv import load_dotenv
-from serpapi import GoogleSearch
+import metrics
+import telemetry
+from sources import SourceIndex, source_key
+from tool_format import budget, clip, fit, source_entry
 
-load_dotenv(override=True)
-logfire.configure()
-logfire.instrument_pydantic_ai()
+if __name__ == "__main__":
+    # Run as a script: this is the entry point, and ResearchOutput below is the first model
+    telemetry.disable_logfire_plugin()
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-SERP_API_KEY = os.getenv("SERP_API_KEY")
+if TYPE_CHECKING:
+    from pydantic_ai import RunContext
 
-if GOOGLE_API_KEY:
-    os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
+# Built on first use so importing this module stays cheap (see get_agent and friends)
+_agent = None
+_search_client = None
+_page_fetcher = None
+_answer_cache = None
+_credibility = None
+_router = None
+_env_loaded = False
+
+def load_env():
+    """Load the .env file once, on first use rather than at import."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv(override=True)
+        _env_loaded = True
+
+def search_backend() -> str:
+    """"serpapi" (default) or "local" (BM25 over the index built with local_search.py)."""
+    load_env()
+    return os.getenv("SEARCH_BACKEND", "serpapi").lower()
+
+def get_search_client():
+    """Shared async search client (one keep-alive pool, result cache and rate limiter for all tools)."""
+    global _search_client
+    if _search_client is None and search_backend() == "local":
+        from local_search import LocalSearchClient
+        _search_client = LocalSearchClient.from_env()
+        metrics.expose_stats("local_search", _search_client.stats)
+    elif _search_client is None:
+        from rate_limit import search_limiter
+        from search_cache import SearchCache
+        from search_client import SearchClient
+        _search_client = SearchClient(
+            api_key=os.getenv("SERP_API_KEY"), cache=SearchCache.from_env(), limiter=search_limiter
+        )
+        metrics.expose_stats("search_cache", _search_client.cache.stats, _search_client.cache.hit_rate)
+        metrics.expose_stats("singleflight", _search_client.singleflight.stats)
+        metrics.expose_stats("resilience", _search_client.resilience.stats)
+    return _search_client
+
+def get_page_fetcher():
+    """Streaming page fetcher behind extract_content (documents cached by URL with revalidation)."""
+    global _page_fetcher
+    if _page_fetcher is None:
+        load_env()
+        from page_fetcher import PageFetcher
+        _page_fetcher = PageFetcher.from_env()
+    return _page_fetcher
+
+def get_answer_cache():
+    """Local similarity cache of completed answers, so paraphrased questions can skip or seed a run."""
+    global _answer_cache
+    if _answer_cache is None:
+        load_env()
+        from answer_cache import AnswerCache
+        _answer_cache = AnswerCache.from_env()
+        metrics.expose_stats("answer_cache", _answer_cache.stats, _answer_cache.hit_rate)
+    return _answer_cache
+
+def get_credibility():
+    """Domain reputation engine the tools use to rank, tag and prune sources (table compiled once)."""
+    global _credibility
+    if _credibility is None:
+        load_env()
+        from credibility import CredibilityEngine
+        _credibility = CredibilityEngine.from_env()
+        metrics.expose_stats("credibility", _credibility.stats)
+    return _credibility
+
+def get_router():
+    """Complexity router choosing the model and tool set for each question (see router.py)."""
+    global _router
+    if _router is None:
+        load_env()
+        from router import Router
+        _router = Router.from_env(full_model=model)
+    return _router
+
+async def aclose_clients():
+    """Close whichever shared clients were built and record cache stats."""
+    global _search_client, _page_fetcher, _answer_cache
+    if _search_client is not None:
+        await _search_client.aclose()
+        if search_backend() == "local":
+            telemetry.info("local search stats", **_search_client.stats)
+        else:
+            telemetry.info("search cache stats", hit_rate=_search_client.cache.hit_rate(), **_search_client.cache.stats)
+            telemetry.info("search resilience stats", **_search_client.resilience.stats)
+            _search_client.cache.close()
+        _search_client = None
+    if _page_fetcher is not None:
+        await _page_fetcher.aclose()
+        _page_fetcher = None
+    if _answer_cache is not None:
+        telemetry.info("answer cache stats", entries=len(_answer_cache), **_answer_cache.stats)
+        _answer_cache.close()
+        _answer_cache = None
 
 system_prompt = """
 You are a Research Agent specialized in gathering, analyzing, and presenting factual information.
@@ -46,6 +145,17 @@ TOOL USAGE:
 - Prefer tool calls over internal reasoning when external data is required.
 - If a tool fails or lacks sufficient information, state the limitation clearly—never guess or fabricate.
 
+TOOL RESULT FORMAT:
+- search_web() and fact_check() return "S3 [tag] Title — snippet" lines, each followed by its URL.
+  S3 is a source ID that stays the same for the whole session; a source shown before appears as "S3 (seen)".
+  extract_content() also accepts a source ID instead of a URL.
+  "answer:", "kg:" and "related:" are Google's direct answer, knowledge graph and related questions.
+  "…" and "(+N more omitted for length)" mark trimmed text and results.
+- fact_check() and extract_content() tags: [high] fact-checker, wire service, government or academic;
+  [medium] established media, reference and other sources; [low] user-generated content;
+  [contra] evidence against the claim. Results are already ranked by source credibility, and
+  low-value sites (social media and the like) are dropped. Cross-reference findings before concluding.
+
 SOURCE EVALUATION:
 - Assess credibility (official/government sources > academic > established media > independent blogs).
 - Check publication dates for relevance and potential outdatedness.
@@ -54,7 +164,7 @@ SOURCE EVALUATION:
 
 OUTPUT REQUIREMENTS:
 - Provide a concise summary in the 'summary' field
-- List all sources used in the 'sources' field
+- List all sources used in the 'sources' field, by source ID (e.g. "S3") or URL
 - Extract 3-5 main findings or facts in the 'key_points' field
 - Assign confidence level based on source quality and consensus
 - Include complete research details in 'raw_text' field
@@ -82,151 +192,131 @@ Use the results from the tools to populate each field.
 """
 
 class ResearchOutput(BaseModel):
+    # Field order is the order the model streams them in: summary, then key points, then sources
     summary: str
-    sources: List[str]
     key_points: List[str]
+    sources: List[str]
     confidence: str  # "high", "medium", "low"
     raw_text: str = ""  # Full research text for reference
 
+@dataclass
+class ResearchDeps:
+    """Per-session state shared by the tools (pass a fresh one for each independent session)."""
+    sources: SourceIndex = field(default_factory=SourceIndex)
+    route: str = "full"  # router.py route of the current run, which decides the tools offered
+
 model = "google-gla:gemini-2.5-flash"
-agent = Agent[None, ResearchOutput](
-    model=model,
-    system_prompt=system_prompt
-)
-
-@agent.tool_plain
-async def search_web(query: str) -> str:
-    print("[TOOL LOG] Searching the web for:", query)
-    logfire.info("search_web called", query=query)
-    """Search the web for current information on the given query using SerpAPI."""
+
+@metrics.instrument_tool
+async def search_web(ctx: "RunContext[ResearchDeps]", query: str) -> str:
+    """Search the web (or the local index, if configured) for current information on the given query."""
+    telemetry.info("search_web called", query=query)
     
     try:
         # Use SerpAPI for real Google search results
-        print("[DEBUG] Using SerpAPI for Google search")
         search_params = {
             "q": query,
-            "api_key": SERP_API_KEY,
             "num": 5,  # Get top 5 results
             "gl": "us",  # Country
             "hl": "en"   # Language
         }
         
-        search = GoogleSearch(search_params)
-        results = search.get_dict()
+        results = await get_search_client().search(search_params)
         
-        # Extract and format search results
-        result_parts = []
+        # Compact lines, most useful first, so the token budget trims the least useful
+        snippet_chars = budget("SEARCH_SNIPPET_CHARS", 160)
+        lines = []
         
         # Check for direct answer box
         if "answer_box" in results:
             answer_box = results["answer_box"]
-            if "answer" in answer_box:
-                result_parts.append(f"Direct Answer: {answer_box['answer']}")
-            elif "snippet" in answer_box:
-                result_parts.append(f"Answer Box: {answer_box['snippet']}")
+            answer = answer_box.get("answer") or answer_box.get("snippet")
+            if answer:
+                lines.append(f"answer: {clip(answer, snippet_chars)}")
         
         # Check for knowledge graph
         if "knowledge_graph" in results:
             kg = results["knowledge_graph"]
             if "description" in kg:
-                result_parts.append(f"Knowledge Graph: {kg['description']}")
+                lines.append(f"kg: {clip(kg['description'], snippet_chars)}")
         
-        # Extract organic search results
-        if "organic_results" in results:
-            organic_results = []
-            for result in results["organic_results"][:3]:  # Top 3 results
-                title = result.get("title", "")
-                snippet = result.get("snippet", "")
-                link = result.get("link", "")
-                
-                if title and snippet:
-                    organic_results.append(f"• {title}\n  {snippet}\n  Source: {link}")
-            
-            if organic_results:
-                result_parts.append("Search Results:\n" + "\n\n".join(organic_results))
+        # Extract organic search results, most credible first with low-value sites dropped
+        # (sources already shown this session are listed by ID only)
+        organic = [
+            result for result in results.get("organic_results", [])
+            if result.get("title") and result.get("snippet") and result.get("link")
+        ]
+        for _, result in get_credibility().rank(organic, limit=3, per_site=search_backend() != "local"):  # Top 3 results
+            lines.append(source_entry(ctx.deps.sources, result, snippet_chars))
         
         # Check for related questions
         if "related_questions" in results:
             questions = [q.get("question", "") for q in results["related_questions"][:2]]
-            if questions:
-                result_parts.append(f"Related Questions: {'; '.join(questions)}")
+            if any(questions):
+                lines.append(f"related: {'; '.join(q for q in questions if q)}")
         
-        if result_parts:
-            return "\n\n".join(result_parts)
+        if lines:
+            return fit(lines, budget("SEARCH_WEB_MAX_TOKENS", 350), ctx.deps.sources)
         else:
             return f"Search completed for '{query}' but no detailed results found. Please try different search terms."
             
     except Exception as e:
-        logfire.error("search_web error", error=str(e))
-        print(f"[DEBUG] Search exception: {e}")
-        return f"Search error occurred: {str(e)}. Please try again with a different query."
-
-@agent.tool_plain
-async def extract_content(url: str) -> str:
-    print("[TOOL LOG] Extracting content from:", url)
-    logfire.info("extract_content called", url=url)
-    """Extract content from the given URL using SerpAPI."""
+        telemetry.error("search_web error", error=str(e))
+        metrics.tool_error("search_web")
+        # The search client has already retried; another identical call would only fail again
+        return f"Search unavailable ({str(e)}) after retries. Continue with the information you already have."
+
+@metrics.instrument_tool
+async def extract_content(ctx: "RunContext[ResearchDeps]", url: str) -> str:
+    """Fetch the given URL (or source ID from an earlier result) and extract its readable text content."""
+    telemetry.info("extract_content called", url=url)
     
     try:
-        if SERP_API_KEY:
-            print("[DEBUG] Using SerpAPI for content extraction")
-            
-            # Search for the specific URL to get its content
-            search_params = {
-                "q": f'"{url}"',
-                "api_key": SERP_API_KEY,
-                "num": 3
-            }
-            
-            search = GoogleSearch(search_params)
-            results = search.get_dict()
-            
-            if "organic_results" in results:
-                for result in results["organic_results"]:
-                    if url in result.get("link", ""):
-                        title = result.get("title", "")
-                        snippet = result.get("snippet", "")
-                        if title and snippet:
-                            return f"Page Title: {title}\n\nContent Summary: {snippet}\n\nSource: {url}"
-            
-            # If exact URL not found, try domain search
-            domain = url.split("/")[2]
-            fallback_params = {
-                "q": f'site:{domain}',
-                "api_key": SERP_API_KEY,
-                "num": 2
-            }
-            
-            fallback_search = GoogleSearch(fallback_params)
-            fallback_results = fallback_search.get_dict()
-            
-            if "organic_results" in fallback_results and fallback_results["organic_results"]:
-                result = fallback_results["organic_results"][0]
-                title = result.get("title", "")
-                snippet = result.get("snippet", "")
-                if title and snippet:
-                    return f"Related Page: {title}\n\nContent: {snippet}\n\nNote: Exact URL content not found, showing related content from {domain}"
-            
-            return f"No content could be extracted from {url}"
-        else:
-            return f"SerpAPI key not configured. Cannot extract content from {url}"
+        # Accept a source ID from an earlier result as well as a URL
+        sources = ctx.deps.sources
+        known = sources.get(url.strip("[] "))
+        if known is not None:
+            url = known.url
+        source = sources.add(url)
+        if sources.is_shown(source, "page"):
+            return f"{source.id}: content of {source.url} was already extracted earlier in this session."
+        
+        # Social media and similar low-value pages cost a fetch and many tokens for little evidence
+        credibility = get_credibility()
+        score = credibility.score(source.url)
+        if score < credibility.min_score:
+            return f"{source.id}: {source.url} is a low-credibility source and was not extracted. Use a more authoritative source."
+        
+        # Stream the page itself instead of paying for SerpAPI lookups of it
+        document = None
+        if search_backend() == "local":
+            # Indexed documents are served from the local index, so this works without network access
+            document = await get_search_client().document(url, get_page_fetcher().max_chars)
+        if document is None:
+            document = await get_page_fetcher().fetch(url)
+        
+        if document.text:
+            source.title = source.title or document.title
+            sources.first_showing(source, "page")
+            note = "\n\nNote: Content truncated to the first part of the page." if document.truncated else ""
+            return f"{source.id} [{credibility.tag(score)}] Page Title: {document.title or url}\n\nContent: {document.text}\n\nSource: {source.url}{note}"
+        
+        return f"No content could be extracted from {url}"
                     
     except Exception as e:
-        logfire.error("extract_content error", error=str(e), url=url)
+        telemetry.error("extract_content error", error=str(e), url=url)
+        metrics.tool_error("extract_content")
         return f"Error extracting content from {url}: {str(e)}"
 
-@agent.tool_plain
-async def fact_check(claim: str) -> str:
-    print("[TOOL LOG] Fact-checking claim:", claim)
-    logfire.info("fact_check called", claim=claim)
+@metrics.instrument_tool
+async def fact_check(ctx: "RunContext[ResearchDeps]", claim: str) -> str:
     """Fact-check the given claim using multiple sources and verification strategies."""
+    telemetry.info("fact_check called", claim=claim)
     
     try:
         result_parts = []
         
-        if SERP_API_KEY:
-            print("[DEBUG] Using SerpAPI for comprehensive fact-checking")
-            
+        if get_search_client().api_key:
             # Strategy 1: Search for fact-checking websites
             fact_check_queries = [
                 f'"{claim}" site:snopes.com OR site:factcheck.org OR site:politifact.com',
@@ -234,131 +324,261 @@ async def fact_check(claim: str) -> str:
                 f'"{claim}" debunked OR verified OR false OR true'
             ]
             
-            for i, query in enumerate(fact_check_queries, 1):
-                try:
-                    search_params = {
-                        "q": query,
-                        "api_key": SERP_API_KEY,
-                        "num": 3,
-                        "gl": "us",
-                        "hl": "en"
-                    }
-                    
-                    search = GoogleSearch(search_params)
-                    results = search.get_dict()
-                    
-                    if "organic_results" in results and results["organic_results"]:
-                        strategy_results = []
-                        for result in results["organic_results"][:2]:
-                            title = result.get("title", "")
-                            snippet = result.get("snippet", "")
-                            link = result.get("link", "")
-                            
-                            if title and snippet:
-                                # Determine credibility based on domain
-                                domain = link.split('/')[2] if '/' in link else link
-                                credibility = "HIGH" if any(trusted in domain.lower() for trusted in 
-                                    ['snopes.com', 'factcheck.org', 'politifact.com', 'reuters.com', 'bbc.com', 'gov']) else "MEDIUM"
-                                
-                                strategy_results.append(f"  • {title}\n    {snippet}\n    Source: {link} (Credibility: {credibility})")
-                        
-                        if strategy_results:
-                            result_parts.append(f"Verification Strategy {i}:\n" + "\n\n".join(strategy_results))
-                            
-                    await asyncio.sleep(0.1)  # Rate limiting
-                    
-                except Exception as e:
-                    print(f"[DEBUG] Fact-check strategy {i} failed: {e}")
-                    continue
+            search_params_list = [
+                {"q": query, "num": 3, "gl": "us", "hl": "en"}
+                for query in fact_check_queries
+            ]
             
             # Strategy 2: Search for contradicting information
-            try:
-                contradiction_query = f'"{claim}" NOT true OR false OR incorrect OR myth'
-                search_params = {
-                    "q": contradiction_query,
-                    "api_key": SERP_API_KEY,
-                    "num": 2
-                }
-                
-                search = GoogleSearch(search_params)
-                results = search.get_dict()
+            contradiction_query = f'"{claim}" NOT true OR false OR incorrect OR myth'
+            search_params_list.append({"q": contradiction_query, "num": 2})
+            
+            # Fan out all strategies at once; the shared limiter in search_client keeps us under quota
+            all_results = await asyncio.gather(
+                *(get_search_client().search(params) for params in search_params_list),
+                return_exceptions=True
+            )
+            
+            # Merge in strategy order regardless of completion order, listing each source once
+            snippet_chars = budget("FACT_CHECK_SNIPPET_CHARS", 160)
+            credibility = get_credibility()
+            seen_keys = set()
+            verification, contradictions = [], []
+            for i, results in enumerate(all_results, 1):
+                if isinstance(results, Exception):
+                    telemetry.debug("fact_check strategy failed", strategy=i, error=str(results))
+                    continue
                 
-                if "organic_results" in results and results["organic_results"]:
-                    contradiction_results = []
-                    for result in results["organic_results"]:
-                        title = result.get("title", "")
-                        snippet = result.get("snippet", "")
-                        link = result.get("link", "")
-                        
-                        if title and snippet:
-                            contradiction_results.append(f"  • {title}\n    {snippet}\n    Source: {link}")
+                is_contradiction = i == len(all_results)
+                organic = [
+                    result for result in results.get("organic_results", [])
+                    if result.get("title") and result.get("snippet") and result.get("link")
+                ]
+                # Most credible first, low-value sites dropped; tags come from the domain reputation table
+                for score, result in credibility.rank(
+                    organic, limit=None if is_contradiction else 2, per_site=search_backend() != "local"
+                ):
+                    if source_key(result["link"]) in seen_keys:
+                        continue
+                    seen_keys.add(source_key(result["link"]))
                     
-                    if contradiction_results:
-                        result_parts.append("Potential Contradictions Found:\n" + "\n\n".join(contradiction_results))
+                    if is_contradiction:
+                        contradictions.append(result)
+                    else:
+                        verification.append((credibility.tag(score), result))
             
-            except Exception as e:
-                print(f"[DEBUG] Contradiction search failed: {e}")
+            # Interleave so a tight budget still keeps some contradicting evidence
+            contradictions = [("contra", result) for result in contradictions]
+            ordered = verification[:2] + contradictions[:1] + verification[2:] + contradictions[1:]
+            result_parts = [source_entry(ctx.deps.sources, result, snippet_chars, tag) for tag, result in ordered]
         
         else:
             # Fallback to basic search if no SerpAPI
-            print("[DEBUG] Using basic search for fact-checking")
+            telemetry.debug("fact_check falling back to search_web", claim=claim)
             search_query = f"fact check verify: {claim}"
-            search_results = await search_web(search_query)
-            result_parts.append(f"Basic Fact-Check Results:\n{search_results}")
+            result_parts.append(await search_web(ctx, search_query))
         
-        # Compile final response
+        # Compile final response (the tag legend and confidence rubric live in the system prompt)
         if result_parts:
-            confidence_note = "\n\nCONFIDENCE ASSESSMENT:\n"
-            confidence_note += "- HIGH: Information from established fact-checking organizations\n"
-            confidence_note += "- MEDIUM: Information from reputable news sources\n"
-            confidence_note += "- LOW: Information from unverified or biased sources\n\n"
-            confidence_note += "RECOMMENDATION: Cross-reference these findings with multiple authoritative sources before making decisions."
-            
-            return f"FACT-CHECK ANALYSIS FOR: '{claim}'\n\n" + "\n\n".join(result_parts) + confidence_note
+            return fit(result_parts, budget("FACT_CHECK_MAX_TOKENS", 450), ctx.deps.sources)
         else:
             return f"Fact-check for '{claim}': No specific verification results found. Please verify this claim through authoritative fact-checking websites or primary sources."
     
     except Exception as e:
-        logfire.error("fact_check error", error=str(e), claim=claim)
+        telemetry.error("fact_check error", error=str(e), claim=claim)
+        metrics.tool_error("fact_check")
         return f"Error during fact-checking: {str(e)}. Please try again or verify the claim manually through trusted sources."
 
-async def main():
+async def resolve_sources(ctx: "RunContext[ResearchDeps]", output: ResearchOutput) -> ResearchOutput:
+    """Replace source IDs in the output with their URLs and drop duplicate citations."""
+    output.sources = ctx.deps.sources.resolve(output.sources)
+    return output
+
+async def route_tools(ctx: "RunContext[ResearchDeps]", tool_defs: list) -> list:
+    """Offer only the tools of the run's route."""
+    if ctx.deps.route == "full":
+        return tool_defs
+    allowed = get_router().routes[ctx.deps.route].tools
+    return [tool_def for tool_def in tool_defs if tool_def.name in allowed]
+
+def route_instructions(ctx: "RunContext[ResearchDeps]") -> str:
+    """Extra instructions for the run's route (none on the full route)."""
+    if ctx.deps.route == "full":
+        return ""
+    return get_router().routes[ctx.deps.route].instructions
+
+def get_agent():
+    """Build the research agent on first use (loads .env and opt-in Logfire instrumentation)."""
+    global _agent
+    if _agent is None:
+        load_env()
+        telemetry.configure()
+        from pydantic_ai import Agent, RunContext
+
+        # pydantic-ai reads the ctx annotation to tell context-taking functions apart; the
+        # "RunContext[...]" strings cannot be resolved here since RunContext is imported lazily
+        for function in (search_web, extract_content, fact_check, resolve_sources, route_tools, route_instructions):
+            function.__annotations__["ctx"] = RunContext[ResearchDeps]
+        _agent = Agent[ResearchDeps, ResearchOutput](
+            model=model,
+            deps_type=ResearchDeps,
+            output_type=ResearchOutput,
+            system_prompt=system_prompt,
+            instructions=route_instructions,
+            tools=[search_web, extract_content, fact_check],
+            prepare_tools=route_tools,
+        )
+        _agent.output_validator(resolve_sources)
+    return _agent
+
+def print_output(output):
+    """Display a research answer (structured if available)."""
+    if isinstance(output, ResearchOutput):
+        print("\n📌 STRUCTURED OUTPUT")
+        print("-" * 50)
+        print(f"📋 Summary: {output.summary}")
+        print(f"🎯 Confidence: {output.confidence.upper()}")
+        print(f"📚 Sources ({len(output.sources)}): {', '.join(output.sources) if output.sources else 'None provided'}")
+        
+        # Display key points
+        if output.key_points:
+            print(f"🔑 Key Points ({len(output.key_points)}):")
+            for i, point in enumerate(output.key_points, 1):
+                print(f"   {i}. {point}")
+        else:
+            print("🔑 Key Points: None provided")
+        
+        # Show first 300 characters of raw text
+        if output.raw_text:
+            raw_preview = output.raw_text[:300]
+            if len(output.raw_text) > 300:
+                raw_preview += "..."
+            print(f"📄 Raw Text Preview: {raw_preview}\n")
+        
+        print("-" * 50)
+    else:
+        # Fallback to regular output if structured data not available
+        print("Agent: ", output)
+
+def remember_answer(question: str, message_history: list, output):
+    """Cache the answer to a fresh question (follow-ups and low-confidence answers are not reusable)."""
+    if not message_history and isinstance(output, ResearchOutput) and output.confidence.lower() != "low":
+        get_answer_cache().add(question, output.model_dump())
+
+async def run_routed(route, deps: ResearchDeps, run):
+    """Await `run(**run_kwargs)` on `route`; it returns (result, output, ...) for one agent run.
+
+    A simple-route run that fails output validation, stops at the token limit or
+    answers with low confidence is redone on the full route, counting the usage of
+    the discarded attempt. Returns the route that answered, then `run`'s values.
+    """
+    from pydantic_ai.exceptions import UnexpectedModelBehavior
+
+    deps.route = route.name
+    if route.name == "full":
+        return (route, *await run(**route.run_kwargs()))
+    router = get_router()
+    extra = {}
+    try:
+        outcome = await run(**route.run_kwargs())
+    except UnexpectedModelBehavior as e:
+        reason = "invalid output"
+        telemetry.debug("simple route failed", error=str(e))
+    else:
+        reason = router.escalation(outcome[1], outcome[0].new_messages())
+        if reason is None:
+            return (route, *outcome)
+        extra["usage"] = outcome[0].usage()
+    telemetry.info("escalated to the full route", reason=reason)
+    metrics.registry.inc("research_route_escalations_total", reason=reason)
+    # The discarded attempt's tool results never reach the full run, so its sources must be shown again
+    deps.sources.forget_shown()
+    route = router.routes["full"]
+    deps.route = route.name
+    return (route, *await run(**route.run_kwargs(), **extra))
+
+async def main(stream: bool = False):
+    from history import HistoryManager
+    from streaming import run_streamed
+
+    agent = get_agent()
+    router = get_router()
+    metrics.serve_from_env()
     message_history = []
+    history = HistoryManager.from_env()
+    # One source index for the whole REPL session, so repeated URLs keep their IDs
+    deps = ResearchDeps()
     while True:
         message = input("You: ")
         if message.upper() in ["EXIT", "QUIT"]:
             break
+        if message.upper() == "METRICS":
+            print(metrics.registry.summary() or "No metrics recorded yet.")
+            continue
         
-        response = await agent.run(message, message_history=message_history)
+        # Keep the prompt under the history token budget by collapsing older tool output
+        message_history = history.compact(message_history)
+        report = history.last_report
+        if report["saved_tokens"] > 0:
+            print(f"[HISTORY] ~{report['before_tokens']} -> ~{report['after_tokens']} tokens "
+                  f"(saved ~{report['saved_tokens']})")
+            telemetry.info("history compacted", **report)
+            # Earlier tool outputs were summarized away, so show sources in full again
+            deps.sources.forget_shown()
         
-        # Display structured output if available
-        if hasattr(response, 'data') and response.data:
-            print("\n📌 STRUCTURED OUTPUT")
-            print("-" * 50)
-            print(f"📋 Summary: {response.data.summary}")
-            print(f"🎯 Confidence: {response.data.confidence.upper()}")
-            print(f"📚 Sources ({len(response.data.sources)}): {', '.join(response.data.sources) if response.data.sources else 'None provided'}")
-            
-            # Display key points
-            if response.data.key_points:
-                print(f"🔑 Key Points ({len(response.data.key_points)}):")
-                for i, point in enumerate(response.data.key_points, 1):
-                    print(f"   {i}. {point}")
-            else:
-                print("🔑 Key Points: None provided")
-            
-            # Show first 300 characters of raw text
-            if response.data.raw_text:
-                raw_preview = response.data.raw_text[:300]
-                if len(response.data.raw_text) > 300:
-                    raw_preview += "..."
-                print(f"📄 Raw Text Preview: {raw_preview}\n")
-            
-            print("-" * 50)
-        else:
-            # Fallback to regular output if structured data not available
-            print("Agent: ", response.output)
+        # Simple lookups go to a faster model with fewer tools; follow-ups of full research stay full
+        route = router.choose(message, previous=deps.route if message_history else None)
+        telemetry.debug("route chosen", route=route.name, model=str(route.model))
+        
+        # Only a fresh question can be answered from the cache: follow-ups depend on the conversation
+        prompt = message
+        if not message_history:
+            started = time.perf_counter()
+            hit = get_answer_cache().lookup(message)
+            if hit is not None and hit.direct:
+                print(f"⚡ Answered from cache (similarity {hit.score:.2f}, {hit.age_s / 3600:.1f}h old)")
+                print_output(ResearchOutput(**hit.output))
+                telemetry.info("answer cache hit", score=hit.score, lookup_s=time.perf_counter() - started)
+                continue
+            if hit is not None:
+                print(f"[CACHE] Seeding the run with a similar earlier answer (similarity {hit.score:.2f})")
+                prompt = hit.seed_prompt(message)
+        
+        if stream:
+            # Render summary, key points and sources as soon as each is validated
+            async def stream_run(**run_kwargs):
+                # Called again on the full route when run_routed escalates a simple-route answer
+                if deps.route == "full" and route.name != "full":
+                    print("[ROUTER] The quick answer was not good enough; researching in depth")
+                return await run_streamed(agent, prompt, message_history, deps, **run_kwargs)
+
+            route, response, output, timing = await run_routed(route, deps, stream_run)
+            print(f"⏱️ First output: {timing['time_to_first_output_s']}s | Total: {timing['total_s']}s")
+            telemetry.info("research run", streamed=True, route=route.name, **timing)
+            metrics.record_run(response.usage(), timing["total_s"], mode="stream", route=route.name)
+            remember_answer(message, message_history, output)
+            message_history = response.all_messages()
+            continue
+        
+        async def run(**run_kwargs):
+            response = await agent.run(prompt, message_history=message_history, deps=deps, **run_kwargs)
+            return response, response.output
 
+        started = time.perf_counter()
+        route, response, _ = await run_routed(route, deps, run)
+        total = round(time.perf_counter() - started, 3)
+        
+        print_output(response.output)
+        
+        # Without streaming nothing is shown until the run completes
+        print(f"⏱️ First output: {total}s | Total: {total}s")
+        telemetry.info("research run", streamed=False, route=route.name, time_to_first_output_s=total, total_s=total)
+        metrics.record_run(response.usage(), total, mode="interactive", route=route.name)
+
+        remember_answer(message, message_history, response.output)
         message_history = response.all_messages()
 
-asyncio.run(main())
\ No newline at end of file
+    await aclose_clients()
+
+if __name__ == "__main__":
+    asyncio.run(main(stream="--stream" in sys.argv[1:]))
\ No newline at end of file
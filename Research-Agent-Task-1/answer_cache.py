@@ -0,0 +1,369 @@
+import functools
+import json
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "could", "did", "do", "does",
+    "for", "from", "how", "i", "in", "is", "it", "its", "me", "of", "on", "or", "please", "tell",
+    "that", "the", "their", "there", "this", "to", "was", "what", "whats", "when", "where", "which",
+    "who", "why", "will", "with", "would", "you",
+}
+WORD = re.compile(r"[a-z0-9]+")
+# Entries added since the last index rebuild are scored by brute force; rebuild past this many
+MAX_PENDING = 512
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _stem(word: str) -> str:
+    """Very light suffix stripping so "vaccines"/"vaccine" and "studies"/"study" share a term."""
+    for suffix in ("ies", "ing", "ed", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix) and not word.endswith("ss"):
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, lightly stemmed words of `text` without stopwords."""
+    return [_stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def hashed_terms(text: str, dims: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique hashed unigram and bigram ids of `text` and their counts."""
+    words = tokenize(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return np.zeros(0, np.uint32), np.zeros(0, np.float32)
+    # crc32 rather than hash(): ids must be stable across processes for the persisted index
+    ids = np.fromiter((zlib.crc32(feature.encode()) % dims for feature in features), np.uint32, len(features))
+    terms, counts = np.unique(ids, return_counts=True)
+    return terms, counts.astype(np.float32)
+
+
+def _pack(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Store strings as one UTF-8 byte array plus offsets."""
+    encoded = [text.encode() for text in texts]
+    offsets = np.zeros(len(encoded) + 1, np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return np.frombuffer(b"".join(encoded), np.uint8), offsets
+
+
+def _unpack(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    output: dict
+    score: float
+    age_s: float
+    direct: bool  # similar enough to return as-is; otherwise only good for seeding a run
+
+    def seed_prompt(self, question: str) -> str:
+        """Prompt that hands the agent the earlier answer to verify and update instead of starting over."""
+        earlier = {key: self.output.get(key) for key in ("summary", "key_points", "sources", "confidence")}
+        return (
+            f"{question}\n\n"
+            f"A cached answer to a similar earlier question (\"{self.question}\", similarity {self.score:.2f}, "
+            f"{self.age_s / 3600:.1f}h old) is below. Verify and update it with the tools where needed "
+            f"rather than researching from scratch:\n{json.dumps(earlier, ensure_ascii=False)}"
+        )
+
+
+class AnswerCache:
+    """Offline similarity cache of completed research answers.
+
+    Questions are embedded as hashed unigram+bigram TF-IDF vectors. Lookups
+    score all entries at once through an inverted index (one contiguous
+    postings array sorted by term), so they stay sub-millisecond at 100k
+    entries. A match at or above `threshold` is returned as the answer; one
+    at or above `seed_threshold` can seed a new run. Entries older than `ttl`
+    seconds are ignored. The index is persisted as flat NumPy arrays in an
+    `.npz` file.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 86400.0,
+        threshold: float = 0.9,
+        seed_threshold: float = 0.6,
+        max_entries: int = 100_000,
+        dims: int = 2 ** 20,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.threshold = threshold
+        self.seed_threshold = seed_threshold
+        self.max_entries = max_entries
+        self.dims = dims
+        self.stats = {"lookups": 0, "hits": 0, "seeds": 0, "misses": 0, "added": 0}
+
+        # Forward index (CSR) of the indexed entries: entry i owns terms[indptr[i]:indptr[i + 1]]
+        self._indptr = np.zeros(1, np.int64)
+        self._terms = np.zeros(0, np.uint32)
+        self._counts = np.zeros(0, np.float32)
+        # Entries added since the last rebuild (flat, like the forward index), scored by brute force
+        self._pending = 0
+        self._pending_terms = np.zeros(0, np.uint32)
+        self._pending_counts = np.zeros(0, np.float32)
+        self._pending_docs = np.zeros(0, np.int64)
+        self._created: List[float] = []  # -inf marks a replaced entry
+        self._questions: List[str] = []
+        self._answers: List[str] = []  # ResearchOutput JSON
+        self._signatures: Dict[bytes, int] = {}  # term set -> entry, to replace repeats of a question
+        self._dirty = False
+        self._build_index()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        """Build a cache configured from ANSWER_CACHE_* environment variables (empty path = memory only)."""
+        return cls(
+            path=os.getenv("ANSWER_CACHE_PATH", ".answer_cache.npz") or None,
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9")),
+            seed_threshold=float(os.getenv("ANSWER_CACHE_SEED_THRESHOLD", "0.6")),
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "100000")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered directly from the cache (seeded runs not included)."""
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def lookup(self, question: str) -> Optional[CachedAnswer]:
+        """Best fresh match for `question` at or above `seed_threshold`, if any."""
+        self.stats["lookups"] += 1
+        best = self._best(*hashed_terms(question, self.dims), self.seed_threshold) if self.ttl > 0 else None
+        if best is None:
+            self.stats["misses"] += 1
+            return None
+        index, score = best
+        direct = score >= self.threshold
+        self.stats["hits" if direct else "seeds"] += 1
+        return CachedAnswer(
+            question=self._questions[index],
+            output=json.loads(self._answers[index]),
+            score=score,
+            age_s=time.time() - self._created[index],
+            direct=direct,
+        )
+
+    def add(self, question: str, output: dict):
+        """Store a completed answer, replacing any entry whose question has exactly the same terms."""
+        if self.ttl <= 0:
+            return
+        terms, counts = hashed_terms(question, self.dims)
+        previous = self._signatures.get(terms.tobytes())
+        if previous is not None:
+            self._created[previous] = -np.inf
+        self._signatures[terms.tobytes()] = len(self._questions)
+        self._pending_terms = np.concatenate([self._pending_terms, terms])
+        self._pending_counts = np.concatenate([self._pending_counts, counts])
+        self._pending_docs = np.concatenate([self._pending_docs, np.full(len(terms), self._pending)])
+        self._pending += 1
+        self._created.append(time.time())
+        self._questions.append(question)
+        self._answers.append(json.dumps(output, ensure_ascii=False))
+        self.stats["added"] += 1
+        self._dirty = True
+        if len(self._questions) > self.max_entries + MAX_PENDING:
+            self._compact()
+        elif self._pending > MAX_PENDING:
+            self._build_index()
+
+    def save(self):
+        """Write the index to `path` if it changed (atomically, via a temporary file)."""
+        if not self.path or not self._dirty or self.ttl <= 0:
+            return
+        self._compact()
+        question_blob, question_offsets = _pack(self._questions)
+        answer_blob, answer_offsets = _pack(self._answers)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f, dims=np.int64(self.dims), indptr=self._indptr, terms=self._terms,
+                counts=self._counts.astype(np.uint16), created=np.array(self._created, np.float64),
+                question_blob=question_blob, question_offsets=question_offsets,
+                answer_blob=answer_blob, answer_offsets=answer_offsets,
+            )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def close(self):
+        self.save()
+
+    def _best(self, terms: np.ndarray, counts: np.ndarray, min_score: float) -> Optional[Tuple[int, float]]:
+        """Index and cosine score of the most similar fresh entry scoring at least `min_score`."""
+        if not self._questions:
+            return None
+        weights = (1 + np.log(counts)) * self._idf[terms]
+        norm = np.sqrt(np.dot(weights, weights))
+        if not norm:
+            return None
+        weights /= norm
+
+        candidates, scores = self._score_indexed(terms, weights, min_score)
+        if self._pending:
+            first_pending = len(self._questions) - self._pending
+            candidates = np.concatenate([candidates, np.arange(first_pending, len(self._questions))])
+            scores = np.concatenate([scores, self._score_pending(terms, weights)])
+
+        cutoff = time.time() - self.ttl
+        for _ in range(8):
+            if not len(scores):
+                return None
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < min_score:
+                return None
+            if self._created[candidates[best]] >= cutoff:
+                return int(candidates[best]), score
+            scores[best] = 0.0  # expired or replaced: try the next best
+        return None
+
+    def _score_indexed(self, terms: np.ndarray, weights: np.ndarray, min_score: float):
+        """Candidate entries from the inverted index and their cosine scores.
+
+        MaxScore pruning: an entry can only reach `min_score` if it contains at
+        least one "essential" query term, so only those terms' postings are
+        scanned; the remaining common terms are looked up for the candidates only,
+        dropping candidates as soon as they can no longer reach `min_score`.
+        """
+        empty = np.zeros(0, np.int64), np.zeros(0)
+        if not len(self._uniq_terms):
+            return empty
+        position = np.minimum(np.searchsorted(self._uniq_terms, terms), len(self._uniq_terms) - 1)
+        present = self._uniq_terms[position] == terms
+        position, weights = position[present], weights[present]
+        starts, ends = self._uniq_starts[position], self._uniq_starts[position + 1]
+
+        # Terms whose best possible contributions add up to less than min_score are non-essential
+        upper = weights * self._uniq_max[position]
+        order = np.argsort(upper)
+        non_essential = np.cumsum(upper[order]) < min_score
+        essential, optional = order[~non_essential], order[non_essential]
+        if not len(essential):
+            return empty
+
+        lengths = ends - starts
+        if lengths[essential].sum() * 4 >= lengths.sum():
+            # Pruning would keep most postings anyway: score all of them with one dense accumulator
+            spans = range(len(starts))
+            docs = np.concatenate([self._post_docs[starts[i]:ends[i]] for i in spans])
+            doc_weights = np.concatenate([self._post_weights[starts[i]:ends[i]] * weights[i] for i in spans])
+            dense = np.bincount(docs, weights=doc_weights, minlength=len(self._questions) - self._pending)
+            candidates = np.flatnonzero(dense >= min_score)
+            return candidates, dense[candidates]
+
+        docs = np.concatenate([self._post_docs[starts[i]:ends[i]] for i in essential])
+        doc_weights = np.concatenate([self._post_weights[starts[i]:ends[i]] * weights[i] for i in essential])
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=doc_weights, minlength=len(candidates))
+        # Optional terms, most valuable first: before each one, drop candidates that can no
+        # longer reach min_score even if they contain every remaining optional term
+        remaining = upper[optional].sum()
+        for i in optional[::-1]:
+            keep = scores + remaining >= min_score
+            candidates, scores = candidates[keep], scores[keep]
+            if not len(candidates):
+                break
+            remaining -= upper[i]
+            # Postings of a term are sorted by entry, so membership is a binary search
+            postings = self._post_docs[starts[i]:ends[i]]
+            found = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            hit = postings[found] == candidates
+            scores[hit] += weights[i] * self._post_weights[starts[i] + found[hit]]
+        return candidates, scores
+
+    def _score_pending(self, terms: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Cosine scores of the entries added since the last rebuild."""
+        entry_terms, docs = self._pending_terms, self._pending_docs
+        entry_weights = (1 + np.log(self._pending_counts)) * self._idf[entry_terms]
+        norms = np.sqrt(np.bincount(docs, weights=entry_weights ** 2, minlength=self._pending))
+        norms[norms == 0] = 1.0
+        # Query weight of each entry term (query terms are sorted and unique)
+        position = np.minimum(np.searchsorted(terms, entry_terms), len(terms) - 1)
+        matched = terms[position] == entry_terms
+        contribution = np.where(matched, weights[position], 0.0) * entry_weights
+        return (np.bincount(docs, weights=contribution, minlength=self._pending) / norms).astype(np.float32)
+
+    def _load(self, path: str):
+        with np.load(path) as data:
+            if int(data["dims"]) != self.dims:
+                return  # written with another hashing width: start over
+            self._indptr = data["indptr"].astype(np.int64)
+            self._terms = data["terms"].astype(np.uint32)
+            self._counts = data["counts"].astype(np.float32)
+            self._created = data["created"].tolist()
+            self._questions = _unpack(data["question_blob"], data["question_offsets"])
+            self._answers = _unpack(data["answer_blob"], data["answer_offsets"])
+        self._compact()
+
+    def _compact(self):
+        """Drop replaced and expired entries, then the oldest beyond `max_entries`, and rebuild."""
+        self._merge_pending()
+        keep = np.zeros(len(self._questions), bool)
+        keep[np.flatnonzero(np.array(self._created) >= time.time() - self.ttl)[-self.max_entries:]] = True
+        if not keep.all():
+            lengths = np.diff(self._indptr)
+            rows = np.repeat(keep, lengths)
+            self._terms = self._terms[rows]
+            self._counts = self._counts[rows]
+            self._indptr = np.concatenate([[0], np.cumsum(lengths[keep])]).astype(np.int64)
+            self._created = [created for created, kept in zip(self._created, keep) if kept]
+            self._questions = [question for question, kept in zip(self._questions, keep) if kept]
+            self._answers = [answer for answer, kept in zip(self._answers, keep) if kept]
+            self._dirty = True
+        self._build_index()
+        self._signatures = {
+            self._terms[self._indptr[i]:self._indptr[i + 1]].tobytes(): i for i in range(len(self._questions))
+        }
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        self._terms = np.concatenate([self._terms, self._pending_terms])
+        self._counts = np.concatenate([self._counts, self._pending_counts])
+        lengths = np.bincount(self._pending_docs, minlength=self._pending)
+        self._indptr = np.concatenate([self._indptr, self._indptr[-1] + np.cumsum(lengths)])
+        self._pending = 0
+        self._pending_terms = self._pending_terms[:0]
+        self._pending_counts = self._pending_counts[:0]
+        self._pending_docs = self._pending_docs[:0]
+
+    def _build_index(self):
+        """Fold pending entries in and recompute IDF and the term-sorted postings."""
+        self._merge_pending()
+        n = len(self._questions)
+        docs = np.repeat(np.arange(n), np.diff(self._indptr))
+        df = np.bincount(self._terms, minlength=self.dims)
+        self._idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        weights = (1 + np.log(self._counts)) * self._idf[self._terms]
+        norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n))
+        norms[norms == 0] = 1.0
+
+        # Stable sort keeps each term's postings in entry order
+        order = np.argsort(self._terms, kind="stable")
+        post_terms = self._terms[order]
+        self._post_docs = docs[order]
+        self._post_weights = (weights / norms[docs])[order].astype(np.float32)
+        starts = np.flatnonzero(np.concatenate([[True], post_terms[1:] != post_terms[:-1]])) \
+            if len(post_terms) else np.zeros(0, np.int64)
+        self._uniq_terms = post_terms[starts]
+        self._uniq_starts = np.append(starts, len(post_terms))
+        self._uniq_max = (
+            np.maximum.reduceat(self._post_weights, starts) if len(starts) else np.zeros(0, np.float32)
+        )
@@ -0,0 +1,171 @@
+"""Batch research runner: JSONL queries in, JSONL ResearchOutput records out.
+
+Usage:
+    python batch.py queries.jsonl results.jsonl --concurrency 8
+    python batch.py queries.jsonl results.jsonl --metrics metrics.prom   # also dump metrics at the end
+
+Each input line is {"id": ..., "query": ...} (the id defaults to the line
+number). Results are appended to the output file as soon as each query
+finishes, and completed ids are recorded in `<output>.checkpoint` so an
+interrupted run can be restarted with the same command and skip finished work.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from typing import List
+
+import metrics
+import telemetry
+
+telemetry.disable_logfire_plugin()  # before agent defines its models
+
+from agent import ResearchDeps, aclose_clients, get_agent, get_answer_cache, get_router, run_routed  # noqa: E402
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def load_checkpoint(path: str) -> set:
+    """Return the ids already completed by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def read_queries(path: str):
+    """Yield (id, query) pairs from a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get("id", line_number)), record["query"]
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 8) -> dict:
+    """Run every pending query through the agent with bounded concurrency."""
+    checkpoint_path = output_path + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    latencies: List[float] = []
+    stats = {"completed": 0, "failed": 0, "skipped": 0, "cached": 0}
+
+    # Bounded queue so huge input files are streamed rather than loaded up front
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    agent = get_agent()
+    answer_cache = get_answer_cache()
+    router = get_router()
+
+    with open(output_path, "a", encoding="utf-8") as output_file, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                query_id, query = item
+                started = time.perf_counter()
+                route = None
+                try:
+                    # Paraphrases of an earlier question reuse its answer, or at least seed the run with it
+                    hit = answer_cache.lookup(query)
+                    if hit is not None and hit.direct:
+                        output = hit.output
+                    else:
+                        prompt = hit.seed_prompt(query) if hit is not None else query
+                        deps = ResearchDeps()
+
+                        async def run(**run_kwargs):
+                            response = await agent.run(prompt, deps=deps, **run_kwargs)
+                            return response, response.output
+
+                        route, response, _ = await run_routed(router.choose(query), deps, run)
+                        metrics.record_run(response.usage(), time.perf_counter() - started, mode="batch",
+                                           route=route.name)
+                        output = response.output.model_dump()
+                        if output["confidence"].lower() != "low":
+                            answer_cache.add(query, output)
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"[BATCH] {query_id} failed: {e}", file=sys.stderr)
+                else:
+                    latency = time.perf_counter() - started
+                    latencies.append(latency)
+                    record = {
+                        "id": query_id,
+                        "query": query,
+                        "output": output,
+                        "latency_s": round(latency, 3),
+                    }
+                    if route is not None:
+                        record["route"] = route.name
+                    if hit is not None and hit.direct:
+                        record["cached"] = True
+                        stats["cached"] += 1
+                    # Result first, then checkpoint: a crash in between only repeats this one query
+                    output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output_file.flush()
+                    checkpoint_file.write(query_id + "\n")
+                    checkpoint_file.flush()
+                    stats["completed"] += 1
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for query_id, query in read_queries(input_path):
+            if query_id in done:
+                stats["skipped"] += 1
+                continue
+            await queue.put((query_id, query))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    stats.update({
+        "elapsed_s": round(elapsed, 2),
+        "throughput_qps": round(stats["completed"] / elapsed, 3) if elapsed else 0.0,
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "latency_max_s": round(max(latencies, default=0.0), 3),
+    })
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run research queries from a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"query\"} object per line")
+    parser.add_argument("output", help="JSONL file that results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum queries in flight")
+    parser.add_argument("--metrics", help="write Prometheus-format metrics to this file when done")
+    args = parser.parse_args()
+
+    metrics.serve_from_env()
+
+    try:
+        stats = await run_batch(args.input, args.output, args.concurrency)
+    finally:
+        await aclose_clients()
+
+    print("\n📊 BATCH SUMMARY")
+    print("-" * 50)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    print("-" * 50)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(metrics.registry.render())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
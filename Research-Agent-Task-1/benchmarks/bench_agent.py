@@ -0,0 +1,268 @@
+"""Offline benchmark of the research agent's tool pipeline.
+
+Drives the real `agent` (real tools, search client, cache and page fetcher)
+with a scripted stand-in model and a local fake SerpAPI server, so it runs
+without network access or API keys.
+
+Usage:
+    python benchmarks/bench_agent.py --queries 50 --concurrency 8 --latency 0.05 --error-rate 0.05
+    python benchmarks/bench_agent.py --json results.json --fail-over-p95 2.0
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_serpapi import FakeSerpApi  # noqa: E402
+
+TOPICS = [
+    "quantum computing error correction", "renewable energy storage", "remote work productivity",
+    "electric vehicle battery recycling", "AI safety research", "ocean microplastics",
+    "mRNA vaccine development", "urban heat islands", "semiconductor supply chain", "coral reef bleaching",
+]
+URL_PATTERN = re.compile(r"https?://[^\s)\]]+")
+SOURCE_ID_PATTERN = re.compile(r"\bS\d+\b")
+
+
+def configure_offline_env(server: FakeSerpApi, args):
+    """Point the agent at the fake server before agent.py is imported."""
+    os.environ["SERP_API_ENDPOINT"] = server.url
+    os.environ["SERP_API_KEY"] = "offline-benchmark"
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+    os.environ["SERP_API_RATE"] = str(args.rate)
+    os.environ["SEARCH_CACHE_PATH"] = ""  # memory-only cache, nothing left behind on disk
+    os.environ["SEARCH_CACHE_TTL"] = "3600" if args.cache else "0"
+    # The fake server's pages are on 127.0.0.1, which the fetcher otherwise refuses
+    os.environ["PAGE_FETCH_ALLOW_PRIVATE"] = "1"
+    if args.no_resilience:
+        os.environ["SEARCH_RETRIES"] = "0"
+        os.environ["SEARCH_HEDGE"] = "0"
+    os.environ.setdefault("LOGFIRE_SEND_TO_LOGFIRE", "false")
+    os.environ.setdefault("LOGFIRE_CONSOLE", "false")
+
+
+class ScriptedModel:
+    """Stand-in model that always calls search_web, extract_content, fact_check, then answers.
+
+    The gap between two model calls in a run is the time spent executing the
+    tool requested by the first one, which gives per-tool latency without
+    touching the tools themselves.
+    """
+
+    SCRIPT = ["search_web", "extract_content", "fact_check"]
+
+    def __init__(self):
+        self.tool_latencies = defaultdict(list)
+        self._pending = {}  # prompt -> (tool name, time the call was issued)
+
+    def respond(self, messages, info):
+        from pydantic_ai.messages import ModelRequest, ModelResponse, ToolCallPart, ToolReturnPart, UserPromptPart
+
+        now = time.perf_counter()
+        # Only the current turn matters: everything from the latest user prompt on
+        start = max(
+            i for i, message in enumerate(messages) if isinstance(message, ModelRequest)
+            and any(isinstance(part, UserPromptPart) for part in message.parts)
+        )
+        messages = messages[start:]
+        prompt = next(part.content for part in messages[0].parts if isinstance(part, UserPromptPart))
+        # Prompts look like "[run 7] topic": the run tag keeps concurrent repeats apart
+        query = prompt.split("] ", 1)[1]
+        pending = self._pending.pop(prompt, None)
+        if pending is not None:
+            self.tool_latencies[pending[0]].append(now - pending[1])
+
+        step = sum(isinstance(message, ModelResponse) for message in messages)
+        returns = [
+            part for message in messages if isinstance(message, ModelRequest)
+            for part in message.parts if isinstance(part, ToolReturnPart)
+        ]
+
+        if step < len(self.SCRIPT):
+            tool = self.SCRIPT[step]
+            if tool == "search_web":
+                args = {"query": query}
+            elif tool == "extract_content":
+                # Sources seen earlier in the session only show their ID, which extract_content accepts too
+                text = returns[-1].model_response_str() if returns else ""
+                match = URL_PATTERN.search(text) or SOURCE_ID_PATTERN.search(text)
+                args = {"url": match.group(0).rstrip(".,") if match else "http://127.0.0.1:1/missing"}
+            else:
+                args = {"claim": query}
+            self._pending[prompt] = (tool, time.perf_counter())
+            return ModelResponse(parts=[ToolCallPart(tool, args, tool_call_id=f"call-{step}")])
+
+        sources = sorted({url for part in returns for url in URL_PATTERN.findall(part.model_response_str())})
+        output = {
+            "summary": f"Benchmark answer for {query}",
+            "key_points": [f"Tool output {i}" for i in range(len(returns))],
+            "sources": sources[:5],
+            "confidence": "medium",
+        }
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output, tool_call_id="final")])
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered), math.ceil(pct / 100 * len(ordered))) - 1)]
+
+
+async def run_benchmark(args, server: FakeSerpApi) -> dict:
+    from pydantic_ai.messages import ModelRequest, ModelResponse, ToolCallPart, ToolReturnPart
+    from pydantic_ai.models.function import FunctionModel
+
+    import agent as research_agent
+
+    agent = research_agent.get_agent()
+    search_client = research_agent.get_search_client()
+    scripted = ScriptedModel()
+    queries = [
+        f"[run {i}] {TOPICS[(i % args.unique) % len(TOPICS)]} #{i % args.unique}" for i in range(args.queries)
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, tool_calls, input_tokens, tool_result_chars = [], [], [], []
+    failures = 0
+
+    async def one(query):
+        nonlocal failures
+        async with semaphore:
+            # Each query is a session of --turns follow-ups sharing history and the source index
+            deps = research_agent.ResearchDeps()
+            history = []
+            for turn in range(args.turns):
+                if args.no_source_index:
+                    deps = research_agent.ResearchDeps()
+                prompt = query.replace("]", f".{turn}]", 1)  # same topic every turn, so sources repeat
+                started = time.perf_counter()
+                try:
+                    result = await agent.run(prompt, message_history=history, deps=deps)
+                except Exception:
+                    failures += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+                turn_messages = result.new_messages()
+                calls = [
+                    part for message in turn_messages if isinstance(message, ModelResponse)
+                    for part in message.parts if isinstance(part, ToolCallPart)
+                ]
+                tool_calls.append(sum(part.tool_name != "final_result" for part in calls))
+                input_tokens.append(result.usage().input_tokens)
+                tool_result_chars.append(sum(
+                    len(part.model_response_str()) for message in turn_messages if isinstance(message, ModelRequest)
+                    for part in message.parts if isinstance(part, ToolReturnPart)
+                ))
+                history = result.all_messages()
+
+    # Tools print progress lines; keep them out of the report
+    with agent.override(model=FunctionModel(scripted.respond)), contextlib.redirect_stdout(io.StringIO()):
+        # Warm-up runs pay one-off costs (lazy imports, connection setup) outside the measurement
+        for i in range(args.warmup):
+            await agent.run(f"[warmup {i}] {TOPICS[i % len(TOPICS)]}", deps=research_agent.ResearchDeps())
+        scripted.tool_latencies.clear()
+        for stats in (server.stats, search_client.singleflight.stats, search_client.resilience.stats):
+            for key in stats:
+                stats[key] = 0
+
+        # tracemalloc slows every allocation, so it is opt-in to keep latencies honest
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(query) for query in queries))
+        elapsed = time.perf_counter() - started
+        peak_traced = tracemalloc.get_traced_memory()[1] if args.trace_memory else 0
+        tracemalloc.stop()
+
+    await research_agent.aclose_clients()
+
+    report = {
+        "queries": args.queries,
+        "turns": args.turns,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_qps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "e2e_p50_s": round(percentile(latencies, 50), 4),
+        "e2e_p95_s": round(percentile(latencies, 95), 4),
+        "tool_calls_per_query": round(sum(tool_calls) / len(tool_calls), 2) if tool_calls else 0.0,
+        "input_tokens_per_query": round(sum(input_tokens) / len(input_tokens), 1) if input_tokens else 0.0,
+        "tool_result_chars_per_query": round(sum(tool_result_chars) / len(tool_result_chars), 1) if tool_result_chars else 0.0,
+        "tools": {
+            name: {
+                "calls": len(values),
+                "p50_s": round(percentile(values, 50), 4),
+                "p95_s": round(percentile(values, 95), 4),
+            }
+            for name, values in sorted(scripted.tool_latencies.items())
+        },
+        "peak_traced_mb": round(peak_traced / 2 ** 20, 2) if args.trace_memory else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "search_cache_hit_rate": round(search_client.cache.hit_rate(), 3),
+        "singleflight": dict(search_client.singleflight.stats),
+        "resilience": dict(search_client.resilience.stats),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the research agent offline.")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--unique", type=int, default=1000, help="distinct query variants (lower = more repeats)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=1, help="follow-up turns per query (per-query figures are per turn)")
+    parser.add_argument("--no-source-index", action="store_true", help="fresh source index every turn (no dedup)")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured runs before the benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--rate", type=float, default=0, help="search rate limit (requests/s, 0 = off)")
+    parser.add_argument("--cache", action="store_true", help="enable the search result cache")
+    parser.add_argument("--no-resilience", action="store_true", help="disable search hedging and retries")
+    parser.add_argument("--trace-memory", action="store_true", help="report peak Python allocations (slower)")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--fail-over-p95", type=float, help="exit non-zero if end-to-end p95 exceeds this")
+    args = parser.parse_args()
+
+    server = FakeSerpApi(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+    ).start()
+    configure_offline_env(server, args)
+    try:
+        report = asyncio.run(run_benchmark(args, server))
+    finally:
+        server.stop()
+    report["upstream"] = dict(server.stats)
+
+    print("\n📊 RESEARCH AGENT BENCHMARK")
+    print("-" * 50)
+    print(json.dumps(report, indent=2))
+    print("-" * 50)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if not report["upstream"].get("pages"):
+        # Otherwise extract_content latency is only the cost of the error path
+        print("❌ no pages were fetched; extract_content was not measured")
+        sys.exit(1)
+    if args.fail_over_p95 is not None and report["e2e_p95_s"] > args.fail_over_p95:
+        print(f"❌ p95 {report['e2e_p95_s']}s exceeds {args.fail_over_p95}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Microbenchmark of the semantic answer cache at scale.
+
+Fills an AnswerCache with synthetic questions, persists and reloads it, and
+times lookups of paraphrased questions against the loaded index.
+
+Usage:
+    python benchmarks/bench_answer_cache.py --entries 100000 --lookups 2000
+    python benchmarks/bench_answer_cache.py --fail-over-p99-ms 1.0   # regression gate
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import AnswerCache  # noqa: E402
+from bench_agent import percentile  # noqa: E402
+
+SUBJECTS = [
+    "solar panels", "electric vehicles", "microplastics", "mRNA vaccines", "quantum computers", "coral reefs",
+    "remote work", "semiconductors", "lithium mining", "heat pumps", "wind turbines", "gene therapy",
+    "urban farming", "carbon capture", "nuclear fusion", "antibiotic resistance", "sleep quality", "inflation",
+]
+ASPECTS = [
+    "health effects", "economic impact", "latest research", "environmental cost", "adoption rate",
+    "main risks", "regulation", "history", "future outlook", "public opinion", "efficiency", "supply chain",
+]
+PLACES = ["", "in Europe", "in the US", "in India", "in Africa", "worldwide", "in China", "in Brazil"]
+YEARS = ["", "in 2023", "in 2024", "since 2020", "over the last decade"]
+TEMPLATES = [
+    "What is the {aspect} of {entity} {subject} {place} {year}",
+    "{entity} {subject} {aspect} {place} {year}",
+    "How does {entity} {subject} affect {aspect} {place} {year}",
+]
+
+
+def entity(rng: random.Random, vocab: int) -> str:
+    """A made-up specific name (company, product, place): real questions are rarely all common words."""
+    n = rng.randrange(vocab)
+    return "".join("bcdfghklmnprstvz"[(n >> shift) & 15] + "aeiou"[(n >> shift) % 5] for shift in (0, 4, 8, 12))
+
+
+def question(rng: random.Random, vocab: int) -> str:
+    return rng.choice(TEMPLATES).format(
+        entity=entity(rng, vocab), subject=rng.choice(SUBJECTS), aspect=rng.choice(ASPECTS),
+        place=rng.choice(PLACES), year=rng.choice(YEARS),
+    )
+
+
+def paraphrase(rng: random.Random, text: str) -> str:
+    """Reorder words and drop one, roughly what a user rephrasing a question does."""
+    words = text.replace("?", "").split()
+    if len(words) > 4:
+        words.pop(rng.randrange(len(words)))
+    i = rng.randrange(len(words) - 1)
+    words[i], words[i + 1] = words[i + 1], words[i]
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AnswerCache build, persistence and lookups.")
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--vocab", type=int, default=20000, help="distinct entity names (lower = denser postings)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-over-p99-ms", type=float, help="exit non-zero if lookup p99 exceeds this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = [question(rng, args.vocab) for _ in range(args.entries)]
+    output = {"summary": "cached", "key_points": ["a", "b", "c"], "sources": ["https://example.com"],
+              "confidence": "high"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "answers.npz")
+        cache = AnswerCache(path=path, ttl=3600, max_entries=args.entries)
+        started = time.perf_counter()
+        for text in questions:
+            cache.add(text, output)
+        add_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        cache.save()
+        save_s = time.perf_counter() - started
+        size_mb = os.path.getsize(path) / 2 ** 20
+
+        started = time.perf_counter()
+        cache = AnswerCache(path=path, ttl=3600, max_entries=args.entries)
+        load_s = time.perf_counter() - started
+
+    probes = [paraphrase(rng, rng.choice(questions)) for _ in range(args.lookups)]
+    timings, found = [], 0
+    for probe in probes:
+        started = time.perf_counter()
+        result = cache.lookup(probe)
+        timings.append((time.perf_counter() - started) * 1000)
+        found += result is not None
+
+    p99 = percentile(timings, 99)
+    print("\n📊 ANSWER CACHE BENCHMARK")
+    print("-" * 50)
+    print(f"entries           {len(cache)} ({args.entries - len(cache)} repeated questions replaced)")
+    print(f"add               {add_s:.2f} s total, {add_s / args.entries * 1e6:.1f} µs/entry")
+    print(f"save / load       {save_s:.2f} s / {load_s:.2f} s, {size_mb:.1f} MB on disk")
+    print(f"lookup            p50 {percentile(timings, 50):.3f} ms  p99 {p99:.3f} ms  max {max(timings):.3f} ms")
+    print(f"matched           {found}/{len(probes)} paraphrases ({cache.stats['hits']} direct, "
+          f"{cache.stats['seeds']} seeds)")
+    print("-" * 50)
+    if args.fail_over_p99_ms is not None and p99 > args.fail_over_p99_ms:
+        print(f"❌ lookup p99 {p99:.3f} ms exceeds {args.fail_over_p99_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Microbenchmark of source-credibility scoring and result ranking.
+
+Times the old substring check from fact_check against the reversed-label
+trie (uncached and memoized lookups), with the default reputation table and
+with a large synthetic one, then times ranking a page of search results.
+Also counts the hosts the substring check misclassifies.
+
+Usage:
+    python benchmarks/bench_credibility.py --urls 100000 --table-size 50000
+    python benchmarks/bench_credibility.py --fail-over-us 5   # regression gate (uncached lookup, large table)
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from credibility import DEFAULT_REPUTATION, CredibilityEngine, hostname  # noqa: E402
+
+LEGACY_TRUSTED = ['snopes.com', 'factcheck.org', 'politifact.com', 'reuters.com', 'bbc.com', 'gov']
+
+# Hosts the substring check gets wrong: (host, should be trusted)
+TRICKY = [
+    ("gov.example.com", False), ("governmentfakes.com", False), ("govtech-blog.net", False),
+    ("notreuters.com", False), ("reuters.com.evil.io", False), ("bbc.com-news.info", False),
+    ("www.cdc.gov", True), ("news.bbc.co.uk", True), ("www.gov.uk", True), ("ox.ac.uk", True),
+]
+
+
+def legacy_credibility(link: str) -> str:
+    domain = link.split('/')[2] if '/' in link else link
+    return "high" if any(trusted in domain.lower() for trusted in LEGACY_TRUSTED) else "medium"
+
+
+def synthetic_table(size: int, rng: random.Random) -> dict:
+    table = dict(DEFAULT_REPUTATION)
+    tlds = ["com", "org", "net", "io", "co.uk", "de", "fr"]
+    while len(table) < size:
+        name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 12)))
+        table[f"{name}.{rng.choice(tlds)}"] = round(rng.random(), 2)
+    return table
+
+
+def urls(count: int, table: dict, rng: random.Random) -> list:
+    # Half known domains (often on a subdomain), half unknown sites, as search results tend to be
+    known = [pattern.lstrip("*.") for pattern in table]
+    out = []
+    for i in range(count):
+        if rng.random() < 0.5:
+            host = rng.choice(known)
+            if rng.random() < 0.5:
+                host = rng.choice(["www", "news", "en", "data"]) + "." + host
+        else:
+            host = f"site{rng.randrange(count)}.example{rng.randrange(50)}.{rng.choice(['com', 'org', 'net'])}"
+        out.append(f"https://{host}/article/{i}?ref=search")
+    return out
+
+
+def time_per_url(fn, items: list) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark source-credibility scoring.")
+    parser.add_argument("--urls", type=int, default=100_000)
+    parser.add_argument("--table-size", type=int, default=50_000, help="entries in the large synthetic table")
+    parser.add_argument("--pages", type=int, default=10_000, help="10-result pages to rank")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-over-us", type=float, help="exit non-zero if an uncached large-table lookup exceeds this")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    engine = CredibilityEngine()
+    build_default_ms = (time.perf_counter() - started) * 1000
+    table = synthetic_table(args.table_size, rng)
+    started = time.perf_counter()
+    large = CredibilityEngine(reputation=table)
+    build_large_ms = (time.perf_counter() - started) * 1000
+
+    default_urls = urls(args.urls, DEFAULT_REPUTATION, rng)
+    large_urls = urls(args.urls, table, rng)
+    legacy_us = time_per_url(legacy_credibility, default_urls)
+    # Uncached: parse the URL and walk the trie every time
+    trie_us = time_per_url(lambda url: engine._score_host(hostname(url)), default_urls)
+    trie_large_us = time_per_url(lambda url: large._score_host(hostname(url)), large_urls)
+    time_per_url(engine.score, default_urls)  # fill the memo
+    memo_us = time_per_url(engine.score, default_urls)
+    # The substring check would scan the whole table for every lookup
+    legacy_large_us = time_per_url(
+        lambda url: any(pattern.lstrip("*.") in hostname(url) for pattern in table), large_urls[:max(1, args.urls // 100)]
+    )
+
+    pages = [
+        [{"link": url, "title": "t", "snippet": "s"} for url in rng.sample(default_urls, 10)]
+        for _ in range(args.pages)
+    ]
+    rank_us = time_per_url(engine.rank, pages)
+
+    legacy_wrong = sum((legacy_credibility(f"https://{host}/") == "high") != trusted for host, trusted in TRICKY)
+    trie_wrong = sum((engine.tag(engine.score(host)) == "high") != trusted for host, trusted in TRICKY)
+
+    print("\n📊 CREDIBILITY BENCHMARK")
+    print("-" * 50)
+    print(f"build             default table ({len(DEFAULT_REPUTATION)} rules) {build_default_ms:.2f} ms, "
+          f"large table ({len(table)} rules) {build_large_ms:.0f} ms")
+    print(f"substring check   {legacy_us:.2f} µs/url (6 patterns), {legacy_large_us:.0f} µs/url ({len(table)} patterns)")
+    print(f"trie, uncached    {trie_us:.2f} µs/url (default table), {trie_large_us:.2f} µs/url (large table)")
+    print(f"trie, memoized    {memo_us:.2f} µs/url")
+    print(f"rank 10 results   {rank_us:.1f} µs/page")
+    print(f"misclassified     substring check {legacy_wrong}/{len(TRICKY)}, trie {trie_wrong}/{len(TRICKY)}")
+    print("-" * 50)
+    if args.fail_over_us is not None and trie_large_us > args.fail_over_us:
+        print(f"❌ uncached lookup {trie_large_us:.2f} µs exceeds {args.fail_over_us} µs")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
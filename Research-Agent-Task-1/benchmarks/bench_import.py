@@ -0,0 +1,86 @@
+"""Import-time benchmark for agent.py.
+
+Each sample imports `agent` in a fresh interpreter, so nothing is cached in
+sys.modules. Also reports the deferred first-use cost of get_agent() and the
+slowest modules from `-X importtime`.
+
+Usage:
+    python benchmarks/bench_import.py --runs 10
+    python benchmarks/bench_import.py --max-ms 250   # regression gate
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import agent; print(time.perf_counter() - t)"
+FIRST_USE_SNIPPET = (
+    "import time; import agent; t = time.perf_counter(); agent.get_agent(); print(time.perf_counter() - t)"
+)
+
+
+def run_sample(snippet: str, extra_args=()) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "import-benchmark")
+    # As recommended for deployments that import agent as a library (see readme)
+    env.setdefault("PYDANTIC_DISABLE_PLUGINS", "logfire-plugin")
+    return subprocess.run(
+        [sys.executable, *extra_args, "-c", snippet],
+        cwd=AGENT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def time_samples(snippet: str, runs: int) -> list:
+    return [float(run_sample(snippet).stdout.strip().splitlines()[-1]) * 1000 for _ in range(runs)]
+
+
+def slowest_imports(limit: int = 8, by: str = "self") -> list:
+    """Top modules by self or cumulative import time, parsed from -X importtime.
+
+    Returns (self_us, cumulative_us, name) rows. Nested imports (indented names) are
+    included: the expensive module is usually pulled in by something else.
+    """
+    stderr = run_sample("import agent", ("-X", "importtime")).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self_us | cumulative_us | <indent>name"; indentation marks nested imports
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    column = 0 if by == "self" else 1
+    return sorted(rows, key=lambda row: row[column], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long `import agent` takes.")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--max-ms", type=float, help="exit non-zero if the median import time exceeds this")
+    parser.add_argument("--by", choices=("self", "cumulative"), default="self",
+                        help="rank the slowest imports by their own time or including what they import")
+    args = parser.parse_args()
+
+    import_ms = time_samples(IMPORT_SNIPPET, args.runs)
+    first_use_ms = time_samples(FIRST_USE_SNIPPET, max(1, args.runs // 2))
+    median = statistics.median(import_ms)
+
+    print("\n📊 IMPORT-TIME BENCHMARK")
+    print("-" * 50)
+    print(f"import agent      median {median:.1f} ms  (min {min(import_ms):.1f}, max {max(import_ms):.1f})")
+    print(f"get_agent() first median {statistics.median(first_use_ms):.1f} ms  (deferred to first use)")
+    print(f"Slowest imports, by {args.by} time:")
+    print(f"   {'self':>11} {'cumulative':>11}  module")
+    for self_us, cumulative_us, name in slowest_imports(by=args.by):
+        print(f"   {self_us / 1000:8.1f} ms {cumulative_us / 1000:8.1f} ms  {name}")
+    print("-" * 50)
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"❌ median import time {median:.1f} ms exceeds {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
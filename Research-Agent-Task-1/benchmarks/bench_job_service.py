@@ -0,0 +1,222 @@
+"""Load test of the research job service over HTTP.
+
+Serves `job_service` with uvicorn on a local port, runs the real agent and
+tools against the fake SerpAPI server with a scripted stand-in model, and
+drives it with concurrent clients from several tenants. Half of the clients
+poll for their result and half stream it; a fraction cancel their job.
+Rejected (429) submissions are retried after a short pause.
+
+Reports submit latency, queue wait by priority, end-to-end latency,
+throughput, rejections, and the most jobs each tenant had running at once
+(which must not exceed the tenant limit).
+
+Usage:
+    python benchmarks/bench_job_service.py --jobs 200 --tenants 4 --workers 8 --tenant-limit 2
+    python benchmarks/bench_job_service.py --queue-size 20 --model-latency 0.2   # exercise backpressure
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_agent import TOPICS, ScriptedModel, configure_offline_env, percentile  # noqa: E402
+from fake_serpapi import FakeSerpApi  # noqa: E402
+
+
+class SlowScriptedModel(ScriptedModel):
+    """ScriptedModel that takes `latency` seconds per model call, like a real model."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    async def respond_async(self, messages, info):
+        await asyncio.sleep(self.latency)
+        return self.respond(messages, info)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_load(args, base_url: str, service) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    submit_latencies, e2e, rejected, failures = [], [], 0, 0
+    outcomes = defaultdict(int)
+
+    async def one(i, client):
+        nonlocal rejected, failures
+        tenant = f"tenant-{i % args.tenants}"
+        priority = 5 if rng.random() < args.high_priority else 0
+        body = {"query": f"[job {i}] {TOPICS[i % len(TOPICS)]}", "priority": priority}
+        started = time.perf_counter()
+        for _ in range(args.max_retries + 1):
+            submitted = time.perf_counter()
+            response = await client.post("/jobs", json=body, headers={"X-Tenant": tenant})
+            submit_latencies.append(time.perf_counter() - submitted)
+            if response.status_code != 429:
+                break
+            rejected += 1
+            await asyncio.sleep(min(float(response.headers.get("Retry-After", 1)), args.retry_pause))
+        if response.status_code != 202:
+            failures += 1
+            return
+        job_id = response.json()["id"]
+
+        if rng.random() < args.cancel_rate:
+            await asyncio.sleep(rng.uniform(0, 2 * args.model_latency))
+            await client.delete(f"/jobs/{job_id}")
+
+        if i % 2:
+            # Streaming client: read server-sent events until the terminal one
+            async with client.stream("GET", f"/jobs/{job_id}/events") as stream:
+                async for line in stream.aiter_lines():
+                    if line.startswith("event: ") and line[7:] in ("done", "failed", "cancelled"):
+                        break
+            job = (await client.get(f"/jobs/{job_id}")).json()
+        else:
+            # Polling client
+            while True:
+                job = (await client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("done", "failed", "cancelled"):
+                    break
+                await asyncio.sleep(args.poll_interval)
+        outcomes[job["status"]] += 1
+        if job["status"] == "done":
+            e2e.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        semaphore = asyncio.Semaphore(args.clients)
+
+        async def bounded(i):
+            if args.rate:
+                await asyncio.sleep(i / args.rate)  # open-loop arrivals at --rate jobs per second
+            async with semaphore:
+                await one(i, client)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.jobs)))
+        elapsed = time.perf_counter() - started
+
+    waits = defaultdict(list)
+    for job in service.jobs.values():
+        if job.started is not None:
+            waits[job.priority].append(job.started - job.created)
+    return {
+        "jobs": args.jobs,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_jobs_per_s": round(outcomes["done"] / elapsed, 2) if elapsed else 0.0,
+        "outcomes": dict(outcomes),
+        "submit_failures": failures,
+        "rejected_429": rejected,
+        "submit_p50_ms": round(percentile(submit_latencies, 50) * 1000, 2),
+        "submit_p99_ms": round(percentile(submit_latencies, 99) * 1000, 2),
+        "queue_wait_p50_s": {f"priority {p}": round(percentile(w, 50), 3) for p, w in sorted(waits.items())},
+        "queue_wait_p95_s": {f"priority {p}": round(percentile(w, 95), 3) for p, w in sorted(waits.items())},
+        "e2e_p50_s": round(percentile(e2e, 50), 3),
+        "e2e_p95_s": round(percentile(e2e, 95), 3),
+        "service": service.health(),
+    }
+
+
+async def run_benchmark(args, server: FakeSerpApi) -> dict:
+    import uvicorn
+    from pydantic_ai.models.function import FunctionModel
+
+    import agent as research_agent
+    from job_service import JobService, build_app, run_research
+
+    # Track how many jobs each tenant has running, to check the cap holds
+    running, peak = defaultdict(int), defaultdict(int)
+
+    async def runner(job, publish):
+        running[job.tenant] += 1
+        peak[job.tenant] = max(peak[job.tenant], running[job.tenant])
+        try:
+            return await run_research(job, publish)
+        finally:
+            running[job.tenant] -= 1
+
+    service = JobService(
+        runner=runner, workers=args.workers, queue_size=args.queue_size, tenant_limit=args.tenant_limit,
+    )
+    port = free_port()
+    http = uvicorn.Server(uvicorn.Config(build_app(service), host="127.0.0.1", port=port, log_level="warning"))
+    scripted = SlowScriptedModel(args.model_latency)
+
+    # The override is inherited by the server's tasks, so every job runs on the stand-in model
+    with research_agent.get_agent().override(model=FunctionModel(scripted.respond_async)), \
+            contextlib.redirect_stdout(io.StringIO()):
+        serving = asyncio.create_task(http.serve())
+        while not http.started:
+            await asyncio.sleep(0.01)
+        try:
+            report = await run_load(args, f"http://127.0.0.1:{port}", service)
+        finally:
+            http.should_exit = True
+            await serving
+    await research_agent.aclose_clients()
+
+    report["peak_running_per_tenant"] = dict(sorted(peak.items()))
+    report["tenant_limit_held"] = max(peak.values(), default=0) <= args.tenant_limit
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the research job service with a stand-in model.")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent HTTP clients")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.0, help="job submissions per second (0 = all at once)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--tenant-limit", type=int, default=2)
+    parser.add_argument("--high-priority", type=float, default=0.2, help="fraction of jobs submitted with priority 5")
+    parser.add_argument("--cancel-rate", type=float, default=0.05)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="stand-in model seconds per call")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake upstream latency in seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--retry-pause", type=float, default=0.2, help="longest pause before retrying a 429")
+    parser.add_argument("--max-retries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    server = FakeSerpApi(latency=args.latency, jitter=0.0).start()
+    # configure_offline_env options that this benchmark does not expose
+    configure_offline_env(server, argparse.Namespace(rate=1000.0, cache=False, no_resilience=False))
+    # The stand-in model always calls all three tools, so every job takes the full route
+    os.environ["ROUTER"] = "0"
+    os.environ["ANSWER_CACHE_PATH"] = ""
+    try:
+        report = asyncio.run(run_benchmark(args, server))
+    finally:
+        server.stop()
+
+    print("\n📊 JOB SERVICE LOAD TEST")
+    print("-" * 50)
+    print(json.dumps(report, indent=2))
+    print("-" * 50)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if not report["tenant_limit_held"]:
+        print("❌ a tenant exceeded the per-tenant concurrency limit")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
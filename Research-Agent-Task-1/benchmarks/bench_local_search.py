@@ -0,0 +1,103 @@
+"""Benchmark of the local BM25 search backend on a synthetic corpus.
+
+Indexes generated documents in several `add` batches (one segment each),
+then times opening the index and queries before and after `compact`.
+
+Usage:
+    python benchmarks/bench_local_search.py --docs 100000 --batches 4 --queries 1000
+    python benchmarks/bench_local_search.py --fail-over-p99-ms 20   # regression gate
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_agent import percentile  # noqa: E402
+from local_search import IndexWriter, LocalIndex  # noqa: E402
+
+
+def vocabulary(size: int, rng: random.Random) -> list:
+    letters = "abcdefghiklmnoprstuvwyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def documents(count: int, vocab: list, rng: random.Random, start: int = 0):
+    # Zipf-like word frequencies, like natural text: a few very common words and a long tail
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    for i in range(start, start + count):
+        words = rng.choices(vocab, cum_weights=cumulative, k=rng.randint(60, 240))
+        yield {"url": f"https://kb.example.com/doc/{i}", "title": " ".join(words[:6]), "text": " ".join(words)}
+
+
+def time_queries(index: LocalIndex, queries: list) -> list:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, 5)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def directory_mb(path: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files
+    ) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local BM25 index.")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--batches", type=int, default=4, help="add batches (segments before compaction)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-over-p99-ms", type=float, help="exit non-zero if query p99 exceeds this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = vocabulary(args.vocab, rng)
+    # Queries mix common and rare words, 2-5 words each
+    queries = [" ".join(rng.choice(vocab[:2000] if rng.random() < 0.5 else vocab) for _ in range(rng.randint(2, 5)))
+               for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as path:
+        writer = IndexWriter(path)
+        per_batch = args.docs // args.batches
+        started = time.perf_counter()
+        for batch in range(args.batches):
+            writer.add(documents(per_batch, vocab, rng, start=batch * per_batch))
+        add_s = time.perf_counter() - started
+        size_mb = directory_mb(path)
+
+        started = time.perf_counter()
+        index = LocalIndex(path)
+        open_ms = (time.perf_counter() - started) * 1000
+        segmented = time_queries(index, queries)
+
+        started = time.perf_counter()
+        IndexWriter(path).compact()
+        compact_s = time.perf_counter() - started
+        compacted = time_queries(index, queries)  # picks up the new manifest on the first query
+
+    p99 = percentile(compacted, 99)
+    print("\n📊 LOCAL SEARCH BENCHMARK")
+    print("-" * 50)
+    print(f"documents         {per_batch * args.batches} in {args.batches} segments, {size_mb:.1f} MB on disk")
+    print(f"add               {add_s:.2f} s total, {add_s / (per_batch * args.batches) * 1e6:.0f} µs/document")
+    print(f"open              {open_ms:.2f} ms (memory-mapped)")
+    print(f"query, segmented  p50 {percentile(segmented, 50):.2f} ms  p99 {percentile(segmented, 99):.2f} ms")
+    print(f"compact           {compact_s:.2f} s")
+    print(f"query, compacted  p50 {percentile(compacted, 50):.2f} ms  p99 {p99:.2f} ms  max {max(compacted):.2f} ms")
+    print("-" * 50)
+    if args.fail_over_p99_ms is not None and p99 > args.fail_over_p99_ms:
+        print(f"❌ query p99 {p99:.2f} ms exceeds {args.fail_over_p99_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Tail-latency benchmark of the search client's deadlines, hedging and retries.
+
+Sends searches straight through SearchClient (no model, no result cache) to
+the local fake SerpAPI server with injected slow responses and errors, once
+with resilience off and once with it on, and compares the latency tails,
+failures and extra upstream load.
+
+Usage:
+    python benchmarks/bench_resilience.py --searches 400 --slow-rate 0.05 --slow-latency 2.0
+    python benchmarks/bench_resilience.py --error-rate 0.05 --fail-over-p99 0.5   # regression gate
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_agent import percentile  # noqa: E402
+from fake_serpapi import FakeSerpApi  # noqa: E402
+from resilience import Resilience  # noqa: E402
+from search_client import SearchClient  # noqa: E402
+
+
+async def run_mode(args, server: FakeSerpApi, resilience: Resilience, label: str) -> dict:
+    client = SearchClient(endpoint=server.url, api_key="offline-benchmark", timeout=args.timeout,
+                          resilience=resilience)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await client.search({"q": f"[{label} {i}] resilience benchmark", "num": 5})
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    # Warm-up searches fill the latency window the adaptive deadline and hedge delay are based on
+    await asyncio.gather(*(one(-i - 1) for i in range(args.warmup)))
+    latencies.clear()
+    failures = 0
+    for key in server.stats:
+        server.stats[key] = 0
+    for key in resilience.stats:
+        resilience.stats[key] = 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.searches)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return {
+        "searches": args.searches,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p95_s": round(percentile(latencies, 95), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "max_s": round(max(latencies, default=0.0), 4),
+        "upstream_per_search": round(server.stats["searches"] / args.searches, 3),
+        "deadline_s": round(resilience.deadline(), 3),
+        "hedge_delay_s": round(resilience.hedge_delay() or 0.0, 4),
+        "resilience": dict(resilience.stats),
+    }
+
+
+async def run_benchmark(args, server: FakeSerpApi) -> dict:
+    baseline = Resilience(retries=0, hedge=False, max_deadline=args.timeout)
+    resilient = Resilience(
+        retries=args.retries, hedge=True, hedge_percentile=args.hedge_percentile, max_deadline=args.timeout,
+    )
+    return {
+        "baseline": await run_mode(args, server, baseline, "baseline"),
+        "resilient": await run_mode(args, server, resilient, "resilient"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search deadlines, hedging and retries offline.")
+    parser.add_argument("--searches", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="fraction of searches failing with HTTP 500")
+    parser.add_argument("--timeout", type=float, default=10.0, help="client timeout / deadline cap in seconds")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--hedge-percentile", type=float, default=95.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--fail-over-p99", type=float, help="exit non-zero if the resilient p99 exceeds this")
+    args = parser.parse_args()
+
+    server = FakeSerpApi(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+    ).start()
+    try:
+        report = asyncio.run(run_benchmark(args, server))
+    finally:
+        server.stop()
+
+    print("\n📊 SEARCH RESILIENCE BENCHMARK")
+    print("-" * 50)
+    print(json.dumps(report, indent=2))
+    print("-" * 50)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    p99 = report["resilient"]["p99_s"]
+    if args.fail_over_p99 is not None and p99 > args.fail_over_p99:
+        print(f"❌ resilient p99 {p99}s exceeds {args.fail_over_p99}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
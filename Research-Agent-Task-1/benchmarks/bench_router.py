@@ -0,0 +1,207 @@
+"""Offline benchmark of complexity routing.
+
+Checks the local classifier against a small labelled set of questions, then
+runs a mixed workload through the real agent and tools twice, once with
+every question on the full route and once routed, using stub models: the
+"simple" stub answers after one search with a short per-call latency, the
+"full" stub runs the whole tool script with a longer one. Reports latency
+per route, with token usage read back from the metrics registry.
+
+Usage:
+    python benchmarks/bench_router.py --queries 60 --simple-latency 0.05 --full-latency 0.2
+    python benchmarks/bench_router.py --fail-under-accuracy 0.9   # regression gate for the classifier
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_agent import ScriptedModel, configure_offline_env, percentile  # noqa: E402
+from fake_serpapi import FakeSerpApi  # noqa: E402
+
+LABELLED = [
+    ("What is the capital of Australia?", "simple"),
+    ("Who is the CEO of Nvidia?", "simple"),
+    ("How many moons does Jupiter have?", "simple"),
+    ("When was the Eiffel Tower built?", "simple"),
+    ("population of Tokyo", "simple"),
+    ("current price of bitcoin", "simple"),
+    ("Where is the headquarters of the WHO?", "simple"),
+    ("define photosynthesis", "simple"),
+    ("What does NASA stand for?", "simple"),
+    ("How tall is Mount Everest?", "simple"),
+    ("boiling point of water at sea level", "simple"),
+    ("Who won the 2022 FIFA World Cup?", "simple"),
+    ("Compare the environmental impact of electric and gasoline cars over their lifecycle", "full"),
+    ("Is it true that we only use 10% of our brain?", "full"),
+    ("Why did the 2008 financial crisis happen and what were its consequences?", "full"),
+    ("latest research on quantum error correction", "full"),
+    ("Explain how mRNA vaccines work", "full"),
+    ("What are the pros and cons of remote work for productivity?", "full"),
+    ("Fact check: the Great Wall of China is visible from space", "full"),
+    ("Analyze the trends in global renewable energy investment since 2015", "full"),
+    ("How does the semiconductor supply chain affect car manufacturing?", "full"),
+    ("Evaluate the evidence for intermittent fasting; is it better than calorie counting?", "full"),
+    ("future of nuclear fusion power plants", "full"),
+    ("What are the health effects of ocean microplastics on humans?", "full"),
+]
+
+
+class StubRoute(ScriptedModel):
+    """ScriptedModel with its own tool script and a fixed latency per model call."""
+
+    def __init__(self, script, latency: float):
+        super().__init__()
+        self.SCRIPT = script
+        self.latency = latency
+        self.offered = set()  # tool names each run was offered
+
+    async def respond_async(self, messages, info):
+        self.offered.add(tuple(sorted(tool.name for tool in info.function_tools)))
+        await asyncio.sleep(self.latency)
+        return self.respond(messages, info)
+
+
+def classifier_report(threshold: int) -> dict:
+    from router import Router, Route, complexity
+
+    router = Router(Route("simple", None), Route("full", None), threshold=threshold)
+    wrong = [(query, label) for query, label in LABELLED if router.choose(query).name != label]
+    rounds = 2000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for query, _ in LABELLED:
+            complexity(query)
+    classify_us = (time.perf_counter() - started) / (rounds * len(LABELLED)) * 1e6
+    return {
+        "accuracy": round(1 - len(wrong) / len(LABELLED), 3),
+        "misrouted": [f"{query} (expected {label})" for query, label in wrong],
+        "classify_us": round(classify_us, 2),
+    }
+
+
+async def run_workload(args, routed: bool) -> dict:
+    from pydantic_ai.models.function import FunctionModel
+
+    import agent as research_agent
+    import metrics
+    from router import Route, Router
+
+    simple = StubRoute(["search_web"], args.simple_latency)
+    full = StubRoute(ScriptedModel.SCRIPT, args.full_latency)
+    router = Router(
+        simple=Route("simple", FunctionModel(simple.respond_async), tools=("search_web",)),
+        full=Route("full", FunctionModel(full.respond_async)),
+        enabled=routed,
+    )
+    research_agent._router = router  # route_tools reads the tool sets from the shared router
+    agent = research_agent.get_agent()
+    metrics.registry.reset()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, by_route, failures = [], {}, 0
+
+    async def one(i):
+        nonlocal failures
+        query = LABELLED[i % len(LABELLED)][0]
+        async with semaphore:
+            route = router.choose(query)
+            started = time.perf_counter()
+            try:
+                result = await agent.run(
+                    f"[run {i}] {query}", deps=research_agent.ResearchDeps(route=route.name), **route.run_kwargs()
+                )
+            except Exception:
+                failures += 1
+                return
+            seconds = time.perf_counter() - started
+            latencies.append(seconds)
+            by_route.setdefault(route.name, []).append(seconds)
+            metrics.record_run(result.usage(), seconds, mode="bench", route=route.name)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.queries)))
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name in ("simple", "full"):
+        runs = metrics.registry.counter("research_route_runs_total", route=name)
+        if not runs:
+            continue
+        tokens = sum(
+            metrics.registry.counter("research_route_tokens_total", route=name, kind=kind)
+            for kind in ("input", "output")
+        )
+        routes[name] = {
+            "runs": int(runs),
+            "p50_s": round(percentile(by_route[name], 50), 3),
+            "p95_s": round(percentile(by_route[name], 95), 3),
+            "tokens_per_run": round(tokens / runs, 1),
+        }
+    total_tokens = sum(route["tokens_per_run"] * route["runs"] for route in routes.values())
+    return {
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "e2e_p50_s": round(percentile(latencies, 50), 3),
+        "e2e_p95_s": round(percentile(latencies, 95), 3),
+        "tokens_per_query": round(total_tokens / max(len(latencies), 1), 1),
+        "routes": routes,
+        # The simple stub checks it was only ever offered the simple route's tools
+        "simple_tools_offered": sorted({name for tools in simple.offered for name in tools}),
+    }
+
+
+async def run_benchmark(args) -> dict:
+    import agent as research_agent
+
+    report = {
+        "classifier": classifier_report(args.threshold),
+        "all_full": await run_workload(args, routed=False),
+        "routed": await run_workload(args, routed=True),
+    }
+    await research_agent.aclose_clients()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark complexity routing with stub models.")
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--threshold", type=int, default=2, help="complexity at which questions take the full route")
+    parser.add_argument("--simple-latency", type=float, default=0.05, help="simple stub seconds per model call")
+    parser.add_argument("--full-latency", type=float, default=0.2, help="full stub seconds per model call")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake upstream latency in seconds")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--fail-under-accuracy", type=float, help="exit non-zero if classifier accuracy is below this")
+    args = parser.parse_args()
+    # configure_offline_env options that bench_router does not expose
+    args.rate, args.cache, args.no_resilience = 1000.0, False, False
+
+    server = FakeSerpApi(latency=args.latency, jitter=0.0).start()
+    configure_offline_env(server, args)
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        server.stop()
+
+    print("\n📊 ROUTER BENCHMARK")
+    print("-" * 50)
+    print(json.dumps(report, indent=2))
+    print("-" * 50)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    accuracy = report["classifier"]["accuracy"]
+    if args.fail_under_accuracy is not None and accuracy < args.fail_under_accuracy:
+        print(f"❌ classifier accuracy {accuracy} is below {args.fail_under_accuracy}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Local stand-in for SerpAPI (and the pages it links to) for offline runs.
+
+Usage:
+    python benchmarks/fake_serpapi.py --port 8765 --latency 0.2 --error-rate 0.05
+    SERP_API_ENDPOINT=http://127.0.0.1:8765/search.json python agent.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs under concurrent load and adds multi-second retries
+    request_queue_size = 256
+
+
+DOMAINS = ["reuters.com", "nature.com", "example-blog.net", "cdc.gov", "wikipedia.org"]
+
+
+class FakeSerpApi:
+    """Threaded HTTP server answering SerpAPI-shaped search requests.
+
+    Every request waits `latency` (+/- `jitter`) seconds. A `slow_rate`
+    fraction of requests waits `slow_latency` instead, and an `error_rate`
+    fraction fails with HTTP `fail_status` (500), so tail latency and upstream
+    errors can be injected deterministically with `seed`. `slow_first` and
+    `fail_first` make exactly the first N searches slow or failed, for tests.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        seed: int = 0,
+        fail_status: int = 500,
+        slow_first: int = 0,
+        fail_first: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.fail_status = fail_status
+        self.slow_first = slow_first
+        self.fail_first = fail_first
+        self._drawn = 0
+        self.stats = {"searches": 0, "pages": 0, "errors": 0, "slow": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """Endpoint to use as SERP_API_ENDPOINT."""
+        return f"http://127.0.0.1:{self.port}/search.json"
+
+    def start(self) -> "FakeSerpApi":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self):
+        """Pick this request's delay and whether it fails."""
+        with self._lock:
+            self._drawn += 1
+            slow = self._random.random() < self.slow_rate or self._drawn <= self.slow_first
+            failed = self._random.random() < self.error_rate or self._drawn <= self.fail_first
+            delay = self.slow_latency if slow else self.latency + self._random.uniform(-self.jitter, self.jitter)
+            if slow:
+                self.stats["slow"] += 1
+            if failed:
+                self.stats["errors"] += 1
+        return max(0.0, delay), failed
+
+    def search_results(self, query: str, num: int) -> dict:
+        """Deterministic SerpAPI-shaped payload for a query."""
+        digest = hashlib.sha1(query.encode()).hexdigest()
+        organic = []
+        for i in range(num):
+            domain = DOMAINS[(int(digest[i], 16) + i) % len(DOMAINS)]
+            organic.append({
+                "position": i + 1,
+                "title": f"{query[:60]} - result {i + 1} on {domain}",
+                "snippet": f"Result {i + 1} for '{query[:80]}'. " + "Background detail sentence. " * 6,
+                # Pages are served by this same fake server so extract_content stays offline
+                "link": f"http://127.0.0.1:{self.port}/page/{domain}/{digest[:8]}-{i}",
+            })
+        return {
+            "search_metadata": {"status": "Success"},
+            "answer_box": {"snippet": f"Quick answer for '{query[:80]}'."},
+            "organic_results": organic,
+            "related_questions": [{"question": f"What else about {query[:40]}?"}],
+        }
+
+    def page_html(self, path: str) -> str:
+        paragraphs = "".join(f"<p>Paragraph {i} of {path}. " + "Body text. " * 20 + "</p>" for i in range(40))
+        return (
+            f"<html><head><title>Page {path}</title><script>var tracking = 1;</script></head>"
+            f"<body><nav>Home | About</nav><article><h1>{path}</h1>{paragraphs}</article></body></html>"
+        )
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                delay, failed = fake._draw()
+                time.sleep(delay)
+                if parsed.path.startswith("/page/"):
+                    with fake._lock:
+                        fake.stats["pages"] += 1
+                    etag = '"' + hashlib.sha1(parsed.path.encode()).hexdigest()[:12] + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self._send(304, b"", "text/html", etag)
+                    else:
+                        self._send(200, fake.page_html(parsed.path).encode(), "text/html; charset=utf-8", etag)
+                    return
+
+                with fake._lock:
+                    fake.stats["searches"] += 1
+                if failed:
+                    self._send(fake.fail_status, json.dumps({"error": "Injected upstream failure"}).encode(),
+                               "application/json")
+                    return
+                params = parse_qs(parsed.query)
+                query = params.get("q", [""])[0]
+                num = int(params.get("num", ["5"])[0])
+                body = json.dumps(fake.search_results(query, num)).encode()
+                self._send(200, body, "application/json")
+
+            def _send(self, status, body, content_type, etag=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The page fetcher hangs up once it has enough text
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake SerpAPI server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1, help="base response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of searches failing with HTTP 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = FakeSerpApi(
+        port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+    ).start()
+    print(f"Fake SerpAPI listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
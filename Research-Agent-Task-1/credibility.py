@@ -0,0 +1,210 @@
+import functools
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Reputation of a source by domain, 0 (worthless) to 1. "example.com" covers the domain and
+# its subdomains; "*.gov" covers every host under a suffix. A plain rule for a public
+# suffix such as "github.io" covers that exact host only, never the sites hosted under it.
+DEFAULT_REPUTATION = {
+    # Government, intergovernmental and fact-checkers
+    "*.gov": 0.95, "*.mil": 0.9, "*.gov.uk": 0.95, "*.gov.au": 0.95, "*.gc.ca": 0.95, "*.gov.in": 0.9,
+    "europa.eu": 0.9, "who.int": 0.95, "un.org": 0.9, "oecd.org": 0.9, "worldbank.org": 0.9, "imf.org": 0.9,
+    "snopes.com": 0.9, "factcheck.org": 0.9, "politifact.com": 0.9, "fullfact.org": 0.9,
+    # Wire services and public broadcasters
+    "reuters.com": 0.9, "apnews.com": 0.9, "afp.com": 0.9, "bbc.com": 0.85, "bbc.co.uk": 0.85, "npr.org": 0.8,
+    # Academic
+    "*.edu": 0.85, "*.ac.uk": 0.85, "*.edu.au": 0.85, "*.ac.jp": 0.85, "arxiv.org": 0.75,
+    "nature.com": 0.9, "science.org": 0.9, "thelancet.com": 0.9, "nejm.org": 0.9, "bmj.com": 0.9,
+    "jamanetwork.com": 0.9, "cell.com": 0.85, "plos.org": 0.8, "springer.com": 0.8, "sciencedirect.com": 0.8,
+    "wiley.com": 0.8, "pnas.org": 0.9, "ieee.org": 0.8, "acm.org": 0.8,
+    # Established media and reference
+    "nytimes.com": 0.75, "washingtonpost.com": 0.75, "theguardian.com": 0.75, "wsj.com": 0.75, "ft.com": 0.75,
+    "economist.com": 0.75, "bloomberg.com": 0.75, "aljazeera.com": 0.7, "cnn.com": 0.7, "nbcnews.com": 0.7,
+    "wikipedia.org": 0.6, "britannica.com": 0.7,
+    # User-generated content and social media
+    "medium.com": 0.3, "substack.com": 0.3, "quora.com": 0.2, "reddit.com": 0.25, "*.blogspot.com": 0.25,
+    "*.wordpress.com": 0.25, "*.github.io": 0.3, "facebook.com": 0.1, "instagram.com": 0.05,
+    "tiktok.com": 0.05, "pinterest.com": 0.0, "x.com": 0.1, "twitter.com": 0.1,
+}
+DEFAULT_SCORE = 0.4  # unknown domains
+
+# Multi-label public suffixes (single-label TLDs are always suffixes). Extend or replace
+# with the full list from publicsuffix.org via PUBLIC_SUFFIX_LIST.
+PUBLIC_SUFFIXES = (
+    "co.uk org.uk ac.uk gov.uk me.uk ltd.uk com.au net.au org.au edu.au gov.au co.nz org.nz govt.nz "
+    "co.jp ne.jp or.jp ac.jp go.jp co.in gov.in ac.in org.in com.br gov.br org.br com.cn gov.cn edu.cn "
+    "co.za gov.za ac.za com.mx gob.mx com.ar gob.ar co.kr go.kr ac.kr gc.ca com.sg gov.sg edu.sg "
+    "github.io gitlab.io blogspot.com wordpress.com herokuapp.com netlify.app vercel.app pages.dev "
+    "appspot.com azurewebsites.net cloudfront.net s3.amazonaws.com"
+).split()
+
+HIGH = 0.8  # tags used in tool output: [high] at or above, [low] below MEDIUM
+MEDIUM = 0.4  # unknown domains (DEFAULT_SCORE) count as medium
+
+
+def hostname(url: str) -> str:
+    """Lowercased host of a URL (or a bare domain), without port, credentials or trailing dot."""
+    start = url.find("://")
+    start = 0 if start < 0 else start + 3
+    end = len(url)
+    for stop in "/?#":
+        found = url.find(stop, start, end)
+        if found >= 0:
+            end = found
+    host = url[start:end].rpartition("@")[2]
+    if "[" in host:  # IPv6 literal: leave the parsing to urllib
+        return urlsplit(url if "://" in url else "//" + url).hostname or ""
+    return host.partition(":")[0].strip().rstrip(".").lower()
+
+
+class _Node:
+    __slots__ = ("children", "score", "wildcard", "suffix")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.score: Optional[float] = None  # rule for this domain (and its subdomains)
+        self.wildcard: Optional[float] = None  # rule for every host strictly below this node
+        self.suffix = False  # public suffix: plain rules here do not extend to subdomains
+
+
+class CredibilityEngine:
+    """Scores sources by domain reputation with a reversed-label trie ("com" -> "reuters" -> "uk").
+
+    A lookup walks the host's labels from the TLD down, so it costs one dict
+    access per label whatever the size of the table, and the deepest matching
+    rule wins. Scores are memoized per host.
+    """
+
+    def __init__(
+        self,
+        reputation: Optional[Dict[str, float]] = None,
+        public_suffixes: Iterable[str] = PUBLIC_SUFFIXES,
+        default: float = DEFAULT_SCORE,
+        min_score: float = 0.15,
+        max_per_site: int = 2,
+    ):
+        self.default = default
+        self.min_score = min_score
+        self.max_per_site = max_per_site
+        self.stats = {"ranked": 0, "dropped_low": 0, "dropped_site_cap": 0}
+        self._root = _Node()
+        for suffix in public_suffixes:
+            self._node(suffix.lstrip("*.")).suffix = True
+        for pattern, score in (DEFAULT_REPUTATION if reputation is None else reputation).items():
+            pattern = pattern.lower().strip().rstrip(".")
+            if pattern.startswith("*."):
+                self._node(pattern[2:]).wildcard = float(score)
+            else:
+                self._node(pattern).score = float(score)
+        # Per-instance memos: tools see the same few hundred hosts over and over
+        self.score_host = functools.lru_cache(maxsize=65536)(self._score_host)
+        self.site_host = functools.lru_cache(maxsize=65536)(self._site_host)
+
+    @classmethod
+    def from_env(cls) -> "CredibilityEngine":
+        """Defaults, overridden by CREDIBILITY_TABLE (JSON {"pattern": score}) and CREDIBILITY_* settings."""
+        reputation = dict(DEFAULT_REPUTATION)
+        table = os.getenv("CREDIBILITY_TABLE")
+        if table:
+            with open(table, encoding="utf-8") as f:
+                reputation.update(json.load(f))
+        suffixes = PUBLIC_SUFFIXES
+        suffix_list = os.getenv("PUBLIC_SUFFIX_LIST")
+        if suffix_list:
+            suffixes = list(load_public_suffix_list(suffix_list))
+        return cls(
+            reputation=reputation,
+            public_suffixes=suffixes,
+            default=float(os.getenv("CREDIBILITY_DEFAULT", str(DEFAULT_SCORE))),
+            min_score=float(os.getenv("CREDIBILITY_MIN_SCORE", "0.15")),
+            max_per_site=int(os.getenv("CREDIBILITY_MAX_PER_SITE", "2")),
+        )
+
+    def _node(self, domain: str) -> _Node:
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.children.setdefault(label, _Node())
+        return node
+
+    def _score_host(self, host: str) -> float:
+        labels = host.split(".")
+        node, score = self._root, self.default
+        for depth, label in enumerate(reversed(labels), 1):
+            parent_wildcard = node.wildcard
+            node = node.children.get(label)
+            if node is None:
+                if parent_wildcard is not None:
+                    score = parent_wildcard
+                break
+            if parent_wildcard is not None:
+                score = parent_wildcard
+            if node.score is not None and (depth == len(labels) or not node.suffix):
+                score = node.score
+        return score
+
+    def score(self, url: str) -> float:
+        """Reputation of the source at `url` (or a bare domain)."""
+        return self.score_host(hostname(url))
+
+    def site(self, url: str) -> str:
+        """Registrable domain of `url`: one label below its longest public suffix (a.b.bbc.co.uk -> bbc.co.uk)."""
+        return self.site_host(hostname(url))
+
+    def _site_host(self, host: str) -> str:
+        labels = host.split(".")
+        node, suffix_depth = self._root, 1  # the TLD is always a public suffix
+        for depth, label in enumerate(reversed(labels), 1):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.suffix:
+                suffix_depth = depth
+        return ".".join(labels[-(suffix_depth + 1):])
+
+    def tag(self, score: float) -> str:
+        return "high" if score >= HIGH else "medium" if score >= MEDIUM else "low"
+
+    def rank(
+        self, results: List[dict], key: str = "link", limit: Optional[int] = None, per_site: bool = True
+    ) -> List[Tuple[float, dict]]:
+        """Drop low-value results and order the rest by reputation, keeping the engine's order for ties.
+
+        Each result loses a little for its original position, so a much more
+        relevant result is not buried under a slightly more reputable one.
+        At most `max_per_site` results per registrable domain are kept, unless
+        `per_site` is off (a local corpus is often all one host) or the URL has
+        no host at all (file:// documents).
+        """
+        scored = []
+        for position, result in enumerate(results):
+            host = hostname(result.get(key, ""))
+            score = self.score_host(host)
+            if score >= self.min_score:
+                scored.append((score - 0.05 * position, position, score, host, result))
+            else:
+                self.stats["dropped_low"] += 1
+        self.stats["ranked"] += len(results)
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        kept, site_counts = [], {}
+        for _, _, score, host, result in scored:
+            if per_site and host:
+                site = self.site_host(host)
+                if site_counts.get(site, 0) >= self.max_per_site:
+                    self.stats["dropped_site_cap"] += 1
+                    continue
+                site_counts[site] = site_counts.get(site, 0) + 1
+            kept.append((score, result))
+            if limit is not None and len(kept) >= limit:
+                break
+        return kept
+
+
+def load_public_suffix_list(path: str) -> Iterable[str]:
+    """Rules from a publicsuffix.org list file ("*." rules become their base suffix; "!" exceptions are skipped)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            rule = line.split()[0] if line.strip() else ""
+            if rule and not rule.startswith(("//", "!")):
+                yield rule.lstrip("*.")
@@ -0,0 +1,141 @@
+import os
+from dataclasses import replace
+from typing import List, Optional
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+# Rough chars-per-token ratio; good enough to compare prompt sizes between turns
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(messages: List[ModelMessage]) -> int:
+    """Estimate how many prompt tokens a message list costs."""
+    if not messages:
+        return 0
+    return len(ModelMessagesTypeAdapter.dump_json(messages)) // CHARS_PER_TOKEN
+
+
+def split_turns(messages: List[ModelMessage]) -> List[List[ModelMessage]]:
+    """Group messages into turns, each starting at a request that carries a user prompt."""
+    turns: List[List[ModelMessage]] = []
+    for message in messages:
+        starts_turn = isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        )
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class HistoryManager:
+    """Keeps the REPL message history under a token budget.
+
+    The system prompt and the most recent turns are kept verbatim. Older tool
+    returns are collapsed into short summaries, `raw_text` is dropped from older
+    structured outputs, and whole turns are dropped oldest-first if that is
+    still not enough.
+    """
+
+    def __init__(self, token_budget: int = 6000, keep_recent_turns: int = 2, summary_chars: int = 200):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_chars = summary_chars
+        self.reports: List[dict] = []
+
+    @classmethod
+    def from_env(cls) -> "HistoryManager":
+        """Build a manager configured from HISTORY_* environment variables."""
+        return cls(
+            token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "6000")),
+            keep_recent_turns=int(os.getenv("HISTORY_KEEP_TURNS", "2")),
+        )
+
+    @property
+    def last_report(self) -> Optional[dict]:
+        return self.reports[-1] if self.reports else None
+
+    def compact(self, messages: List[ModelMessage]) -> List[ModelMessage]:
+        """Return a history that fits the token budget and record the savings."""
+        before = estimate_tokens(messages)
+        if before <= self.token_budget:
+            self._report(before, before)
+            return messages
+
+        turns = split_turns(messages)
+        keep = min(self.keep_recent_turns, len(turns))
+        older, recent = turns[: len(turns) - keep], turns[len(turns) - keep:]
+        costs = [estimate_tokens(turn) for turn in turns]
+        total = sum(costs)
+
+        # Collapse older turns oldest-first until the history fits
+        for i, turn in enumerate(older):
+            if total <= self.token_budget:
+                break
+            older[i] = [self._compact_message(message) for message in turn]
+            new_cost = estimate_tokens(older[i])
+            total += new_cost - costs[i]
+            costs[i] = new_cost
+
+        # Still too big: drop whole turns, carrying the system prompt forward
+        while older and total > self.token_budget:
+            dropped = older.pop(0)
+            total -= costs.pop(0)
+            system_parts = [
+                part for message in dropped if isinstance(message, ModelRequest)
+                for part in message.parts if isinstance(part, SystemPromptPart)
+            ]
+            if system_parts:
+                next_turn = older[0] if older else recent[0] if recent else None
+                if next_turn is None:
+                    recent.append([ModelRequest(parts=system_parts)])
+                else:
+                    next_turn[0] = replace(next_turn[0], parts=[*system_parts, *next_turn[0].parts])
+
+        compacted = [message for turn in older + recent for message in turn]
+        self._report(before, estimate_tokens(compacted))
+        return compacted
+
+    def _compact_message(self, message: ModelMessage) -> ModelMessage:
+        """Shrink tool outputs and long texts in one message from an older turn."""
+        if isinstance(message, ModelRequest):
+            parts = [self._summarize_tool_return(part) if isinstance(part, ToolReturnPart) else part
+                     for part in message.parts]
+            return replace(message, parts=parts)
+        if isinstance(message, ModelResponse):
+            parts = []
+            for part in message.parts:
+                if isinstance(part, ToolCallPart):
+                    args = part.args_as_dict()
+                    if "raw_text" in args:
+                        part = replace(part, args={k: v for k, v in args.items() if k != "raw_text"})
+                elif isinstance(part, TextPart) and len(part.content) > self.summary_chars * 3:
+                    part = replace(part, content=part.content[: self.summary_chars * 3] + " …[truncated]")
+                parts.append(part)
+            return replace(message, parts=parts)
+        return message
+
+    def _summarize_tool_return(self, part: ToolReturnPart) -> ToolReturnPart:
+        """Replace a long tool output with a short reference summary."""
+        content = part.model_response_str()
+        if len(content) <= self.summary_chars * 2:
+            return part
+        head = " ".join(content.split())[: self.summary_chars]
+        summary = (
+            f"[earlier {part.tool_name} output compacted, "
+            f"~{len(content) // CHARS_PER_TOKEN} tokens] {head}…"
+        )
+        return replace(part, content=summary)
+
+    def _report(self, before: int, after: int):
+        self.reports.append({"before_tokens": before, "after_tokens": after, "saved_tokens": before - after})
@@ -0,0 +1,442 @@
+"""Research job service: an HTTP API in front of the agent.
+
+Usage:
+    python job_service.py --port 8080 --workers 4 --queue-size 100 --tenant-limit 2
+
+    curl -X POST localhost:8080/jobs -H 'X-Tenant: team-a' -d '{"query": "...", "priority": 5}'
+    curl localhost:8080/jobs/<id>             # poll
+    curl -N localhost:8080/jobs/<id>/events   # stream progress and the result (server-sent events)
+    curl -X DELETE localhost:8080/jobs/<id>   # cancel
+
+Submitted jobs wait in a priority queue (higher priority first, then oldest
+first) for a pool of async workers. Each tenant has at most `tenant_limit`
+jobs running at once; its other jobs wait without blocking other tenants.
+When `queue_size` jobs are already waiting, new submissions get 429 with a
+Retry-After estimate instead of piling up.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import metrics
+import telemetry
+
+TERMINAL = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """Raised by `JobService.submit` when the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    id: str
+    query: str
+    tenant: str = "default"
+    priority: int = 0
+    status: str = "queued"  # queued, running, then done, failed or cancelled
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    route: Optional[str] = None
+    cached: bool = False
+    output: Optional[dict] = None
+    error: Optional[str] = None
+    # Every event so far, so late subscribers can catch up, and the queues of live subscribers
+    events: List[dict] = field(default_factory=list, repr=False)
+    listeners: List[asyncio.Queue] = field(default_factory=list, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "query": self.query,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "route": self.route,
+            "cached": self.cached,
+            "output": self.output,
+            "error": self.error,
+        }
+
+
+# Runs one job and returns its output; the callback publishes progress events to subscribers
+JobRunner = Callable[[Job, Callable[..., None]], Awaitable[dict]]
+
+
+async def run_research(job: Job, publish: Callable[..., None]) -> dict:
+    """Default runner: the answer cache, then the routed agent, publishing each tool call as it is made."""
+    from pydantic_ai import Agent
+    from pydantic_ai.messages import ToolCallPart
+
+    from agent import ResearchDeps, get_agent, get_answer_cache, get_router, remember_answer, run_routed
+
+    hit = get_answer_cache().lookup(job.query)
+    if hit is not None and hit.direct:
+        job.cached = True
+        return hit.output
+    prompt = hit.seed_prompt(job.query) if hit is not None else job.query
+    deps = ResearchDeps()
+
+    async def run_agent(**run_kwargs):
+        # Published again with the full route when run_routed escalates
+        job.route = deps.route
+        publish("route", route=deps.route)
+        async with get_agent().iter(prompt, deps=deps, **run_kwargs) as run:
+            async for node in run:
+                if Agent.is_call_tools_node(node):
+                    for part in node.model_response.parts:
+                        if isinstance(part, ToolCallPart) and part.tool_name != "final_result":
+                            publish("tool", tool=part.tool_name, args=part.args_as_dict())
+        return run.result, run.result.output
+
+    started = time.perf_counter()
+    route, result, _ = await run_routed(get_router().choose(job.query), deps, run_agent)
+    metrics.record_run(result.usage(), time.perf_counter() - started, mode="service", route=route.name)
+    remember_answer(job.query, [], result.output)
+    return result.output.model_dump()
+
+
+class JobService:
+    """Priority queue, worker pool, per-tenant caps and cancellation for research jobs.
+
+    Everything runs on one event loop, so the scheduling state needs no locks:
+    `_heap` holds runnable queued jobs and `_ready` counts its entries. A job
+    popped while its tenant is at the cap is parked in that tenant's own heap
+    and moved back when one of the tenant's running jobs finishes. Cancelled
+    queued jobs are skipped when they are popped.
+    """
+
+    def __init__(
+        self,
+        runner: Optional[JobRunner] = None,
+        workers: int = 4,
+        queue_size: int = 100,
+        tenant_limit: int = 2,
+        job_timeout: float = 300.0,
+        retention: int = 1000,
+    ):
+        self.runner = runner or run_research
+        self.workers = workers
+        self.queue_size = queue_size
+        self.tenant_limit = tenant_limit
+        self.job_timeout = job_timeout
+        self.retention = retention
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        self._heap: list = []
+        self._parked: Dict[str, list] = defaultdict(list)
+        self._running: Dict[str, int] = defaultdict(int)
+        self._queued = 0
+        self._order = itertools.count()
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+        self._recent_seconds = 30.0  # smoothed job duration, for Retry-After estimates
+
+    @classmethod
+    def from_env(cls, runner: Optional[JobRunner] = None) -> "JobService":
+        """Build the service from JOB_WORKERS, JOB_QUEUE_SIZE, JOB_TENANT_LIMIT, JOB_TIMEOUT and JOB_RETENTION."""
+        return cls(
+            runner=runner,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            queue_size=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+            tenant_limit=int(os.getenv("JOB_TENANT_LIMIT", "2")),
+            job_timeout=float(os.getenv("JOB_TIMEOUT", "300")),
+            retention=int(os.getenv("JOB_RETENTION", "1000")),
+        )
+
+    async def start(self):
+        """Start the worker pool (call from the event loop that will serve requests)."""
+        self._ready = asyncio.Semaphore(len(self._heap))
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        metrics.expose_stats("job_service", self.stats)
+        metrics.registry.set_collector("job_service_queue", lambda: [
+            ("research_jobs_queued", {}, self._queued),
+            ("research_jobs_running", {}, sum(self._running.values())),
+        ])
+
+    async def stop(self):
+        """Cancel the workers and any running jobs."""
+        for job in self.jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, query: str, tenant: str = "default", priority: int = 0) -> Job:
+        """Queue a job, or raise QueueFull when `queue_size` jobs are already waiting."""
+        if self._queued >= self.queue_size:
+            self.stats["rejected"] += 1
+            # Time for the workers to drain the queue ahead at the recent job duration
+            raise QueueFull(max(1, math.ceil(self._queued / self.workers * self._recent_seconds)))
+        job = Job(id=uuid.uuid4().hex[:16], query=query, tenant=tenant, priority=priority)
+        self.jobs[job.id] = job
+        self._prune()
+        self.stats["submitted"] += 1
+        self._queued += 1
+        self._push(job)
+        self._publish(job, "queued")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs are returned unchanged."""
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == "queued":
+            # Left in the heap and skipped when popped
+            self._queued -= 1
+            self._finish(job, "cancelled")
+        elif job.task is not None:
+            # The worker marks it cancelled when the task unwinds
+            job.task.cancel()
+        return job
+
+    async def events(self, job: Job) -> AsyncIterator[dict]:
+        """Yield the job's events so far, then new ones until it finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in job.events:
+            queue.put_nowait(event)
+        if not job.done:
+            job.listeners.append(queue)
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in TERMINAL:
+                    return
+        finally:
+            if queue in job.listeners:
+                job.listeners.remove(queue)
+
+    def health(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "queued": self._queued,
+            "running": sum(self._running.values()),
+            "queue_size": self.queue_size,
+            "tenant_limit": self.tenant_limit,
+            **self.stats,
+        }
+
+    def _push(self, job: Job):
+        heapq.heappush(self._heap, (-job.priority, next(self._order), job))
+        if self._ready is not None:
+            self._ready.release()
+
+    def _publish(self, job: Job, event: str, **data):
+        record = {"event": event, "id": job.id, "time": time.time(), **data}
+        job.events.append(record)
+        for queue in job.listeners:
+            queue.put_nowait(record)
+
+    def _finish(self, job: Job, status: str, **data):
+        job.status = status
+        job.finished = time.time()
+        self.stats["completed" if status == "done" else status] += 1
+        metrics.registry.inc("research_jobs_total", status=status)
+        self._publish(job, status, **data)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond `retention`."""
+        excess = len(self.jobs) - self.retention
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id].done:
+                del self.jobs[job_id]
+                excess -= 1
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            _, _, job = heapq.heappop(self._heap)
+            if job.status != "queued":
+                continue
+            if self._running[job.tenant] >= self.tenant_limit:
+                heapq.heappush(self._parked[job.tenant], (-job.priority, next(self._order), job))
+                continue
+            self._queued -= 1
+            self._running[job.tenant] += 1
+            try:
+                await self._execute(job)
+            finally:
+                self._running[job.tenant] -= 1
+                self._unpark(job.tenant)
+
+    def _unpark(self, tenant: str):
+        """Hand a freed slot to the tenant's best parked job, dropping cancelled ones on the way."""
+        parked = self._parked.get(tenant, [])
+        while parked:
+            job = heapq.heappop(parked)[2]
+            if job.status == "queued":
+                self._push(job)
+                break
+        if not parked:
+            self._parked.pop(tenant, None)
+
+    async def _execute(self, job: Job):
+        job.status = "running"
+        job.started = time.time()
+        metrics.registry.observe("research_job_wait_seconds", job.started - job.created)
+        self._publish(job, "running")
+        job.task = asyncio.create_task(self.runner(job, lambda event, **data: self._publish(job, event, **data)))
+        try:
+            await asyncio.wait({job.task}, timeout=self.job_timeout)
+        except asyncio.CancelledError:
+            # The service is stopping
+            job.task.cancel()
+            self._finish(job, "cancelled")
+            raise
+        if not job.task.done():
+            job.task.cancel()
+            await asyncio.gather(job.task, return_exceptions=True)
+            job.error = f"timed out after {self.job_timeout:g}s"
+            self._finish(job, "failed", error=job.error)
+        elif job.task.cancelled():
+            self._finish(job, "cancelled")
+        elif job.task.exception() is not None:
+            job.error = str(job.task.exception())
+            telemetry.error("research job failed", id=job.id, error=job.error)
+            self._finish(job, "failed", error=job.error)
+        else:
+            job.output = job.task.result()
+            self._finish(job, "done", output=job.output)
+        self._recent_seconds = 0.8 * self._recent_seconds + 0.2 * (job.finished - job.started)
+        job.task = None
+
+
+def build_app(service: JobService):
+    """Starlette app exposing the service (starlette is only needed when serving HTTP)."""
+    from contextlib import asynccontextmanager
+
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+    from starlette.routing import Route
+
+    async def submit(request):
+        try:
+            body = await request.json()
+            query = str(body["query"]).strip()
+            priority = int(body.get("priority", 0))
+        except (ValueError, KeyError, TypeError):
+            return JSONResponse({"error": 'expected a JSON body like {"query": "...", "priority": 0}'}, 400)
+        if not query:
+            return JSONResponse({"error": "query is empty"}, 400)
+        tenant = request.headers.get("x-tenant") or str(body.get("tenant") or "default")
+        try:
+            job = service.submit(query, tenant=tenant, priority=priority)
+        except QueueFull as e:
+            return JSONResponse({"error": str(e)}, 429, headers={"Retry-After": str(e.retry_after)})
+        return JSONResponse(job.to_dict(), 202, headers={"Location": f"/jobs/{job.id}"})
+
+    async def status(request):
+        job = service.get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "unknown job"}, 404)
+        return JSONResponse(job.to_dict())
+
+    async def cancel(request):
+        job = service.get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "unknown job"}, 404)
+        if job.done:
+            return JSONResponse({"error": f"job already {job.status}", **job.to_dict()}, 409)
+        service.cancel(job.id)
+        return JSONResponse(job.to_dict(), 202)
+
+    async def events(request):
+        job = service.get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "unknown job"}, 404)
+
+        async def stream():
+            async for event in service.events(job):
+                yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def health(request):
+        return JSONResponse(service.health())
+
+    async def prometheus(request):
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await service.start()
+        try:
+            yield
+        finally:
+            await service.stop()
+            if service.runner is run_research:
+                from agent import aclose_clients
+                await aclose_clients()
+
+    return Starlette(
+        routes=[
+            Route("/jobs", submit, methods=["POST"]),
+            Route("/jobs/{job_id}", status, methods=["GET"]),
+            Route("/jobs/{job_id}", cancel, methods=["DELETE"]),
+            Route("/jobs/{job_id}/events", events, methods=["GET"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", prometheus, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def main():
+    telemetry.disable_logfire_plugin()
+    parser = argparse.ArgumentParser(description="Serve the research agent as an HTTP job service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, help="concurrent jobs (default JOB_WORKERS or 4)")
+    parser.add_argument("--queue-size", type=int, help="waiting jobs before 429 (default JOB_QUEUE_SIZE or 100)")
+    parser.add_argument("--tenant-limit", type=int, help="running jobs per tenant (default JOB_TENANT_LIMIT or 2)")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    from agent import load_env
+
+    load_env()
+    telemetry.configure()
+    service = JobService.from_env()
+    if args.workers:
+        service.workers = args.workers
+    if args.queue_size:
+        service.queue_size = args.queue_size
+    if args.tenant_limit:
+        service.tenant_limit = args.tenant_limit
+    uvicorn.run(build_app(service), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
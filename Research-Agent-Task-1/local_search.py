@@ -0,0 +1,561 @@
+"""Offline search backend: BM25 over a local corpus in memory-mapped segments.
+
+An index is a directory of immutable segments plus a `manifest.json` listing
+them. Each segment is a set of `.npy` arrays (term ids, postings, document
+lengths, packed metadata) opened with `mmap_mode="r"`, so opening an index
+reads almost nothing and worker processes share the OS page cache. Adding
+documents writes a new segment and swaps the manifest atomically; searchers
+pick it up on their next query.
+
+Usage:
+    python local_search.py add docs.jsonl notes/ --index .local_index   # {"url", "title", "text"} lines, files, dirs
+    python local_search.py search "heat pump efficiency" --num 5
+    python local_search.py compact      # merge segments and drop replaced documents
+    python local_search.py stats
+    SEARCH_BACKEND=local python agent.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from answer_cache import tokenize
+from page_fetcher import Document, HTMLTextExtractor
+from sources import canonicalize_url
+
+MANIFEST = "manifest.json"
+K1 = 1.2
+B = 0.75
+MAX_STORED_CHARS = 20000  # text kept per document for snippets and extract_content
+SEGMENT_DOCS = 50000  # documents per segment written by one `add` batch
+TEXT_SUFFIXES = (".txt", ".md", ".rst")
+HTML_SUFFIXES = (".html", ".htm")
+
+
+def term_ids(words: List[str], cache: Optional[Dict[str, int]] = None) -> np.ndarray:
+    """Stable 32-bit ids of `words` (crc32, so every process agrees)."""
+    if cache is None:
+        return np.fromiter((zlib.crc32(word.encode()) for word in words), np.uint32, len(words))
+    ids = np.empty(len(words), np.uint32)
+    for i, word in enumerate(words):
+        term = cache.get(word)
+        if term is None:
+            term = cache[word] = zlib.crc32(word.encode())
+        ids[i] = term
+    return ids
+
+
+def url_key(url: str) -> int:
+    """Hash of the canonical URL, so lookups match however the tools spell it."""
+    return int.from_bytes(hashlib.blake2b(canonicalize_url(url).encode(), digest_size=8).digest(), "little")
+
+
+def snippet(text: str, words: List[str], chars: int = 240) -> str:
+    """Window of `text` around the first occurrence of any query word."""
+    lowered = text.lower()
+    hits = [position for position in (lowered.find(word) for word in words) if position >= 0]
+    start = max(0, min(hits) - chars // 4) if hits else 0
+    if start:
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < start + 30 else start
+    window = " ".join(text[start:start + chars].split())
+    return ("…" if start else "") + window
+
+
+class Segment:
+    """One immutable, memory-mapped segment of the index."""
+
+    def __init__(self, path: str, deleted: Iterable[int] = ()):
+        self.name = os.path.basename(path)
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.terms = load("terms")  # sorted unique term ids
+        self.starts = load("starts")  # postings of terms[i] are [starts[i], starts[i + 1])
+        self.docs = load("docs")  # postings: document number within the segment
+        self.tfs = load("tfs")  # postings: term frequency
+        self.lengths = load("lengths")  # tokens per document
+        self.meta = load("meta")  # packed JSON {"url", "title", "text"} per document
+        self.meta_offsets = load("meta_offsets")
+        self.url_keys = load("url_keys")  # sorted url_key() of each document ...
+        self.url_docs = load("url_docs")  # ... and the document it belongs to
+        self.deleted = np.zeros(len(self.lengths), bool)
+        self.deleted[list(deleted)] = True
+
+    def close(self):
+        """Unmap the segment's files. None of its arrays may be touched afterwards."""
+        for array in (self.terms, self.starts, self.docs, self.tfs, self.lengths, self.meta, self.meta_offsets,
+                      self.url_keys, self.url_docs):
+            mapping = getattr(array, "_mmap", None)
+            if mapping is not None:
+                mapping.close()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def postings(self, terms: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Positions of `terms` present in this segment with their postings ranges."""
+        if not len(self.terms):
+            empty = np.zeros(len(terms), np.int64)
+            return np.zeros(len(terms), bool), empty, empty
+        position = np.minimum(np.searchsorted(self.terms, terms), len(self.terms) - 1)
+        return self.terms[position] == terms, self.starts[position], self.starts[position + 1]
+
+    def document(self, doc: int) -> dict:
+        return json.loads(bytes(self.meta[self.meta_offsets[doc]:self.meta_offsets[doc + 1]]))
+
+    def find_url(self, url: str) -> Optional[int]:
+        canonical = canonicalize_url(url)
+        key = np.uint64(url_key(url))
+        position = int(np.searchsorted(self.url_keys, key))
+        while position < len(self.url_keys) and self.url_keys[position] == key:
+            doc = int(self.url_docs[position])
+            if not self.deleted[doc] and canonicalize_url(self.document(doc)["url"]) == canonical:
+                return doc
+            position += 1
+        return None
+
+
+class Snapshot:
+    """The segments of one version of the manifest, with the searches currently reading them."""
+
+    def __init__(self, segments: List[Segment] = (), total_docs: int = 0, total_tokens: int = 0):
+        self.segments = list(segments)
+        self.total_docs = total_docs
+        self.total_tokens = total_tokens
+        self.readers = 0
+        self.retired = False
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+
+class LocalIndex:
+    """Read side of a local index: BM25 search and document lookup across all segments.
+
+    Searches may run in several threads. Each one reads a single snapshot of the segments;
+    a refresh swaps in a new snapshot and the old one is unmapped after its last reader.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._snapshot = Snapshot()
+        self._manifest_mtime = None
+        self._lock = threading.Lock()  # guards the snapshot swap and reader counts
+        self.refresh()
+
+    @property
+    def segments(self) -> List[Segment]:
+        return self._snapshot.segments
+
+    @property
+    def total_docs(self) -> int:
+        return self._snapshot.total_docs
+
+    @property
+    def total_tokens(self) -> int:
+        return self._snapshot.total_tokens
+
+    def refresh(self, force: bool = False):
+        """Reopen the segments if the manifest changed since the last look (e.g. after `add`)."""
+        manifest_path = os.path.join(self.path, MANIFEST)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime and not force:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime and not force:
+                return  # another thread reopened it first
+            snapshot, mtime = self._open(manifest_path) if mtime is not None else (Snapshot(), None)
+            # One reference assignment: searches see either the old segment list or the new one
+            retired, self._snapshot, self._manifest_mtime = self._snapshot, snapshot, mtime
+            self._retire(retired)
+
+    def _open(self, manifest_path: str, attempts: int = 3) -> Tuple[Snapshot, int]:
+        """Snapshot of the segments the manifest lists, and the mtime of the manifest that was read."""
+        for attempt in range(attempts):
+            with open(manifest_path, encoding="utf-8") as f:
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+                manifest = json.load(f)
+            deleted = manifest.get("deleted", {})
+            segments = []
+            try:
+                for entry in manifest["segments"]:
+                    segments.append(Segment(os.path.join(self.path, entry["name"]), deleted.get(entry["name"], ())))
+            except FileNotFoundError:
+                # A compaction replaced the manifest and removed these segments meanwhile: read the new one
+                Snapshot(segments).close()
+                if attempt == attempts - 1:
+                    raise
+                continue
+            return Snapshot(
+                segments,
+                sum(entry["docs"] for entry in manifest["segments"]),
+                sum(entry["tokens"] for entry in manifest["segments"]),
+            ), mtime
+
+    def _retire(self, snapshot: Snapshot):
+        """Unmap `snapshot` now if nothing reads it, else when its last reader is done. Needs the lock."""
+        snapshot.retired = True
+        if not snapshot.readers:
+            snapshot.close()
+
+    @contextmanager
+    def _reading(self):
+        """The current snapshot, kept mapped until the block exits."""
+        self.refresh()
+        with self._lock:
+            snapshot = self._snapshot
+            snapshot.readers += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.readers -= 1
+                if snapshot.retired and not snapshot.readers:
+                    snapshot.close()
+
+    def close(self):
+        """Unmap the segments once any running search is done."""
+        with self._lock:
+            retired, self._snapshot, self._manifest_mtime = self._snapshot, Snapshot(), None
+            self._retire(retired)
+
+    def live_docs(self) -> int:
+        return sum(len(segment) - int(segment.deleted.sum()) for segment in self.segments)
+
+    def search(self, query: str, num: int = 5) -> List[dict]:
+        """Top `num` documents for `query` by BM25, best first, each with its score."""
+        with self._reading() as snapshot:
+            return self._search(snapshot, query, num)
+
+    def _search(self, snapshot: Snapshot, query: str, num: int) -> List[dict]:
+        words = sorted(set(tokenize(query)))
+        if not words or not snapshot.total_docs:
+            return []
+        terms = term_ids(words)
+        ranges = [segment.postings(terms) for segment in snapshot.segments]
+
+        # Document frequencies are summed over segments so scores are comparable between them
+        df = np.zeros(len(terms))
+        for present, starts, ends in ranges:
+            df += np.where(present, ends - starts, 0)
+        idf = np.log(1 + (snapshot.total_docs - df + 0.5) / (df + 0.5))
+        avgdl = snapshot.total_tokens / snapshot.total_docs
+
+        best: List[Tuple[float, int, int]] = []  # (score, segment, document)
+        for index, (segment, (present, starts, ends)) in enumerate(zip(snapshot.segments, ranges)):
+            spans = [(starts[i], ends[i], idf[i]) for i in np.flatnonzero(present)]
+            if not spans:
+                continue
+            docs = np.concatenate([segment.docs[start:end] for start, end, _ in spans]).astype(np.int64)
+            tfs = np.concatenate([segment.tfs[start:end] for start, end, _ in spans]).astype(np.float32)
+            weights = np.concatenate([np.full(end - start, weight, np.float32) for start, end, weight in spans])
+            norms = K1 * (1 - B + B * segment.lengths[docs] / avgdl)
+            contributions = weights * tfs * (K1 + 1) / (tfs + norms)
+            if len(docs) * 8 >= len(segment):
+                # Common terms: a dense accumulator over the segment beats sorting the postings
+                candidates = np.arange(len(segment))
+                scores = np.bincount(docs, weights=contributions, minlength=len(segment))
+            else:
+                candidates, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+            scores[segment.deleted[candidates]] = 0.0
+            top = np.argsort(-scores)[:num] if len(scores) <= num else np.argpartition(-scores, num)[:num]
+            best += [(float(scores[i]), index, int(candidates[i])) for i in top if scores[i] > 0]
+
+        best.sort(key=lambda hit: -hit[0])
+        results = []
+        for score, index, doc in best[:num]:
+            document = snapshot.segments[index].document(doc)
+            document["score"] = round(score, 4)
+            results.append(document)
+        return results
+
+    def document(self, url: str) -> Optional[dict]:
+        """Stored title and text of the live document with this URL, if indexed."""
+        with self._reading() as snapshot:
+            for segment in reversed(snapshot.segments):
+                doc = segment.find_url(url)
+                if doc is not None:
+                    return segment.document(doc)
+        return None
+
+
+def _write_segment(index_path: str, name: str, arrays: Dict[str, np.ndarray]):
+    """Write a segment to a temporary directory and rename it into place."""
+    tmp = os.path.join(index_path, f".{name}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for key, array in arrays.items():
+        np.save(os.path.join(tmp, f"{key}.npy"), array)
+    os.replace(tmp, os.path.join(index_path, name))
+
+
+def _segment_arrays(
+    doc_terms: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray, lengths: np.ndarray, metas: List[bytes]
+) -> Dict[str, np.ndarray]:
+    """Term-sorted postings and packed metadata for one segment's documents."""
+    # Stable sort keeps each term's postings in document order
+    order = np.argsort(doc_terms, kind="stable")
+    post_terms = doc_terms[order]
+    boundaries = np.flatnonzero(np.concatenate([[True], post_terms[1:] != post_terms[:-1]])) \
+        if len(post_terms) else np.zeros(0, np.int64)
+    meta_offsets = np.zeros(len(metas) + 1, np.int64)
+    meta_offsets[1:] = np.cumsum([len(meta) for meta in metas])
+    keys = np.array([url_key(json.loads(meta)["url"]) for meta in metas], np.uint64)
+    url_order = np.argsort(keys, kind="stable")
+    return {
+        "terms": post_terms[boundaries].astype(np.uint32),
+        "starts": np.append(boundaries, len(post_terms)).astype(np.int64),
+        "docs": doc_ids[order].astype(np.uint32),
+        "tfs": np.minimum(tfs[order], np.iinfo(np.uint16).max).astype(np.uint16),
+        "lengths": lengths.astype(np.uint32),
+        "meta": np.frombuffer(b"".join(metas), np.uint8),
+        "meta_offsets": meta_offsets,
+        "url_keys": keys[url_order],
+        "url_docs": url_order.astype(np.uint32),
+    }
+
+
+class IndexWriter:
+    """Write side of a local index: adds documents as new segments and compacts them.
+
+    Only one writer should run at a time; searchers may keep running.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"version": 1, "next_segment": 1, "segments": [], "deleted": {}}
+
+    def _save_manifest(self):
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def _next_name(self) -> str:
+        name = f"seg-{self.manifest['next_segment']:06d}"
+        self.manifest["next_segment"] += 1
+        return name
+
+    def add(self, documents: Iterable[dict]) -> int:
+        """Index `{"url", "title", "text"}` documents; a URL already in the index replaces the older copy."""
+        reader = LocalIndex(self.path)
+        added = 0
+        batch: List[dict] = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= SEGMENT_DOCS:
+                added += self._add_segment(batch, reader)
+                # Later batches must also replace copies in the segment just written
+                reader.refresh(force=True)
+                batch = []
+        if batch:
+            added += self._add_segment(batch, reader)
+        return added
+
+    def _add_segment(self, documents: List[dict], reader: LocalIndex) -> int:
+        # The last copy of a URL within the batch wins (matched by canonical URL, like lookups)
+        latest = {canonicalize_url(document["url"]): document for document in documents}
+        documents = list(latest.values())
+        for segment in reader.segments:
+            for url in latest:
+                doc = segment.find_url(url)
+                if doc is not None:
+                    self.manifest["deleted"].setdefault(segment.name, []).append(doc)
+                    segment.deleted[doc] = True
+
+        cache: Dict[str, int] = {}
+        all_terms, all_docs, all_tfs, lengths, metas = [], [], [], [], []
+        for number, document in enumerate(documents):
+            words = tokenize(f"{document.get('title', '')} {document['text']}")
+            terms, tfs = np.unique(term_ids(words, cache), return_counts=True)
+            all_terms.append(terms)
+            all_tfs.append(tfs)
+            all_docs.append(np.full(len(terms), number, np.uint32))
+            lengths.append(len(words))
+            metas.append(json.dumps({
+                "url": document["url"],
+                "title": document.get("title", ""),
+                "text": document["text"][:MAX_STORED_CHARS],
+            }, ensure_ascii=False).encode())
+
+        arrays = _segment_arrays(
+            np.concatenate(all_terms), np.concatenate(all_docs), np.concatenate(all_tfs), np.array(lengths), metas
+        )
+        name = self._next_name()
+        _write_segment(self.path, name, arrays)
+        self.manifest["segments"].append({"name": name, "docs": len(documents), "tokens": int(sum(lengths))})
+        self._save_manifest()
+        return len(documents)
+
+    def compact(self) -> int:
+        """Merge every segment into one, dropping replaced documents. Returns the live document count."""
+        reader = LocalIndex(self.path)
+        if not reader.segments:
+            return 0
+        all_terms, all_docs, all_tfs, lengths, metas = [], [], [], [], []
+        offset = 0
+        for segment in reader.segments:
+            keep = ~segment.deleted
+            renumber = np.cumsum(keep) - 1 + offset
+            post_terms = np.repeat(np.asarray(segment.terms), np.diff(segment.starts))
+            live = keep[segment.docs]
+            all_terms.append(post_terms[live])
+            all_docs.append(renumber[segment.docs[live]])
+            all_tfs.append(np.asarray(segment.tfs)[live])
+            lengths.append(np.asarray(segment.lengths)[keep])
+            metas += [
+                bytes(segment.meta[segment.meta_offsets[doc]:segment.meta_offsets[doc + 1]])
+                for doc in np.flatnonzero(keep)
+            ]
+            offset += int(keep.sum())
+
+        # Postings arrive grouped by segment; the stable sort by term keeps them in new document order
+        arrays = _segment_arrays(
+            np.concatenate(all_terms), np.concatenate(all_docs), np.concatenate(all_tfs),
+            np.concatenate(lengths), metas,
+        )
+        name = self._next_name()
+        _write_segment(self.path, name, arrays)
+        old = [entry["name"] for entry in self.manifest["segments"]]
+        self.manifest["segments"] = [{"name": name, "docs": offset, "tokens": int(arrays["lengths"].sum())}]
+        self.manifest["deleted"] = {}
+        self._save_manifest()
+        # Open searchers keep reading their mapped files until they see the new manifest
+        for segment_name in old:
+            shutil.rmtree(os.path.join(self.path, segment_name), ignore_errors=True)
+        return offset
+
+
+def read_documents(paths: List[str]) -> Iterable[dict]:
+    """Documents from JSONL files ({"url", "title", "text"}) and text/Markdown/HTML files or directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                yield from read_documents(sorted(os.path.join(root, name) for name in files))
+            continue
+        lower = path.lower()
+        if lower.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield {"url": record["url"], "title": record.get("title", ""), "text": record["text"]}
+        elif lower.endswith(TEXT_SUFFIXES + HTML_SUFFIXES):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            url = "file://" + os.path.abspath(path)
+            if lower.endswith(HTML_SUFFIXES):
+                extractor = HTMLTextExtractor(max_chars=len(content))
+                extractor.feed(content)
+                extractor.close()
+                yield {"url": url, "title": extractor.title or os.path.basename(path), "text": extractor.text()}
+            else:
+                first_line = next((line.strip("# ").strip() for line in content.splitlines() if line.strip()), "")
+                yield {"url": url, "title": first_line or os.path.basename(path), "text": content}
+
+
+class LocalSearchClient:
+    """Drop-in for SearchClient that answers from a LocalIndex in SerpAPI's response shape."""
+
+    api_key = None  # no site:/OR operators here, so fact_check falls back to plain searches
+
+    def __init__(self, path: str):
+        self.index = LocalIndex(path)
+        self.stats = {"searches": 0, "results": 0, "documents": 0}
+
+    @classmethod
+    def from_env(cls) -> "LocalSearchClient":
+        return cls(os.getenv("LOCAL_INDEX_PATH", ".local_index"))
+
+    async def search(self, params: dict, timeout: Optional[float] = None) -> dict:
+        """Search the local index; `q` and `num` are used, other SerpAPI parameters are ignored."""
+        query = params.get("q", "")
+        # Page faults on a cold index can block, so keep the event loop free
+        hits = await asyncio.to_thread(self.index.search, query, int(params.get("num", 5)))
+        self.stats["searches"] += 1
+        self.stats["results"] += len(hits)
+        words = tokenize(query)
+        return {
+            "search_metadata": {"status": "Success", "backend": "local"},
+            "organic_results": [
+                {"position": i, "title": hit["title"], "link": hit["url"], "snippet": snippet(hit["text"], words)}
+                for i, hit in enumerate(hits, 1)
+            ],
+        }
+
+    async def document(self, url: str, max_chars: int) -> Optional[Document]:
+        """The indexed copy of a page, so extract_content works without network access."""
+        stored = await asyncio.to_thread(self.index.document, url)
+        if stored is None:
+            return None
+        self.stats["documents"] += 1
+        text = stored["text"]
+        return Document(url=url, title=stored["title"], text=text[:max_chars], truncated=len(text) > max_chars)
+
+    async def aclose(self):
+        self.index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the local BM25 search index.")
+    parser.add_argument("--index", default=os.getenv("LOCAL_INDEX_PATH", ".local_index"), help="index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="index JSONL files, text/Markdown/HTML files or directories")
+    add.add_argument("paths", nargs="+")
+    search = commands.add_parser("search", help="run a query and print the top results")
+    search.add_argument("query")
+    search.add_argument("--num", type=int, default=5)
+    commands.add_parser("compact", help="merge segments and drop replaced documents")
+    commands.add_parser("stats", help="show segment and document counts")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "add":
+        added = IndexWriter(args.index).add(read_documents(args.paths))
+        print(f"Indexed {added} documents in {time.perf_counter() - started:.2f}s")
+    elif args.command == "compact":
+        live = IndexWriter(args.index).compact()
+        print(f"Compacted to one segment of {live} documents in {time.perf_counter() - started:.2f}s")
+    elif args.command == "search":
+        hits = LocalIndex(args.index).search(args.query, args.num)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for i, hit in enumerate(hits, 1):
+            print(f"{i}. [{hit['score']}] {hit['title']}\n   {hit['url']}\n   {snippet(hit['text'], tokenize(args.query))}")
+        print(f"({len(hits)} results in {elapsed_ms:.1f} ms including index open)")
+    else:
+        index = LocalIndex(args.index)
+        if not index.segments:
+            print(f"No index at {args.index}")
+            sys.exit(1)
+        print(f"{index.live_docs()} live documents in {len(index.segments)} segments, "
+              f"avg {index.total_tokens / max(index.total_docs, 1):.0f} tokens/document")
+        for segment in index.segments:
+            print(f"  {segment.name}: {len(segment)} documents ({int(segment.deleted.sum())} replaced), "
+                  f"{len(segment.terms)} terms, {len(segment.docs)} postings")
+
+
+if __name__ == "__main__":
+    main()
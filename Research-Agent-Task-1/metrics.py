@@ -0,0 +1,269 @@
+"""In-process metrics for tools, upstream calls, model usage and caches.
+
+Counters and latency histograms are kept in memory (a dict update per event,
+cheap enough for the hot path) and rendered in the Prometheus text format,
+either on demand (`registry.render()`, the REPL's METRICS command,
+`batch.py --metrics`) or from a local HTTP endpoint when METRICS_PORT is set.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Seconds; spans a cached lookup (~ms) to a slow multi-tool research run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns (name, labels, value) samples read from a component's own stats at render time
+Collector = Callable[[], Iterable[Tuple[str, dict, float]]]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def _key(labels: dict) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """Registry of labelled counters and histograms, plus collectors for component stats."""
+
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._collectors: Dict[str, Collector] = {}
+        # The HTTP endpoint renders from another thread
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help: str):
+        self._help[name] = (kind, help)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the duration of the `with` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def set_collector(self, component: str, collector: Collector):
+        """Register (or replace, when a component is rebuilt) the collector for `component`."""
+        self._collectors[component] = collector
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_key(labels), 0.0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name, {}).get(_key(labels))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        gauges: Dict[str, Dict[Labels, float]] = {}
+        for collector in list(self._collectors.values()):
+            for name, labels, value in collector():
+                gauges.setdefault(name, {})[_key(labels)] = value
+
+        lines = []
+        with self._lock:
+            for name, series in sorted({**self._counters, **gauges}.items()):
+                kind, help = self._help.get(name, ("gauge" if name in gauges else "counter", ""))
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_format_labels(labels)} {value:g}" for labels, value in sorted(series.items())]
+            for name, series in sorted(self._histograms.items()):
+                lines += [f"# HELP {name} {self._help.get(name, ('', ''))[1]}", f"# TYPE {name} histogram"]
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        le = bound if isinstance(bound, str) else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Short human-readable digest: per-series p50/p95 of each histogram, then counters."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                for labels, histogram in sorted(series.items()):
+                    lines.append(
+                        f"{name}{_format_labels(labels)}: n={histogram.count} "
+                        f"p50={histogram.quantile(0.5):.3f}s p95={histogram.quantile(0.95):.3f}s"
+                    )
+            for name, series in sorted(self._counters.items()):
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)}: {value:g}")
+        return "\n".join(lines)
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Expose GET /metrics on a background thread and return the server."""
+        # Imported here: http.server is only needed when the endpoint is enabled
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Process-wide registry shared by the tools, clients and entry points
+registry = Metrics()
+registry.describe("research_tool_calls_total", "counter", "Tool invocations by tool")
+registry.describe("research_tool_errors_total", "counter", "Tool invocations that failed, by tool")
+registry.describe("research_tool_latency_seconds", "histogram", "Tool latency by tool")
+registry.describe("research_upstream_requests_total", "counter", "Upstream HTTP requests by upstream and status")
+registry.describe("research_upstream_latency_seconds", "histogram", "Upstream HTTP latency by upstream")
+registry.describe("research_model_requests_total", "counter", "Model requests made by agent runs")
+registry.describe("research_model_tokens_total", "counter", "Model tokens used by agent runs, by kind")
+registry.describe("research_runs_total", "counter", "Agent runs by mode")
+registry.describe("research_run_seconds", "histogram", "End-to-end agent run latency by mode")
+registry.describe("research_route_runs_total", "counter", "Agent runs by router route")
+registry.describe("research_route_seconds", "histogram", "Agent run latency by router route")
+registry.describe("research_route_tokens_total", "counter", "Model tokens used by router route and kind")
+registry.describe("research_jobs_total", "counter", "Job service jobs finished, by status")
+registry.describe("research_job_wait_seconds", "histogram", "Time job service jobs spent queued")
+registry.describe("research_jobs_queued", "gauge", "Job service jobs waiting for a worker")
+registry.describe("research_jobs_running", "gauge", "Job service jobs running")
+registry.describe("research_cache_hit_ratio", "gauge", "Fraction of lookups answered from each cache")
+registry.describe("research_component_events", "gauge", "Event counts reported by caches and clients")
+
+_server = None
+
+
+def serve_from_env():
+    """Start the /metrics endpoint once if METRICS_PORT is set (empty or 0 = off)."""
+    global _server
+    port = int(os.getenv("METRICS_PORT") or 0)
+    if port and _server is None:
+        _server = registry.serve(port)
+
+
+def instrument_tool(tool):
+    """Count calls and errors of an async tool and record its latency.
+
+    Tools catch their own exceptions and return an error message, so they
+    report errors themselves via `tool_error(name)`; exceptions that escape are
+    counted here too.
+    """
+    name = tool.__name__
+
+    @functools.wraps(tool)
+    async def wrapper(*args, **kwargs):
+        registry.inc("research_tool_calls_total", tool=name)
+        started = time.perf_counter()
+        try:
+            return await tool(*args, **kwargs)
+        except Exception:
+            tool_error(name)
+            raise
+        finally:
+            registry.observe("research_tool_latency_seconds", time.perf_counter() - started, tool=name)
+
+    return wrapper
+
+
+def tool_error(name: str):
+    registry.inc("research_tool_errors_total", tool=name)
+
+
+def record_run(usage, seconds: float, mode: str, route: Optional[str] = None):
+    """Record one finished agent run and its model usage (a pydantic-ai RunUsage), per router route if given."""
+    registry.inc("research_runs_total", mode=mode)
+    registry.observe("research_run_seconds", seconds, mode=mode)
+    registry.inc("research_model_requests_total", usage.requests)
+    registry.inc("research_model_tokens_total", usage.input_tokens or 0, kind="input")
+    registry.inc("research_model_tokens_total", usage.output_tokens or 0, kind="output")
+    if route is not None:
+        registry.inc("research_route_runs_total", route=route)
+        registry.observe("research_route_seconds", seconds, route=route)
+        registry.inc("research_route_tokens_total", usage.input_tokens or 0, route=route, kind="input")
+        registry.inc("research_route_tokens_total", usage.output_tokens or 0, route=route, kind="output")
+
+
+def expose_stats(component: str, stats: dict, hit_rate: Optional[Callable[[], float]] = None):
+    """Publish a component's `stats` dict (and optional hit rate) as gauges, read at render time."""
+    def collect():
+        for event, value in list(stats.items()):
+            yield "research_component_events", {"component": component, "event": event}, value
+        if hit_rate is not None:
+            yield "research_cache_hit_ratio", {"cache": component}, hit_rate()
+    registry.set_collector(component, collect)
@@ -0,0 +1,298 @@
+import asyncio
+import codecs
+import ipaddress
+import os
+import socket
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import List, Optional
+
+import httpcore
+import httpx
+
+import metrics
+
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+# Tags whose text never belongs in the extracted document
+SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "head", "nav", "footer", "form", "iframe"}
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article", "main", "header",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "dd", "dt",
+}
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be fetched or has no extractable text."""
+
+
+def is_public_address(address) -> bool:
+    """False for loopback, private, link-local (including cloud metadata at 169.254.169.254) and reserved ranges."""
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global
+
+
+async def resolve_host(host: str, port: int) -> List[str]:
+    """Addresses for `host` from the system resolver."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+class PinnedAddressBackend(httpcore.AsyncNetworkBackend):
+    """Resolves each connection's host once, refuses non-public addresses and connects to the address it checked.
+
+    Checking and connecting with the same lookup leaves no room for DNS rebinding, which
+    a separate check before the request would. Only the TCP target changes: the Host
+    header and TLS server name still use the hostname.
+    """
+
+    def __init__(self, resolve=resolve_host, allow_private: bool = False, backend=None):
+        self.resolve = resolve
+        self.allow_private = allow_private
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        host = host.strip("[]").rstrip(".")
+        try:
+            addresses = [ipaddress.ip_address(host)]
+        except ValueError:
+            try:
+                found = await asyncio.wait_for(self.resolve(host, port), timeout)
+            except (OSError, asyncio.TimeoutError) as error:
+                raise FetchError(f"Cannot resolve {host}: {error or 'timed out'}") from error
+            addresses = [ipaddress.ip_address(address.split("%")[0]) for address in found]
+        if not addresses:
+            raise FetchError(f"Cannot resolve {host}")
+        if not self.allow_private:
+            for address in addresses:
+                if not is_public_address(address):
+                    raise FetchError(f"Refusing to fetch non-public address {address} for {host}")
+        return await self._backend.connect_tcp(
+            str(addresses[0]), port, timeout=timeout, local_address=local_address, socket_options=socket_options
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise FetchError("Unix sockets cannot be fetched")
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+@dataclass
+class Document:
+    url: str
+    title: str
+    text: str
+    truncated: bool = False
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Incremental HTML-to-text parser that stops collecting once it has enough text."""
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.title = ""
+        self._parts: List[str] = []
+        self._length = 0
+        self._skip_depth = 0
+        self._in_title = False
+        self._space = False
+
+    @property
+    def done(self) -> bool:
+        return self._length >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title + " " + " ".join(data.split())).strip()
+            return
+        if self._skip_depth or self.done:
+            return
+        words = " ".join(data.split())
+        if not words:
+            self._space = True
+            return
+        # Chunks may split a word, so only separate where the source had whitespace
+        if self._parts and not self._parts[-1].endswith("\n") and (self._space or data[0].isspace()):
+            words = " " + words
+        self._space = data[-1].isspace()
+        self._parts.append(words)
+        self._length += len(words)
+
+    def _newline(self):
+        if self._parts and not self._parts[-1].endswith("\n"):
+            self._parts.append("\n")
+            self._length += 1
+
+    def text(self) -> str:
+        return "".join(self._parts).strip()[: self.max_chars]
+
+
+class PageFetcher:
+    """Streams web pages and extracts their text, caching documents by URL with revalidation."""
+
+    def __init__(
+        self,
+        max_bytes: int = 1_000_000,
+        max_chars: int = 6000,
+        timeout: float = 10.0,
+        max_cached: int = 256,
+        max_redirects: int = 5,
+        allow_private: bool = False,
+        resolve=resolve_host,
+    ):
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.max_cached = max_cached
+        self.max_redirects = max_redirects
+        # allow_private is only for tests and trusted intranet deployments; see PinnedAddressBackend
+        self.allow_private = allow_private
+        self.resolve = resolve
+        # url -> (etag, last_modified, Document)
+        self._documents: "OrderedDict[str, tuple]" = OrderedDict()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "PageFetcher":
+        """Build a fetcher configured from PAGE_FETCH_* environment variables."""
+        return cls(
+            max_bytes=int(os.getenv("PAGE_FETCH_MAX_BYTES", "1000000")),
+            max_chars=int(os.getenv("PAGE_FETCH_MAX_CHARS", "6000")),
+            timeout=float(os.getenv("PAGE_FETCH_TIMEOUT", "10")),
+            max_redirects=int(os.getenv("PAGE_FETCH_MAX_REDIRECTS", "5")),
+            allow_private=os.getenv("PAGE_FETCH_ALLOW_PRIVATE", "0") == "1",
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, rebuilding it if the event loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            transport = httpx.AsyncHTTPTransport()
+            # httpx has no public hook for the network backend its connection pool uses
+            transport._pool._network_backend = PinnedAddressBackend(self.resolve, self.allow_private)
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                # A proxy from the environment would connect on our behalf and bypass the address check
+                trust_env=False,
+                timeout=self.timeout,
+                # Redirects are followed by hand so each hop's scheme is checked too
+                follow_redirects=False,
+                headers={"User-Agent": "ResearchAgent/1.0 (+text extraction)"},
+            )
+            self._loop = loop
+        return self._client
+
+    async def fetch(self, url: str) -> Document:
+        """Fetch a page and return its extracted text, reusing the cached copy if unchanged."""
+        headers = {"Accept": "text/html,application/xhtml+xml,text/plain;q=0.8"}
+        cached = self._documents.get(url)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = await self._open(url, headers)
+        try:
+            if response.status_code == 304 and cached is not None:
+                self._documents.move_to_end(url)
+                return cached[2]
+            if response.status_code >= 400:
+                raise FetchError(f"HTTP {response.status_code}")
+
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in TEXT_CONTENT_TYPES:
+                raise FetchError(f"Unsupported content type: {content_type}")
+
+            document = await self._read_document(url, response, content_type == "text/plain")
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+        finally:
+            await response.aclose()
+
+        if etag or last_modified:
+            self._documents[url] = (etag, last_modified, document)
+            self._documents.move_to_end(url)
+            while len(self._documents) > self.max_cached:
+                self._documents.popitem(last=False)
+        return document
+
+    async def _open(self, url: str, headers: dict) -> httpx.Response:
+        """Send the request with a streamed body, following redirects (each connection goes through PinnedAddressBackend)."""
+        client = self._get_client()
+        for _ in range(self.max_redirects + 1):
+            if not url.startswith(("http://", "https://")):
+                raise FetchError("Only http(s) URLs can be fetched")
+            started = time.perf_counter()
+            response = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+            # Time to response headers; the body is streamed only as far as it is needed
+            metrics.registry.observe("research_upstream_latency_seconds", time.perf_counter() - started, upstream="page")
+            metrics.registry.inc("research_upstream_requests_total", upstream="page", status=response.status_code)
+            if not response.has_redirect_location:
+                return response
+            url = str(response.next_request.url)
+            await response.aclose()
+        raise FetchError("Too many redirects")
+
+    async def _read_document(self, url: str, response: httpx.Response, plain_text: bool) -> Document:
+        """Decode and parse the body chunk by chunk, stopping at the byte or text cap."""
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        extractor = HTMLTextExtractor(self.max_chars)
+        received = 0
+        truncated = False
+
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received > self.max_bytes:
+                chunk = chunk[: len(chunk) - (received - self.max_bytes)]
+                truncated = True
+            text = decoder.decode(chunk)
+            if plain_text:
+                extractor.handle_data(text)
+            else:
+                extractor.feed(text)
+            if truncated or extractor.done:
+                # Leaving the stream early closes the connection without downloading the rest
+                truncated = True
+                break
+
+        if not truncated:
+            tail = decoder.decode(b"", final=True)
+            if plain_text:
+                extractor.handle_data(tail)
+            else:
+                extractor.feed(tail)
+                extractor.close()
+        return Document(url=url, title=extractor.title, text=extractor.text(), truncated=truncated)
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
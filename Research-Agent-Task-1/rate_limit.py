@@ -0,0 +1,54 @@
+import asyncio
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every coroutine in the process."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Plain lock: the bucket is process-wide and may outlive any one event loop
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TokenBucket":
+        """Build a limiter from SERP_API_RATE (requests/second) and SERP_API_BURST."""
+        rate = float(os.getenv("SERP_API_RATE", "5"))
+        burst = float(os.getenv("SERP_API_BURST", "10"))
+        return cls(rate=rate, capacity=burst)
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens from the bucket and return how long the caller must wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative reserves future tokens, so waiters are served in arrival order
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def _refund(self, tokens: float):
+        """Give back tokens reserved by a caller that stopped waiting."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until the bucket can cover `tokens` requests."""
+        if self.rate <= 0:
+            return
+        delay = self._reserve(tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._refund(tokens)
+                raise
+
+
+# Process-wide limiter for SerpAPI calls made by any tool or session
+search_limiter = TokenBucket.from_env()
@@ -0,0 +1,185 @@
+import asyncio
+import math
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when one upstream attempt runs past its deadline."""
+
+
+class LatencyTracker:
+    """Sliding window of recent upstream latencies (seconds) with nearest-rank percentiles."""
+
+    def __init__(self, window: int = 256):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        rank = math.ceil(pct / 100 * len(ordered))
+        return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class Resilience:
+    """Deadlines, hedging and retries for calls to a flaky, long-tailed upstream.
+
+    - Each attempt gets a deadline of `deadline_factor` x the observed p99,
+      clamped to [`min_deadline`, `max_deadline`].
+    - If an attempt is still running after the observed `hedge_percentile`
+      latency, an identical hedge request is sent and the first success wins
+      (the other is cancelled).
+    - Failed rounds are retried up to `retries` times with full-jitter
+      exponential backoff.
+    - `total_deadline` (if set) caps the whole call, attempts and backoff
+      included, so retries cannot add up to more than one budget.
+
+    Until `min_samples` latencies have been observed, attempts use
+    `max_deadline` and are not hedged.
+    """
+
+    def __init__(
+        self,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0,
+        hedge: bool = True,
+        hedge_percentile: float = 95.0,
+        deadline_factor: float = 3.0,
+        min_deadline: float = 1.0,
+        max_deadline: float = 10.0,
+        min_samples: int = 20,
+        window: int = 256,
+        total_deadline: Optional[float] = None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.deadline_factor = deadline_factor
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.min_samples = min_samples
+        self.total_deadline = total_deadline
+        self.latency = LatencyTracker(window)
+        self.stats = {"attempts": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "retries": 0, "failures": 0}
+        self._random = random.Random()
+
+    @classmethod
+    def from_env(cls, max_deadline: float = 10.0) -> "Resilience":
+        """Build the policy from SEARCH_RETRIES, SEARCH_RETRY_BACKOFF, SEARCH_HEDGE and SEARCH_DEADLINE_* variables."""
+        return cls(
+            retries=int(os.getenv("SEARCH_RETRIES", "2")),
+            backoff=float(os.getenv("SEARCH_RETRY_BACKOFF", "0.2")),
+            max_backoff=float(os.getenv("SEARCH_RETRY_BACKOFF_MAX", "2.0")),
+            hedge=os.getenv("SEARCH_HEDGE", "1").lower() not in ("0", "false", "no", "off"),
+            hedge_percentile=float(os.getenv("SEARCH_HEDGE_PERCENTILE", "95")),
+            deadline_factor=float(os.getenv("SEARCH_DEADLINE_FACTOR", "3")),
+            min_deadline=float(os.getenv("SEARCH_DEADLINE_MIN", "1.0")),
+            max_deadline=max_deadline,
+            total_deadline=float(os.getenv("SEARCH_TOTAL_DEADLINE", str(2 * max_deadline))) or None,
+        )
+
+    def warmed_up(self) -> bool:
+        return len(self.latency) >= self.min_samples
+
+    def deadline(self) -> float:
+        """Deadline for the next attempt, adapted to the observed tail latency."""
+        if not self.warmed_up():
+            return self.max_deadline
+        adaptive = self.latency.percentile(99) * self.deadline_factor
+        return min(self.max_deadline, max(self.min_deadline, adaptive))
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before sending a hedge request (None = do not hedge)."""
+        if not self.hedge or not self.warmed_up():
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def timed(self, awaitable: Awaitable[T], deadline: Optional[float] = None) -> T:
+        """Await one upstream attempt under a deadline and record its latency."""
+        deadline = deadline if deadline is not None else self.deadline()
+        self.stats["attempts"] += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(awaitable, deadline)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            # A timeout is a lower bound on this latency; recording it lets the deadline grow back
+            self.latency.record(deadline)
+            raise DeadlineExceeded(f"no response within {deadline:.2f}s") from None
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def call(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        retry_on: Tuple[Type[BaseException], ...] = (DeadlineExceeded,),
+        should_retry: Callable[[BaseException], bool] = lambda error: True,
+    ) -> T:
+        """Run `attempt()` with hedging, retrying failures matching `retry_on` and `should_retry`."""
+        retry = 0
+        give_up_at = time.monotonic() + self.total_deadline if self.total_deadline else None
+        while True:
+            try:
+                if give_up_at is None:
+                    return await self._hedged(attempt)
+                try:
+                    return await asyncio.wait_for(self._hedged(attempt), max(0.0, give_up_at - time.monotonic()))
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    raise DeadlineExceeded(f"no response within the {self.total_deadline:.2f}s total deadline") from None
+            except retry_on as error:
+                out_of_time = give_up_at is not None and time.monotonic() >= give_up_at
+                if retry >= self.retries or out_of_time or not should_retry(error):
+                    self.stats["failures"] += 1
+                    raise
+            # Full jitter keeps retries from many sessions from arriving in lockstep
+            self.stats["retries"] += 1
+            pause = self._random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+            if give_up_at is not None:
+                pause = min(pause, max(0.0, give_up_at - time.monotonic()))
+            await asyncio.sleep(pause)
+            retry += 1
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run `attempt()`, adding one hedge request if it is slower than the hedge delay."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await attempt()
+
+        primary = asyncio.ensure_future(attempt())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.stats["hedges"] += 1
+                tasks.append(asyncio.ensure_future(attempt()))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,109 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+SIMPLE, FULL = "simple", "full"
+ALL_TOOLS = ("search_web", "extract_content", "fact_check")
+
+# Phrases that call for several sources, synthesis or a verdict (one pattern per kind of work)
+_COMPLEX_PATTERNS = [re.compile(pattern) for pattern in (
+    r"\b(compar\w*|versus|vs\.?|difference between|pros and cons|trade-?offs?|advantages|disadvantages)\b",
+    r"\b(impacts?|effects? of|implications|consequences|causes? of|relationship between)\b",
+    r"\b(analy[sz]\w*|evaluat\w*|assess\w*|critique|review of|in-depth|comprehensive|detailed)\b",
+    r"\b(trends?|history of|evolution of|state of|future of|outlook|forecasts?|predict\w*|latest research)\b",
+    r"\b(why|how does|how do|how can|how should|explain\w*|strateg\w*)\b",
+)]
+# Verifying a claim needs fact_check, which the simple route does not offer
+_VERIFY = re.compile(r"\b(fact[- ]?check\w*|is it true|true that|verify|debunk\w*|myths?|hoax|claims?|misinformation)\b")
+# One-fact lookups
+_SIMPLE = re.compile(
+    r"^(who (is|was|are)|what (is|was|are) the (capital|population|price|height|age|date|name)|"
+    r"when (is|was|did|does)|where (is|was)|how (many|much|old|tall|far|long)|define|definition of|"
+    r"what does \S+ stand for|what time|what year)\b"
+)
+
+
+def complexity(query: str) -> int:
+    """Rough cost of answering `query`: 0-1 is a single-fact lookup, 2+ needs the full tool set."""
+    text = query.lower().strip()
+    words = len(text.split())
+    score = (words > 12) + (words > 25)
+    kinds = sum(1 for pattern in _COMPLEX_PATTERNS if pattern.search(text))
+    score += 2 * min(kinds, 1) + max(kinds - 1, 0)
+    if _VERIFY.search(text):
+        score += 3
+    # Several questions or clauses in one message
+    score += max(text.count("?") - 1, 0) + text.count(";")
+    if _SIMPLE.match(text):
+        score -= 1
+    return max(score, 0)
+
+
+@dataclass
+class Route:
+    """A model configuration and the tools it is offered."""
+    name: str
+    model: Any  # model name, or a pydantic-ai Model (e.g. a FunctionModel stub in benchmarks)
+    tools: Tuple[str, ...] = ALL_TOOLS
+    instructions: str = ""  # appended to the system prompt for runs on this route
+    settings: Dict[str, Any] = field(default_factory=dict)  # pydantic-ai ModelSettings
+
+    def run_kwargs(self) -> dict:
+        """Keyword arguments for Agent.run / run_stream."""
+        return {"model": self.model, "model_settings": self.settings or None}
+
+
+class Router:
+    """Sends simple lookups to a faster, cheaper model with a reduced tool set, the rest to the full setup.
+
+    Classification is local (a few regular expressions, microseconds per query).
+    A follow-up stays on the full route once its conversation has used it,
+    since it usually builds on the earlier research. A simple-route answer that
+    is not good enough (see `escalation`) is redone on the full route.
+    """
+
+    def __init__(self, simple: Route, full: Route, threshold: int = 2, enabled: bool = True):
+        self.routes = {SIMPLE: simple, FULL: full}
+        self.threshold = threshold
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls, full_model: Any) -> "Router":
+        """Build the routes from RESEARCH_MODEL, SIMPLE_MODEL, SIMPLE_MAX_TOKENS and ROUTER_* variables."""
+        simple_tools = tuple(name.strip() for name in os.getenv("SIMPLE_TOOLS", "search_web").split(",") if name.strip())
+        max_tokens = int(os.getenv("SIMPLE_MAX_TOKENS", "1024"))
+        return cls(
+            simple=Route(
+                SIMPLE,
+                os.getenv("SIMPLE_MODEL", "google-gla:gemini-2.5-flash-lite"),
+                tools=simple_tools,
+                instructions=(
+                    "This is a simple lookup: answer it from one or two searches, "
+                    "without reading whole pages, and keep the summary short."
+                ),
+                settings={"max_tokens": max_tokens} if max_tokens else {},
+            ),
+            full=Route(FULL, os.getenv("RESEARCH_MODEL", full_model)),
+            threshold=int(os.getenv("ROUTER_THRESHOLD", "2")),
+            enabled=os.getenv("ROUTER", "1").lower() not in ("0", "false", "no", "off"),
+        )
+
+    def choose(self, query: str, previous: Optional[str] = None) -> Route:
+        """Route for `query`; `previous` is the route of the conversation's last turn, if any."""
+        if not self.enabled or previous == FULL or complexity(query) >= self.threshold:
+            return self.routes[FULL]
+        return self.routes[SIMPLE]
+
+    def escalation(self, output: Any, messages: list) -> Optional[str]:
+        """Why a simple-route answer should be redone on the full route, or None if it stands.
+
+        `messages` are the run's new messages: one cut off at the token limit means
+        the answer may be truncated. Output validation failures raise instead and are
+        escalated by the caller.
+        """
+        if any(getattr(message, "finish_reason", None) == "length" for message in messages):
+            return "token limit"
+        if str(getattr(output, "confidence", "")).lower() == "low":
+            return "low confidence"
+        return None
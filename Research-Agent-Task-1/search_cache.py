@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Disk pruning runs once every this many writes
+PRUNE_EVERY = 64
+
+# Params that never change the results (the key is not stored either)
+IGNORED_PARAMS = {"api_key", "output"}
+# Country and language codes, which SerpAPI accepts in any case
+CASELESS_PARAMS = {"gl", "hl"}
+# Google only treats these as operators when written in capitals ("a OR b" vs "a or b")
+QUERY_OPERATORS = re.compile(r"(OR|AND|NOT|AROUND\(\d+\))")
+
+
+def make_cache_key(params: dict) -> str:
+    """Build a cache key from the search params, normalized only where the results cannot differ.
+
+    Whitespace is collapsed everywhere. The query is casefolded except for its
+    uppercase operators, and gl/hl are lowercased; other params (location, tbs,
+    uule, ...) keep their case.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if value is None or name in IGNORED_PARAMS:
+            continue
+        words = str(value).split()
+        if name == "q":
+            words = [word if QUERY_OPERATORS.fullmatch(word) else word.casefold() for word in words]
+        elif name in CASELESS_PARAMS:
+            words = [word.lower() for word in words]
+        normalized[name] = " ".join(words)
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+
+class SearchCache:
+    """Search result cache with an in-memory LRU tier backed by an on-disk SQLite tier."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 3600.0,
+        max_entries: int = 512,
+        max_disk_entries: int = 50000,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()  # memory tier and stats
+        self._db_lock = threading.Lock()  # the SQLite connection, so disk I/O never holds up memory hits
+        self._writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS search_cache_accessed ON search_cache(accessed)")
+
+    @classmethod
+    def from_env(cls) -> "SearchCache":
+        """Build a cache configured from SEARCH_CACHE_* environment variables."""
+        path = os.getenv("SEARCH_CACHE_PATH", ".search_cache.sqlite3")
+        return cls(
+            path=path or None,  # SEARCH_CACHE_PATH= (empty) keeps the cache in memory only
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "512")),
+            max_disk_entries=int(os.getenv("SEARCH_CACHE_DISK_SIZE", "50000")),
+        )
+
+    def get(self, params: dict) -> Optional[dict]:
+        """Return the cached result for these search params, or None on a miss."""
+        if self.ttl <= 0:
+            return None
+        key = make_cache_key(params)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, created FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                fresh = row is not None and now - row[1] < self.ttl
+                if fresh:
+                    value = json.loads(row[0])
+                    self._db.execute("UPDATE search_cache SET accessed = ? WHERE key = ?", (now, key))
+                elif row is not None:
+                    self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+            with self._lock:
+                if fresh:
+                    self._remember(key, row[1], value)
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return value
+                if row is not None:
+                    self.stats["expired"] += 1
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, params: dict, value: dict):
+        """Store a search result in both tiers."""
+        if self.ttl <= 0:
+            return
+        key = make_cache_key(params)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            data = json.dumps(value)
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, data, now, now),
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune_disk(now)
+
+    async def aget(self, params: dict) -> Optional[dict]:
+        """get() for the event loop: memory hits are answered inline, disk lookups run in a worker thread."""
+        if self._db is None or make_cache_key(params) in self._memory:
+            return self.get(params)
+        return await asyncio.to_thread(self.get, params)
+
+    async def aset(self, params: dict, value: dict):
+        """set() for the event loop; the SQLite write and commit run in a worker thread."""
+        if self._db is None or self.ttl <= 0:
+            self.set(params, value)
+        else:
+            await asyncio.to_thread(self.set, params, value)
+
+    def _remember(self, key: str, created: float, value: dict):
+        """Put an entry in the memory tier, evicting the least recently used ones."""
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _prune_disk(self, now: float):
+        """Drop expired rows and keep the disk tier under its size limit."""
+        cursor = self._db.execute("DELETE FROM search_cache WHERE created < ?", (now - self.ttl,))
+        expired = max(cursor.rowcount, 0)
+        (count,) = self._db.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        overflow = max(count - self.max_disk_entries, 0)
+        if overflow:
+            self._db.execute(
+                "DELETE FROM search_cache WHERE key IN "
+                "(SELECT key FROM search_cache ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            )
+        with self._lock:
+            self.stats["expired"] += expired
+            self.stats["evictions"] += overflow
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self):
+        """Close the SQLite tier."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
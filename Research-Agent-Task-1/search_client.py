@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+
+import metrics
+from rate_limit import TokenBucket
+from resilience import DeadlineExceeded, Resilience
+from search_cache import SearchCache, make_cache_key
+from singleflight import SingleFlight
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+
+
+class SearchError(Exception):
+    """Raised when the search endpoint rejects a request."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """Rate limiting and server errors are transient; other rejections are not."""
+        return self.status_code is not None and (self.status_code == 429 or self.status_code >= 500)
+
+
+def _retryable(error: BaseException) -> bool:
+    return not isinstance(error, SearchError) or error.retryable
+
+
+class SearchClient:
+    """Async SerpAPI client that shares one keep-alive connection pool."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        cache: Optional[SearchCache] = None,
+        limiter: Optional[TokenBucket] = None,
+        resilience: Optional[Resilience] = None,
+    ):
+        self.api_key = api_key
+        self.cache = cache
+        self.limiter = limiter
+        self.singleflight = SingleFlight()
+        # Point SERP_API_ENDPOINT at a local fake server to run without SerpAPI
+        self.endpoint = endpoint or os.getenv("SERP_API_ENDPOINT", SERPAPI_ENDPOINT)
+        self.timeout = timeout or float(os.getenv("SERP_API_TIMEOUT", "10"))
+        # Adaptive per-attempt deadlines (capped at the client timeout), hedging and retries
+        self.resilience = resilience or Resilience.from_env(max_deadline=self.timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=30.0,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, rebuilding it if the event loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # A pool is bound to the loop it was created on (asyncio.run makes a new one)
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            )
+            self._loop = loop
+        return self._client
+
+    async def search(self, params: dict, timeout: Optional[float] = None) -> dict:
+        """Run a Google search and return the SerpAPI JSON payload as a dict."""
+        if self.cache is not None:
+            cached = await self.cache.aget(params)
+            if cached is not None:
+                return cached
+
+        # Identical searches already in flight share one upstream call
+        return await self.singleflight.do(
+            make_cache_key(params), lambda: self._fetch(params, timeout)
+        )
+
+    async def _fetch(self, params: dict, timeout: Optional[float]) -> dict:
+        """Call the search endpoint (with hedging and retries) and store the result in the cache."""
+        query = {"engine": "google", "output": "json", **params}
+        if self.api_key:
+            query["api_key"] = self.api_key
+
+        results = await self.resilience.call(
+            lambda: self._attempt(query, timeout),
+            retry_on=(DeadlineExceeded, httpx.TransportError, SearchError),
+            should_retry=_retryable,
+        )
+        if self.cache is not None:
+            await self.cache.aset(params, results)
+        return results
+
+    async def _attempt(self, query: dict, timeout: Optional[float]) -> dict:
+        """One upstream request under the current deadline."""
+        # Only upstream calls count against the provider quota (hedges and retries included)
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        # The deadline starts after the limiter wait, so queueing for quota is not mistaken for a slow upstream
+        started = time.perf_counter()
+        try:
+            response = await self.resilience.timed(self._get_client().get(self.endpoint, params=query), timeout)
+        except (DeadlineExceeded, httpx.TransportError) as e:
+            status = "timeout" if isinstance(e, DeadlineExceeded) else "error"
+            metrics.registry.inc("research_upstream_requests_total", upstream="serpapi", status=status)
+            raise
+        metrics.registry.observe("research_upstream_latency_seconds", time.perf_counter() - started, upstream="serpapi")
+        metrics.registry.inc("research_upstream_requests_total", upstream="serpapi", status=response.status_code)
+        try:
+            results = response.json()
+        except ValueError:
+            raise SearchError(
+                f"Invalid JSON from search endpoint (HTTP {response.status_code})", response.status_code
+            ) from None
+
+        # SerpAPI reports "no results" as a 200 with an error field; keep that as an empty result
+        if response.status_code != 200:
+            raise SearchError(results.get("error", f"HTTP {response.status_code}"), response.status_code)
+        return results
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    """One in-flight upstream call and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single upstream call.
+
+    Every caller gets the shared result or exception. When all callers have been
+    cancelled, the upstream call is cancelled too.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"upstream": 0, "shared": 0, "cancelled": 0}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` for `key`, or join the call already in flight for it."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.stats["upstream"] += 1
+        else:
+            self.stats["shared"] += 1
+
+        call.waiters += 1
+        try:
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # Last waiter gone: stop the upstream call and let new callers start afresh
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+                self.stats["cancelled"] += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finished(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            # Mark the exception retrieved even if every waiter has gone away
+            call.task.exception()
@@ -0,0 +1,124 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only identify the click, never the content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "_ga", "_gl", "spm", "cmpid", "ncid", "sr_share",
+}
+TRACKING_PREFIXES = ("utm_", "hsa_", "pk_", "mtm_")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+SOURCE_ID = re.compile(r"^\[?(S\d+)\]?(?!\w)")  # "S3", "[S3]", "S3 (Reuters)"
+
+
+def _is_tracking(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so trivially different copies of the same page compare equal.
+
+    Lowercases scheme and host, drops "www.", default ports, fragments, tracking
+    parameters and trailing slashes, and sorts the remaining query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/")
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(name)
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def source_key(url: str) -> str:
+    """Identity of a source: the canonical URL without its scheme, so http and https copies match."""
+    return canonicalize_url(url).split("://", 1)[-1]
+
+
+@dataclass
+class Source:
+    id: str
+    url: str  # as first seen (https if any copy was), never the canonical form: that is only the dedupe key
+    title: str = ""
+
+
+class SourceIndex:
+    """Sources seen during one research session, each with a short stable ID (S1, S2, ...).
+
+    Tools register every URL they return. The first time a source is shown it
+    is returned in full; later copies are referred to by ID only. Call
+    `forget_shown()` when earlier tool outputs are removed from the history so
+    sources get shown in full again.
+    """
+
+    def __init__(self):
+        self._by_key: Dict[str, Source] = {}
+        self._by_id: Dict[str, Source] = {}
+        self._shown: Set[Tuple[str, str]] = set()
+        self.stats = {"new": 0, "repeat": 0}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def add(self, url: str, title: str = "") -> Source:
+        """Register a URL and return its source, creating a new ID the first time it is seen."""
+        key = source_key(url)
+        source = self._by_key.get(key)
+        url = url.strip()
+        if source is None:
+            source = Source(id=f"S{len(self._by_id) + 1}", url=url, title=title)
+            self._by_key[key] = source
+            self._by_id[source.id] = source
+        else:
+            if not source.title:
+                source.title = title
+            if source.url.lower().startswith("http:") and url.lower().startswith("https:"):
+                source.url = url
+        return source
+
+    def get(self, source_id: str):
+        return self._by_id.get(source_id)
+
+    def is_shown(self, source: Source, kind: str = "result") -> bool:
+        return (source.id, kind) in self._shown
+
+    def first_showing(self, source: Source, kind: str = "result") -> bool:
+        """True the first time `source` is shown as `kind` ("result", "page"); False afterwards."""
+        marker = (source.id, kind)
+        if marker in self._shown:
+            self.stats["repeat"] += 1
+            return False
+        self._shown.add(marker)
+        self.stats["new"] += 1
+        return True
+
+    def forget_shown(self):
+        self._shown.clear()
+
+    def resolve(self, references: List[str]) -> List[str]:
+        """Turn source IDs and URLs into deduplicated URLs as they were seen, keeping other names as-is."""
+        resolved, seen = [], set()
+        for reference in references:
+            reference = reference.strip()
+            match = SOURCE_ID.match(reference)
+            if match and match.group(1) in self._by_id:
+                url = self._by_id[match.group(1)].url
+            elif reference.lower().startswith(("http://", "https://")):
+                known = self._by_key.get(source_key(reference))
+                url = known.url if known else reference
+            else:
+                url = reference
+            key = source_key(url) if "://" in url else url
+            if url and key not in seen:
+                seen.add(key)
+                resolved.append(url)
+        return resolved
@@ -0,0 +1,122 @@
+import time
+from typing import List
+
+from pydantic import BaseModel, ValidationError
+from pydantic_ai import Agent
+from pydantic_ai.messages import ToolCallPart
+from pydantic_core import from_json
+
+# Name pydantic-ai gives the tool that carries a structured final answer
+OUTPUT_TOOL_NAME = "final_result"
+
+
+class PartialResearchOutput(BaseModel):
+    """ResearchOutput fields seen so far while the final answer is still streaming."""
+    summary: str = ""
+    key_points: List[str] = []
+    sources: List[str] = []
+    confidence: str = ""
+
+
+class StreamRenderer:
+    """Prints summary, key points and sources to the terminal as they are validated.
+
+    `resolve_sources` (e.g. SourceIndex.resolve) maps cited source IDs to URLs
+    and drops duplicates before they are printed.
+    """
+
+    def __init__(self, resolve_sources=None):
+        self.resolve_sources = resolve_sources
+        self.started = time.perf_counter()
+        self.time_to_first_output = None
+        self._summary_chars = 0
+        self._summary_closed = False
+        self._points_shown = 0
+        self._sources_shown = 0
+
+    def render(self, partial: PartialResearchOutput, final: bool = False):
+        seen = partial.model_fields_set
+        if (partial.summary or final) and self.time_to_first_output is None:
+            self.time_to_first_output = time.perf_counter() - self.started
+            print("\n📌 STRUCTURED OUTPUT")
+            print("-" * 50)
+            print("📋 Summary: ", end="", flush=True)
+
+        # Summary text streams character by character
+        if partial.summary[self._summary_chars:]:
+            print(partial.summary[self._summary_chars:], end="", flush=True)
+            self._summary_chars = len(partial.summary)
+
+        # Each later field starting means the previous one is complete
+        summary_done = final or bool(seen & {"key_points", "sources", "confidence"})
+        points_done = final or bool(seen & {"sources", "confidence"})
+        sources_done = final or "confidence" in seen
+        if not summary_done:
+            return
+        if not self._summary_closed:
+            print()
+            self._summary_closed = True
+
+        # List items are printed once the next item starts (or the list ends)
+        points = partial.key_points if points_done else partial.key_points[:-1]
+        for i, point in enumerate(points[self._points_shown:], self._points_shown + 1):
+            if i == 1:
+                print("🔑 Key Points:")
+            print(f"   {i}. {point}", flush=True)
+        self._points_shown = max(self._points_shown, len(points))
+        if not points_done:
+            return
+
+        sources = partial.sources if sources_done else partial.sources[:-1]
+        if self.resolve_sources is not None:
+            sources = self.resolve_sources(sources)
+        for i, source in enumerate(sources[self._sources_shown:], self._sources_shown + 1):
+            if i == 1:
+                print("📚 Sources:")
+            print(f"   - {source}", flush=True)
+        self._sources_shown = max(self._sources_shown, len(sources))
+
+
+def _partial_output(response) -> PartialResearchOutput:
+    """Parse the in-progress final_result tool call of a streamed response."""
+    for part in response.parts:
+        if isinstance(part, ToolCallPart) and part.tool_name == OUTPUT_TOOL_NAME:
+            args = part.args
+            try:
+                if not isinstance(args, dict):
+                    args = from_json(args or "{}", allow_partial="trailing-strings")
+                return PartialResearchOutput.model_validate(args)
+            except (ValueError, ValidationError):
+                # Not enough of the arguments has arrived to parse yet
+                break
+    return PartialResearchOutput()
+
+
+async def run_streamed(agent: Agent, message: str, message_history: list, deps=None, **run_kwargs):
+    """Run the agent with streaming, rendering ResearchOutput fields as they arrive.
+
+    `run_kwargs` (e.g. the route's model and model_settings) are passed to
+    `agent.run_stream`. Returns the finished stream result, its validated output and a timing
+    dict with the time-to-first-output and total latency in seconds.
+    """
+    renderer = StreamRenderer(deps.sources.resolve if deps is not None else None)
+    async with agent.run_stream(message, message_history=message_history, deps=deps, **run_kwargs) as result:
+        async for response, _ in result.stream_responses(debounce_by=0.05):
+            renderer.render(_partial_output(response))
+        output = await result.get_output()
+
+    total = time.perf_counter() - renderer.started
+    renderer.render(PartialResearchOutput.model_validate(output.model_dump()), final=True)
+    print(f"🎯 Confidence: {output.confidence.upper()}")
+    if output.raw_text:
+        raw_preview = output.raw_text[:300]
+        if len(output.raw_text) > 300:
+            raw_preview += "..."
+        print(f"📄 Raw Text Preview: {raw_preview}\n")
+    print("-" * 50)
+
+    timing = {
+        "time_to_first_output_s": round(renderer.time_to_first_output or total, 3),
+        "total_s": round(total, 3),
+    }
+    return result, output, timing
@@ -0,0 +1,65 @@
+import logging
+import os
+
+logger = logging.getLogger("research_agent")
+
+_logfire = None
+_configured = False
+
+
+def disable_logfire_plugin():
+    """Keep logfire's pydantic plugin from loading; entry points call this before any model is defined.
+
+    The plugin imports all of logfire the first time a model is defined (~250 ms),
+    and instrument_pydantic_ai() does not need it. A PYDANTIC_DISABLE_PLUGINS
+    already in the environment wins. Library users set it themselves.
+    """
+    os.environ.setdefault("PYDANTIC_DISABLE_PLUGINS", "logfire-plugin")
+
+
+def logfire_enabled() -> bool:
+    """Logfire instrumentation is opt-in via ENABLE_LOGFIRE=1."""
+    return os.getenv("ENABLE_LOGFIRE", "").lower() in ("1", "true", "yes")
+
+
+def configure():
+    """Set up LOG_LEVEL-gated logging, and Logfire plus pydantic-ai instrumentation if enabled."""
+    global _logfire, _configured
+    if _configured:
+        return
+    _configured = True
+    # Tool calls are logged at INFO and diagnostics at DEBUG; by default only warnings and errors show
+    logging.basicConfig(format="[%(levelname)s] %(message)s")
+    logger.setLevel(os.getenv("LOG_LEVEL", "WARNING").upper())
+    if not logfire_enabled():
+        return
+    # Imported here: logfire pulls in OpenTelemetry, which dominates startup time
+    import logfire
+
+    logfire.configure()
+    logfire.instrument_pydantic_ai()
+    _logfire = logfire
+
+
+def debug(message: str, **attributes):
+    """Record a diagnostic event in Logfire when enabled, otherwise in the standard logger."""
+    if _logfire is not None:
+        _logfire.debug(message, **attributes)
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s %s", message, attributes)
+
+
+def info(message: str, **attributes):
+    """Record an event in Logfire when enabled, otherwise in the standard logger."""
+    if _logfire is not None:
+        _logfire.info(message, **attributes)
+    elif logger.isEnabledFor(logging.INFO):
+        logger.info("%s %s", message, attributes)
+
+
+def error(message: str, **attributes):
+    """Record an error in Logfire when enabled, otherwise in the standard logger."""
+    if _logfire is not None:
+        _logfire.error(message, **attributes)
+    else:
+        logger.error("%s %s", message, attributes)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules are flat scripts; make them and the benchmark helpers (fake_serpapi) importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
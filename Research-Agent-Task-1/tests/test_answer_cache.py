@@ -0,0 +1,71 @@
+"""AnswerCache: direct hits, seeds, freshness, replacement and the persisted index."""
+import time
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+QUESTION = "What are the health benefits of green tea?"
+OUTPUT = {"summary": "Green tea...", "key_points": ["Catechins"], "sources": [], "confidence": "high"}
+OTHER_QUESTIONS = [f"How do heat pumps work in {place}?" for place in ("Norway", "Texas", "Japan", "Chile")]
+
+
+def filled(**options):
+    cache = AnswerCache(**options)
+    for question in OTHER_QUESTIONS:
+        cache.add(question, {"summary": question})
+    cache.add(QUESTION, OUTPUT)
+    return cache
+
+
+@pytest.mark.parametrize("indexed", [False, True], ids=["pending", "indexed"])
+def test_paraphrases_hit_near_matches_seed_and_others_miss(indexed, monkeypatch):
+    if indexed:
+        monkeypatch.setattr(answer_cache, "MAX_PENDING", 0)  # every add rebuilds the inverted index
+    cache = filled(threshold=0.9, seed_threshold=0.6)
+
+    hit = cache.lookup("Tell me the health benefits of green tea")
+    seed = cache.lookup("green tea benefits for health")
+
+    assert hit.direct and hit.output == OUTPUT and hit.question == QUESTION
+    assert not seed.direct and seed.question == QUESTION and 0.6 <= seed.score < 0.9
+    assert QUESTION in seed.seed_prompt("green tea benefits for health")
+    assert cache.lookup("how do solar panels work") is None
+    assert cache.stats | {"added": 0} == {"lookups": 3, "hits": 1, "seeds": 1, "misses": 1, "added": 0}
+
+
+def test_expired_answers_are_ignored(monkeypatch):
+    cache = filled(ttl=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+
+    assert cache.lookup(QUESTION) is None
+
+
+def test_asking_again_replaces_the_earlier_answer():
+    cache = filled()
+    cache.add("what are the health benefits of GREEN TEA", {**OUTPUT, "summary": "Updated"})
+
+    assert cache.lookup(QUESTION).output["summary"] == "Updated"
+
+
+def test_index_survives_a_save_and_load(tmp_path):
+    path = str(tmp_path / "answers.npz")
+    cache = filled(path=path)
+    cache.save()
+
+    loaded = AnswerCache(path=path)
+
+    assert len(loaded) == len(OTHER_QUESTIONS) + 1
+    assert loaded.lookup(QUESTION).output == OUTPUT
+    assert loaded.lookup(OTHER_QUESTIONS[2]).output == {"summary": OTHER_QUESTIONS[2]}
+
+
+def test_oldest_entries_are_dropped_beyond_the_cap(tmp_path):
+    path = str(tmp_path / "answers.npz")
+    cache = filled(path=path, max_entries=2)
+    cache.save()
+
+    assert cache._questions == [OTHER_QUESTIONS[-1], QUESTION]
+    assert cache.lookup(OTHER_QUESTIONS[0]).question == OTHER_QUESTIONS[-1]  # only a seed now
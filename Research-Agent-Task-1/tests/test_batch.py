@@ -0,0 +1,45 @@
+"""Batch runs: one failing query is counted and the rest still complete."""
+import asyncio
+import json
+
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+
+import agent
+import batch
+from router import FULL, SIMPLE, Route, Router
+
+
+def answer(messages, info):
+    return ModelResponse(parts=[ToolCallPart("final_result", {
+        "summary": "An answer.", "key_points": ["A point."], "sources": [], "confidence": "high",
+    })])
+
+
+class BrokenCache:
+    """Answer cache whose lookup fails for one question."""
+
+    def lookup(self, question):
+        if question == "break the cache":
+            raise RuntimeError("cache unavailable")
+        return None
+
+    def add(self, question, output):
+        pass
+
+
+def test_cache_failure_fails_only_its_query(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    model = FunctionModel(answer)
+    monkeypatch.setattr(agent, "_router", Router(simple=Route(SIMPLE, model), full=Route(FULL, model)))
+    monkeypatch.setattr(batch, "get_answer_cache", BrokenCache)
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text("".join(json.dumps({"id": str(i), "query": query}) + "\n" for i, query in enumerate(
+        ["What is the capital of France?", "break the cache", "Who wrote Hamlet?"]
+    )))
+    results = tmp_path / "results.jsonl"
+
+    stats = asyncio.run(batch.run_batch(str(queries), str(results), concurrency=1))
+
+    assert stats["completed"] == 2 and stats["failed"] == 1
+    assert [json.loads(line)["id"] for line in results.read_text().splitlines()] == ["0", "2"]
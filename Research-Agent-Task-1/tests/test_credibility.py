@@ -0,0 +1,33 @@
+"""Per-site cap of CredibilityEngine.rank."""
+from credibility import CredibilityEngine
+
+
+def results(*links):
+    return [{"link": link, "title": link, "snippet": "..."} for link in links]
+
+
+def test_per_site_cap_limits_results_from_one_domain():
+    engine = CredibilityEngine(max_per_site=2)
+
+    ranked = engine.rank(results(*(f"https://www.reuters.com/article/{i}" for i in range(5))))
+
+    assert len(ranked) == 2
+    assert engine.stats["dropped_site_cap"] == 3
+
+
+def test_file_urls_are_not_capped_as_one_site():
+    engine = CredibilityEngine(max_per_site=2)
+
+    ranked = engine.rank(results(*(f"file:///srv/docs/report-{i}.html" for i in range(5))))
+
+    assert len(ranked) == 5
+    assert engine.stats["dropped_site_cap"] == 0
+
+
+def test_per_site_cap_can_be_turned_off_for_a_local_corpus():
+    engine = CredibilityEngine(max_per_site=2)
+
+    ranked = engine.rank(results(*(f"http://intranet.corp/wiki/page-{i}" for i in range(5))), per_site=False)
+
+    assert len(ranked) == 5
+    assert engine.stats["dropped_site_cap"] == 0
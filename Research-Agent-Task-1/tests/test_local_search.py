@@ -0,0 +1,96 @@
+"""URL identity in the local index, and searches running while it is refreshed."""
+import threading
+
+import local_search
+from local_search import IndexWriter, LocalIndex
+from sources import canonicalize_url
+
+
+def doc(url, text):
+    return {"url": url, "title": text, "text": f"{text} heat pump efficiency"}
+
+
+def test_lookup_by_canonical_url_finds_the_raw_url(tmp_path):
+    raw = "https://www.example.com/a?b=2&a=1&utm_source=feed"
+    IndexWriter(str(tmp_path)).add([doc(raw, "original")])
+
+    found = LocalIndex(str(tmp_path)).document(canonicalize_url(raw))
+
+    assert canonicalize_url(raw) == "https://example.com/a?a=1&b=2"
+    assert found is not None and found["url"] == raw
+
+
+def test_same_url_in_two_batches_of_one_add_keeps_only_the_last(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_search, "SEGMENT_DOCS", 2)
+    documents = [doc("https://example.com/a", "first"), doc("https://example.com/b", "other"),
+                 doc("https://www.example.com/a/", "second")]
+
+    IndexWriter(str(tmp_path)).add(documents)
+    index = LocalIndex(str(tmp_path))
+
+    assert index.live_docs() == 2
+    assert index.document("https://example.com/a")["title"] == "second"
+    assert [hit["title"] for hit in index.search("heat pump", num=5)].count("first") == 0
+
+
+def test_re_adding_a_url_replaces_the_older_copy(tmp_path):
+    IndexWriter(str(tmp_path)).add([doc("https://example.com/a?x=1", "old")])
+    IndexWriter(str(tmp_path)).add([doc("https://example.com/a?x=1#top", "new")])
+
+    index = LocalIndex(str(tmp_path))
+
+    assert index.live_docs() == 1
+    assert index.document("https://example.com/a?x=1")["title"] == "new"
+
+
+def mapped(segment):
+    return not segment.terms._mmap.closed
+
+
+def test_refresh_unmaps_old_segments_only_after_their_last_search(tmp_path):
+    IndexWriter(str(tmp_path)).add([doc("https://example.com/a", "first")])
+    index = LocalIndex(str(tmp_path))
+
+    with index._reading() as snapshot:
+        IndexWriter(str(tmp_path)).add([doc("https://example.com/b", "second")])
+        index.refresh(force=True)
+
+        # The running search still reads the segment list it started with
+        assert index.segments is not snapshot.segments and len(index.segments) == 2
+        assert mapped(snapshot.segments[0])
+        assert [hit["title"] for hit in index._search(snapshot, "heat pump", 5)] == ["first"]
+    assert not mapped(snapshot.segments[0])
+
+    current = index.segments
+    index.refresh(force=True)
+    assert not any(map(mapped, current))  # nothing was reading them
+
+
+def test_searches_run_while_the_index_is_rewritten(tmp_path):
+    path = str(tmp_path)
+    IndexWriter(path).add([doc(f"https://example.com/{i}", f"page {i}") for i in range(20)])
+    index = LocalIndex(path)
+    errors, done = [], threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                assert index.search("heat pump", num=3)
+                index.document("https://example.com/3")
+            except Exception as error:
+                errors.append(error)
+                return
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for round_number in range(10):
+        IndexWriter(path).add([doc(f"https://example.com/{round_number}", f"update {round_number}")])
+        if round_number % 3 == 2:
+            IndexWriter(path).compact()
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert index.document("https://example.com/9")["title"] == "update 9"
@@ -0,0 +1,180 @@
+"""PageFetcher against a local HTTP server: byte cap, content types, revalidation and the SSRF guard."""
+import asyncio
+import ipaddress
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpcore
+import pytest
+
+import page_fetcher
+from page_fetcher import FetchError, PageFetcher, PinnedAddressBackend, is_public_address
+
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/big":
+            self.reply(200, "text/html", b"<html><body><p>" + b"lorem ipsum " * 20_000 + b"</p></body></html>")
+        elif self.path == "/image":
+            self.reply(200, "image/png", b"\x89PNG\r\n\x1a\n" + b"\0" * 64)
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.reply(304, None, b"")
+            else:
+                self.reply(200, "text/html", b"<title>Cached</title><p>Stable page</p>", ETag=ETAG)
+        elif self.path == "/redirect":
+            self.reply(302, None, b"", Location=f"http://127.0.0.2:{self.server.server_port}/etag")
+        else:
+            self.reply(404, "text/plain", b"missing")
+
+    def reply(self, status, content_type, body, **headers):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The fetcher hung up once it had enough
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fetch(fetcher, *urls):
+    """Fetch the URLs in order on one event loop; returns documents or raised errors."""
+    async def run():
+        results = []
+        for url in urls:
+            try:
+                results.append(await fetcher.fetch(url))
+            except FetchError as error:
+                results.append(error)
+        await fetcher.aclose()
+        return results
+
+    return asyncio.run(run())
+
+
+def test_body_is_cut_at_the_byte_cap(server):
+    fetcher = PageFetcher(max_bytes=2000, max_chars=100_000, allow_private=True)
+
+    (document,) = fetch(fetcher, server.url + "/big")
+
+    assert document.truncated
+    assert 0 < len(document.text) <= 2000
+
+
+def test_non_text_content_is_refused(server):
+    (result,) = fetch(PageFetcher(allow_private=True), server.url + "/image")
+
+    assert isinstance(result, FetchError) and "image/png" in str(result)
+
+
+def test_unchanged_page_is_revalidated_with_etag(server):
+    first, second = fetch(PageFetcher(allow_private=True), server.url + "/etag", server.url + "/etag")
+
+    assert second is first and first.title == "Cached"
+    assert server.requests == [("/etag", None), ("/etag", ETAG)]
+
+
+def test_loopback_server_is_refused_by_default(server):
+    (result,) = fetch(PageFetcher(), server.url + "/etag")
+
+    assert isinstance(result, FetchError)
+    assert server.requests == []
+
+
+def test_redirect_targets_are_checked(server, monkeypatch):
+    # Pretend only the server's own address is public; the redirect points at another loopback address
+    monkeypatch.setattr(page_fetcher, "is_public_address", lambda address: str(address) == "127.0.0.1")
+
+    (result,) = fetch(PageFetcher(), server.url + "/redirect")
+
+    assert isinstance(result, FetchError) and "127.0.0.2" in str(result)
+    assert server.requests == [("/redirect", None)]
+
+
+def test_hostnames_are_connected_through_the_resolver(server):
+    lookups = []
+
+    async def resolve(host, port):
+        lookups.append((host, port))
+        return ["127.0.0.1"]
+
+    (document,) = fetch(PageFetcher(allow_private=True, resolve=resolve), f"http://shop.test:{server.server_port}/etag")
+
+    assert document.title == "Cached"
+    assert lookups == [("shop.test", server.server_port)]
+
+
+class RecordingBackend:
+    """Network backend that records where it was asked to connect instead of connecting."""
+
+    def __init__(self):
+        self.connected = []
+
+    async def connect_tcp(self, host, port, **options):
+        self.connected.append(host)
+        raise httpcore.ConnectError("not connecting in tests")
+
+
+def test_connection_goes_to_the_address_that_was_checked():
+    # A rebinding DNS server answers with a public address first and a private one afterwards
+    answers = [["93.184.215.14"], ["127.0.0.1"]]
+
+    async def rebinding(host, port):
+        return answers.pop(0)
+
+    recorder = RecordingBackend()
+    with pytest.raises(httpcore.ConnectError):
+        asyncio.run(PinnedAddressBackend(rebinding, backend=recorder).connect_tcp("rebind.test", 80))
+
+    assert recorder.connected == ["93.184.215.14"]
+    assert answers == [["127.0.0.1"]]  # resolved once, for both the check and the connection
+
+
+@pytest.mark.parametrize("host, answer", [
+    ("rebind.test", ["93.184.215.14", "10.0.0.5"]),  # one private answer is enough to refuse
+    ("rebind.test", ["169.254.169.254"]),
+    ("127.0.0.1", None),
+    ("::1", None),
+])
+def test_backend_refuses_non_public_answers(host, answer):
+    async def resolve(host, port):
+        return answer
+
+    recorder = RecordingBackend()
+    with pytest.raises(FetchError):
+        asyncio.run(PinnedAddressBackend(resolve, backend=recorder).connect_tcp(host, 80))
+    assert recorder.connected == []
+
+
+@pytest.mark.parametrize("address", [
+    "127.0.0.1", "10.0.0.5", "192.168.1.1", "169.254.169.254", "::1", "::ffff:127.0.0.1", "0.0.0.0", "fd00::1",
+])
+def test_non_public_addresses(address):
+    assert not is_public_address(ipaddress.ip_address(address))
+
+
+@pytest.mark.parametrize("address", ["93.184.215.14", "2606:4700::1111"])
+def test_public_addresses(address):
+    assert is_public_address(ipaddress.ip_address(address))
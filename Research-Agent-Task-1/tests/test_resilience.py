@@ -0,0 +1,129 @@
+"""Deadlines, hedging and retries of SearchClient against the local fake SerpAPI server."""
+import asyncio
+import time
+
+import pytest
+
+from fake_serpapi import FakeSerpApi
+from resilience import DeadlineExceeded, Resilience
+from search_client import SearchClient, SearchError
+
+
+class MaxJitter:
+    """Stands in for Resilience's random source so every backoff is the full interval."""
+
+    def uniform(self, low, high):
+        return high
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**options):
+        servers.append(FakeSerpApi(**{"latency": 0.01, **options}).start())
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def search(server, resilience, query="resilience test"):
+    """Run one search through a fresh client; returns (result or raised error, seconds)."""
+    async def run():
+        client = SearchClient(endpoint=server.url, api_key="test", timeout=5, resilience=resilience)
+        started = time.perf_counter()
+        try:
+            return await client.search({"q": query, "num": 3}), time.perf_counter() - started
+        except Exception as error:
+            return error, time.perf_counter() - started
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_client_errors_are_not_retried(serve, status):
+    server = serve(fail_first=10, fail_status=status)
+    resilience = Resilience(retries=3, backoff=0.01, hedge=False)
+
+    result, _ = search(server, resilience)
+
+    assert isinstance(result, SearchError) and result.status_code == status
+    assert server.stats["searches"] == 1
+    assert resilience.stats["retries"] == 0
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_rate_limits_and_server_errors_are_retried_with_backoff(serve, status):
+    server = serve(fail_first=2, fail_status=status)
+    resilience = Resilience(retries=3, backoff=0.1, hedge=False)
+    resilience._random = MaxJitter()
+
+    result, seconds = search(server, resilience)
+
+    assert result["organic_results"]
+    assert server.stats["searches"] == 3
+    assert resilience.stats["retries"] == 2
+    # Backoff doubles: 0.1 s before the first retry, 0.2 s before the second
+    assert seconds >= 0.3
+
+
+def test_retries_stop_after_the_retry_limit(serve):
+    server = serve(fail_first=10, fail_status=503)
+    resilience = Resilience(retries=2, backoff=0.01, hedge=False)
+
+    result, _ = search(server, resilience)
+
+    assert isinstance(result, SearchError) and result.status_code == 503
+    assert server.stats["searches"] == 3
+    assert resilience.stats["failures"] == 1
+
+
+def test_hedge_wins_when_the_primary_is_slow(serve):
+    server = serve(slow_first=1, slow_latency=2.0)
+    resilience = Resilience(retries=0, min_samples=5, hedge_percentile=95)
+    for _ in range(5):
+        resilience.latency.record(0.02)  # recent searches took 20 ms, so hedge after 20 ms
+
+    result, seconds = search(server, resilience)
+
+    assert result["organic_results"]
+    assert resilience.stats["hedges"] == 1
+    assert resilience.stats["hedge_wins"] == 1
+    assert seconds < 1.0  # did not wait for the 2 s primary
+
+
+def test_no_hedge_before_latency_is_known(serve):
+    server = serve()
+    resilience = Resilience(retries=0, min_samples=5)
+
+    result, _ = search(server, resilience)
+
+    assert result["organic_results"]
+    assert resilience.stats["hedges"] == 0
+
+
+def test_per_attempt_deadline_times_out_slow_attempts(serve):
+    server = serve(slow_first=1, slow_latency=2.0)
+    resilience = Resilience(retries=1, backoff=0.01, hedge=False, max_deadline=0.3)
+
+    result, seconds = search(server, resilience)
+
+    assert result["organic_results"]
+    assert resilience.stats["timeouts"] == 1
+    assert seconds < 1.5
+
+
+def test_total_deadline_caps_time_across_retries(serve):
+    server = serve(latency=1.0)
+    # Without the cap: 6 attempts x 0.3 s plus backoff, about 2 s
+    resilience = Resilience(retries=5, backoff=0.05, hedge=False, max_deadline=0.3, total_deadline=0.8)
+
+    result, seconds = search(server, resilience)
+
+    assert isinstance(result, DeadlineExceeded)
+    assert seconds < 1.0
+    assert resilience.stats["failures"] == 1
@@ -0,0 +1,86 @@
+"""Routing simple questions to the cheaper route and escalating its weak answers, with FunctionModel stand-ins."""
+import asyncio
+
+import pytest
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+
+import agent
+from router import FULL, SIMPLE, Route, Router
+
+SIMPLE_QUESTION = "Who is the mayor of Paris?"
+COMPLEX_QUESTION = "Compare the long-term economic impacts of solar and wind subsidies in Europe"
+
+
+def answer(confidence="high", finish_reason=None, **fields):
+    return ModelResponse(
+        parts=[ToolCallPart("final_result", {
+            "summary": "An answer.", "key_points": ["A point."], "sources": [], "confidence": confidence, **fields,
+        })],
+        finish_reason=finish_reason,
+    )
+
+
+class Models:
+    """A FunctionModel per route, recording the tools each call was offered."""
+
+    def __init__(self, simple_response):
+        self.offered = {SIMPLE: [], FULL: []}
+        self.simple_response = simple_response
+        self.router = Router(
+            simple=Route(SIMPLE, FunctionModel(self.respond(SIMPLE)), tools=("search_web",), settings={"max_tokens": 64}),
+            full=Route(FULL, FunctionModel(self.respond(FULL))),
+        )
+
+    def respond(self, route):
+        def respond(messages, info):
+            self.offered[route].append(sorted(tool.name for tool in info.function_tools))
+            return self.simple_response if route == SIMPLE else answer(summary="A thorough answer.")
+        return respond
+
+
+@pytest.fixture
+def research(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+
+    def run_question(simple_response, question=SIMPLE_QUESTION):
+        models = Models(simple_response)
+        monkeypatch.setattr(agent, "_router", models.router)
+        deps = agent.ResearchDeps()
+
+        async def run(**run_kwargs):
+            response = await agent.get_agent().run(question, deps=deps, **run_kwargs)
+            return response, response.output
+
+        route, response, output = asyncio.run(agent.run_routed(models.router.choose(question), deps, run))
+        return models, route, response, output
+
+    return run_question
+
+
+def test_good_simple_answer_stays_on_the_simple_route(research):
+    models, route, response, output = research(answer("high"))
+
+    assert route.name == SIMPLE and output.summary == "An answer."
+    assert models.offered == {SIMPLE: [["search_web"]], FULL: []}
+
+
+@pytest.mark.parametrize("simple_response", [
+    answer("low"),
+    answer("high", finish_reason="length"),
+    ModelResponse(parts=[ToolCallPart("final_result", {"summary": "Cut off"})]),  # never validates
+], ids=["low confidence", "token limit", "invalid output"])
+def test_weak_simple_answer_is_redone_on_the_full_route(research, simple_response):
+    models, route, response, output = research(simple_response)
+
+    assert route.name == FULL and output.summary == "A thorough answer."
+    assert models.offered[FULL] == [["extract_content", "fact_check", "search_web"]]
+    # The discarded attempt's requests are counted unless it raised
+    assert response.usage().requests == 1 + (simple_response.parts[0].args.get("confidence") is not None)
+
+
+def test_complex_question_goes_straight_to_the_full_route(research):
+    models, route, _, _ = research(answer("high"), question=COMPLEX_QUESTION)
+
+    assert route.name == FULL
+    assert models.offered[SIMPLE] == []
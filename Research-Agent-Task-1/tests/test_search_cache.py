@@ -0,0 +1,75 @@
+"""SearchCache tiers, its event-loop friendly methods and cache-key normalization."""
+import asyncio
+
+import pytest
+
+from search_cache import SearchCache, make_cache_key
+
+PARAMS = {"q": "renewable energy storage", "num": 5}
+RESULT = {"organic_results": [{"title": "Grid batteries", "link": "https://example.com/grid"}]}
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    """Records the functions sent to worker threads with asyncio.to_thread."""
+    calls = []
+    to_thread = asyncio.to_thread
+
+    async def recording(function, *args, **kwargs):
+        calls.append(function.__name__)
+        return await to_thread(function, *args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "to_thread", recording)
+    return calls
+
+
+def test_disk_reads_and_writes_run_in_worker_threads(tmp_path, threads):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def run():
+        writer = SearchCache(path=path)
+        await writer.aset(PARAMS, RESULT)
+        writer.close()
+        reader = SearchCache(path=path)  # empty memory tier: the lookup has to go to disk
+        try:
+            return await reader.aget(PARAMS), await reader.aget(PARAMS), reader.stats
+        finally:
+            reader.close()
+
+    from_disk, from_memory, stats = asyncio.run(run())
+
+    assert from_disk == RESULT and from_memory == RESULT
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+    # The write and the disk lookup went to threads; the memory hit was answered inline
+    assert threads == ["set", "get"]
+
+
+def test_memory_only_cache_stays_on_the_event_loop(threads):
+    cache = SearchCache()
+
+    async def run():
+        await cache.aset(PARAMS, RESULT)
+        return await cache.aget(PARAMS), await cache.aget({"q": "something else"})
+
+    assert asyncio.run(run()) == (RESULT, None)
+    assert threads == []
+
+
+@pytest.mark.parametrize("same", [
+    ({"q": "Solar  Panels", "gl": "US"}, {"q": "solar panels", "gl": "us"}),
+    ({"q": "a OR b", "num": 3}, {"q": "A  OR B", "num": "3"}),
+])
+def test_equivalent_searches_share_a_key(same):
+    assert make_cache_key(same[0]) == make_cache_key(same[1])
+
+
+@pytest.mark.parametrize("different", [
+    # Google reads capitalized OR as an operator and lowercase "or" as a word
+    ({"q": "a OR b"}, {"q": "a or b"}),
+    ({"q": "claim NOT true"}, {"q": "claim not true"}),
+    ({"q": "storms", "location": "Austin, Texas"}, {"q": "storms", "location": "Paris, France"}),
+    ({"q": "storms", "tbs": "qdr:d"}, {"q": "storms", "tbs": "qdr:D"}),
+    ({"q": "storms"}, {"q": "storms", "uule": "w+CAIQICIGUGFyaXM"}),
+])
+def test_searches_that_can_differ_get_different_keys(different):
+    assert make_cache_key(different[0]) != make_cache_key(different[1])
@@ -0,0 +1,82 @@
+"""SingleFlight: concurrent identical calls share one upstream call, its errors and its cancellation."""
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Upstream:
+    """Upstream call that blocks until released and counts how often it was started."""
+
+    def __init__(self, result="results", error=None):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+        self.result, self.error = result, error
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_identical_calls_share_one_upstream_call():
+    async def run():
+        flight, solar, wind = SingleFlight(), Upstream("solar results"), Upstream("wind results")
+        waiters = [asyncio.create_task(flight.do("q=solar", solar)) for _ in range(5)]
+        waiters.append(asyncio.create_task(flight.do("q=wind", wind)))
+        await asyncio.sleep(0)
+        in_flight = flight.in_flight()
+        solar.release.set()
+        wind.release.set()
+        return await asyncio.gather(*waiters), (solar.calls, wind.calls), in_flight, flight
+
+    results, calls, in_flight, flight = asyncio.run(run())
+
+    assert results == ["solar results"] * 5 + ["wind results"] and calls == (1, 1)
+    assert in_flight == 2 and flight.in_flight() == 0
+    assert flight.stats == {"upstream": 2, "shared": 4, "cancelled": 0}
+
+
+def test_every_waiter_gets_the_error_and_the_next_call_retries():
+    async def run():
+        flight, failing = SingleFlight(), Upstream(error=RuntimeError("quota exceeded"))
+        waiters = [asyncio.create_task(flight.do("q", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        failing.release.set()
+        errors = await asyncio.gather(*waiters, return_exceptions=True)
+        retry = Upstream("fresh")
+        retry.release.set()
+        return errors, await flight.do("q", retry)
+
+    errors, retried = asyncio.run(run())
+
+    assert [str(error) for error in errors] == ["quota exceeded"] * 3
+    assert retried == "fresh"
+
+
+def test_upstream_call_is_cancelled_only_when_every_waiter_is_gone():
+    async def run():
+        flight, upstream = SingleFlight(), Upstream()
+        first, second = (asyncio.create_task(flight.do("q", upstream)) for _ in range(2))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        still_running = not upstream.cancelled
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        await asyncio.sleep(0)
+        return still_running, upstream.cancelled, flight
+
+    still_running, cancelled, flight = asyncio.run(run())
+
+    assert still_running and cancelled
+    assert flight.in_flight() == 0 and flight.stats["cancelled"] == 1
@@ -0,0 +1,48 @@
+"""SourceIndex: one ID per page, original URLs for display and citations."""
+from sources import SourceIndex, canonicalize_url
+
+
+def test_copies_of_a_page_share_one_source():
+    sources = SourceIndex()
+
+    first = sources.add("https://www.example.com/report/?utm_source=news&id=7#summary", "Report")
+    again = sources.add("https://EXAMPLE.com:443/report?id=7&fbclid=abc")
+
+    assert again is first and len(sources) == 1
+    assert first.id == "S1"
+
+
+def test_source_keeps_the_url_as_first_seen():
+    sources = SourceIndex()
+    url = "https://www.example.com/search?b=2&a=1&ref=home"
+
+    source = sources.add(url)
+
+    # www., the query order and "ref" may all matter to the site; only the dedupe key drops them
+    assert source.url == url
+    assert canonicalize_url(url) == "https://example.com/search?a=1&b=2"
+
+
+def test_https_copy_replaces_an_http_url():
+    sources = SourceIndex()
+
+    source = sources.add("http://www.example.com/page")
+    sources.add("https://www.example.com/page/")
+    sources.add("http://example.com/page")
+
+    assert source.url == "https://www.example.com/page/"
+
+
+def test_resolve_turns_ids_and_urls_into_first_seen_urls():
+    sources = SourceIndex()
+    first = sources.add("https://www.example.com/a?utm_medium=email")
+    second = sources.add("https://news.example.org/b")
+
+    resolved = sources.resolve([
+        "S1", "[S2] (Example News)", "https://example.com/a", "http://unseen.example.net/c?x=1&ref=feed",
+        "S2", "Encyclopedia Britannica", "S9",
+    ])
+
+    assert resolved == [
+        first.url, second.url, "http://unseen.example.net/c?x=1&ref=feed", "Encyclopedia Britannica", "S9",
+    ]
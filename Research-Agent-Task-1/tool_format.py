@@ -0,0 +1,75 @@
+import os
+from typing import List
+
+# Tool results are sent back to the model on every later turn, so they use a terse
+# line format (explained once in the system prompt) and are trimmed to a token budget.
+
+CHARS_PER_TOKEN = 4  # same rough estimate as history.estimate_tokens
+TITLE_CHARS = 90
+
+
+def budget(name: str, default: int) -> int:
+    """Read a per-tool budget from the environment at call time (after .env is loaded)."""
+    return int(os.getenv(name, default))
+
+
+def clip(text: str, max_chars: int) -> str:
+    """Collapse whitespace and shorten to `max_chars` at a word boundary, ending in an ellipsis."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def result_entry(label: str, title: str, snippet: str, url: str, snippet_chars: int, tag: str = "") -> str:
+    """One result as "S1 [tag] Title — snippet" with its URL on the next line."""
+    tag = f" [{tag}]" if tag else ""
+    return f"{label}{tag} {clip(title, TITLE_CHARS)} — {clip(snippet, snippet_chars)}\n   {url}"
+
+
+def seen_entry(label: str, tag: str = "") -> str:
+    """Reference to a result already shown in full earlier in the session."""
+    tag = f" [{tag}]" if tag else ""
+    return f"{label}{tag} (seen)"
+
+
+class SourceLine(str):
+    """A result line for `source`, marked as shown only once fit() keeps it."""
+    source = None
+
+
+def source_entry(sources, result: dict, snippet_chars: int, tag: str = "") -> SourceLine:
+    """Register an organic result in the session's SourceIndex; shown in full unless already shown."""
+    source = sources.add(result["link"], result.get("title", ""))
+    if sources.is_shown(source):
+        line = SourceLine(seen_entry(source.id, tag))
+    else:
+        line = SourceLine(result_entry(source.id, result["title"], result["snippet"], source.url, snippet_chars, tag))
+    line.source = source
+    return line
+
+
+def fit(lines: List[str], max_tokens: int, sources=None) -> str:
+    """Join `lines` (most important first) and drop whatever does not fit in `max_tokens`.
+
+    Sources of the kept SourceLines are marked as shown in `sources`; dropped ones never
+    reached the model, so they are still shown in full next time.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    kept, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > max_chars and kept:
+            omitted = len(lines) - len(kept)
+            kept.append(f"(+{omitted} more omitted for length)")
+            break
+        kept.append(line)
+        used += len(line) + 1
+    if sources is not None:
+        for line in kept:
+            if getattr(line, "source", None) is not None:
+                sources.first_showing(line.source)
+    return "\n".join(kept)
@@ -0,0 +1,217 @@
+from fasthtml.common import *
+from functools import lru_cache
+from hashlib import sha1
+import re
+from state_backend import MemoryBackend
+
+def card_id(kind: str, name: str) -> str:
+    """DOM id of an item's card ("inv" or "cart"). Any name gives a valid id, and names that slug
+    alike ("green apples", "green-apples") stay apart thanks to the hash."""
+    slug = re.sub(r'[^a-z0-9_-]', '-', name.lower())
+    return f"card-{kind}-{slug}-{sha1(name.encode()).hexdigest()[:6]}"
+
+@lru_cache(maxsize=4096)
+def card_body(name: str, color: str, quantity: int, price: float, small: bool) -> str:
+    """Rendered inside of a card, memoized since most cards do not change between requests."""
+    if small:
+        return to_xml(Div(
+            H4(name.title(), cls="text-xs font-bold text-gray-900 mb-1"),
+            Div(
+                P(f"₹{price:.0f}", cls="text-lg font-extrabold text-gray-900"),
+                P(f"Stock: {quantity}", cls="text-xs font-medium text-gray-700 mt-0.5"),
+                cls="text-center"
+            ),
+            cls="flex flex-col items-center justify-center h-full"
+        ))
+    return to_xml(Div(
+        H3(name.title(), cls="text-2xl font-bold text-gray-900 mb-2"),
+        Div(
+            P(f"₹{price:.0f}", cls="text-3xl font-extrabold text-gray-900"),
+            P(f"Qty: {quantity}", cls="text-base font-semibold text-gray-700 mt-2"),
+            cls="text-center"
+        ),
+        cls="flex flex-col items-center justify-center h-full"
+    ))
+
+class CardManager:
+    """Card operations and rendering over a state backend (in-memory by default)."""
+    
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.color_map = {
+            'yellow': 'bg-yellow-400', 'red': 'bg-red-500', 'green': 'bg-green-500',
+            'blue': 'bg-blue-500', 'orange': 'bg-orange-500', 'purple': 'bg-purple-500',
+            'pink': 'bg-pink-500', 'brown': 'bg-amber-700'
+        }
+        self.initial_inventory = {
+            'banana': {'name': 'banana', 'color': 'yellow', 'quantity': 4, 'price': 50},
+            'apple': {'name': 'apple', 'color': 'red', 'quantity': 5, 'price': 80},
+            'orange': {'name': 'orange', 'color': 'orange', 'quantity': 3, 'price': 60},
+            'grape': {'name': 'grape', 'color': 'purple', 'quantity': 6, 'price': 120}
+        }
+        # Items changed since the last render_changes, per session: inventory names, and
+        # cart names mapped to whether the item was in the cart before its first change
+        self.changes = {}
+    
+    def initialize_session(self, session_id: str):
+        """Initialize a session with predefined inventory."""
+        self.backend.init_session(session_id, self.initial_inventory)
+    
+    def inventory(self, session_id: str) -> dict:
+        """Available items by name."""
+        return self.backend.inventory(session_id)
+    
+    def cart(self, session_id: str) -> dict:
+        """Items in the cart by name."""
+        return self.backend.cart(session_id)
+    
+    def add_card(self, session_id: str, name: str, color: str, quantity: int = 1):
+        """Add items to cart and decrease inventory."""
+        self.initialize_session(session_id)
+        name = name.lower()
+        
+        in_cart = name in self.cart(session_id)
+        available = self.backend.reserve(session_id, name, quantity)
+        if available is None:
+            return f"Unable to add {name}. Item not available in inventory."
+        if quantity > available:
+            return f"Unable to add {quantity} {name}(s). Only {available} available in stock."
+        self.mark_changed(session_id, name, in_cart)
+        return None
+    
+    def remove_card(self, session_id: str, name: str, quantity: int = 1, remove_all: bool = False):
+        """Remove items from cart and restore to inventory."""
+        self.initialize_session(session_id)
+        name = name.lower()
+        
+        if not self.backend.release(session_id, name, quantity, remove_all):
+            return f"Unable to remove {name}. Item not in cart."
+        self.mark_changed(session_id, name, in_cart=True)
+    
+    def update_card(self, session_id: str, name: str, new_color: str = None, new_quantity: int = None):
+        """Update card color or quantity."""
+        self.initialize_session(session_id)
+
+        name = name.lower()
+        if not self.backend.update_item(session_id, name, new_color, new_quantity):
+            return f"Unable to update {name}. Item not available in inventory."
+        self.mark_changed(session_id, name)
+    
+    def mark_changed(self, session_id: str, name: str, in_cart: bool = None):
+        """Note that an item's stock (and, unless in_cart is None, its cart entry) changed."""
+        changes = self.changes.setdefault(session_id, {'inventory': set(), 'cart': {}})
+        changes['inventory'].add(name)
+        if in_cart is not None:
+            changes['cart'].setdefault(name, in_cart)
+    
+    def render_changes(self, session_id: str):
+        """Out-of-band swaps for just the cards changed since the last call: replaced, appended or deleted."""
+        changes = self.changes.pop(session_id, None)
+        if not changes:
+            return []
+        swaps = []
+        inventory = self.inventory(session_id)
+        for name in changes['inventory']:
+            data = inventory.get(name)
+            if data:
+                card = self.create_card_element(name, data['color'], data['quantity'], card_id("inv", name), data.get('price', 0.0), True)
+                card.attrs['hx-swap-oob'] = 'outerHTML'
+                swaps.append(card)
+        cart = self.cart(session_id)
+        for name, was_in_cart in changes['cart'].items():
+            data = cart.get(name)
+            if data is None:
+                if was_in_cart:
+                    swaps.append(Div(id=card_id("cart", name), hx_swap_oob="delete"))
+                continue
+            card = self.cart_card(name, data)
+            if was_in_cart:
+                card.attrs['hx-swap-oob'] = 'outerHTML'
+                swaps.append(card)
+            else:
+                # Only the wrapper's children are inserted
+                swaps.append(Div(card, hx_swap_oob="beforeend:#cart-container"))
+        return swaps
+    
+    def create_card_element(self, name: str, color: str, quantity: int, dom_id: str, price: float = 0.0, small: bool = False):
+        """Create a single card HTML element; `dom_id` comes from card_id()."""
+        color_class = self.color_map.get(color.lower(), 'bg-gray-500')
+        body = NotStr(card_body(name, color, quantity, price, small))
+        if small:
+            return Div(
+                body,
+                cls=f"{color_class} rounded-xl shadow-md hover:shadow-xl transition-shadow duration-300 w-28 h-28 p-3 border-2 border-white",
+                id=dom_id
+            )
+        return Div(
+            body,
+            cls=f"{color_class} rounded-2xl shadow-xl hover:shadow-2xl transition-all duration-300 hover:scale-105 w-44 h-44 p-5 border-4 border-white",
+            id=dom_id
+        )
+    
+    def cart_card(self, name: str, data: dict):
+        return self.create_card_element(
+            data['name'], 
+            data['color'], 
+            data['quantity'], 
+            card_id("cart", name),
+            data.get('price', 0.0) * data['quantity']  # Total price
+        )
+    
+    def render_all_cards(self, session_id: str, small: bool = False):
+        """Render all cards for a session."""
+        self.initialize_session(session_id)
+        inventory = self.inventory(session_id)
+        
+        if not inventory:
+            return Div(id="cards-container", cls="flex flex-wrap gap-4")
+        
+        cards = [
+            self.create_card_element(data['name'], data['color'], data['quantity'], card_id("inv", name), data.get('price', 0.0), small)
+            for name, data in inventory.items()
+        ]
+        return Div(*cards, id="cards-container", cls="flex flex-wrap gap-2" if small else "flex flex-wrap gap-4")
+    
+    def render_cart(self, session_id: str):
+        """Render cart items with total price."""
+        self.initialize_session(session_id)
+        cart = self.cart(session_id)
+        
+        if not cart:
+            return Div(id="cart-container", cls="flex flex-wrap gap-3")
+        
+        cards = [self.cart_card(name, data) for name, data in cart.items()]
+        return Div(*cards, id="cart-container", cls="flex flex-wrap gap-3")
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Payload and render time of full re-renders vs per-card swaps.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 100, 1000, 5000], help="catalog sizes (SKUs)")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    colors = ['yellow', 'red', 'green', 'blue', 'orange', 'purple']
+    print(f"{'SKUs':>6} {'full bytes':>12} {'full ms':>9} {'diff bytes':>11} {'diff ms':>9}")
+    for size in args.sizes:
+        manager = CardManager()
+        manager.initial_inventory = {
+            f"item{i}": {'name': f"item{i}", 'color': colors[i % len(colors)], 'quantity': 50, 'price': 10 + i % 90}
+            for i in range(size)
+        }
+        manager.initialize_session("bench")
+        full_bytes = diff_bytes = full_seconds = diff_seconds = 0
+        for i in range(args.rounds):
+            # One request: add an item to the cart and bump another's stock
+            manager.add_card("bench", f"item{i % size}", "", 1)
+            manager.update_card("bench", f"item{(i * 7) % size}", new_quantity=60)
+            started = time.perf_counter()
+            diff_bytes += len(to_xml(Div(*manager.render_changes("bench"))))
+            diff_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            full_bytes += len(to_xml(Div(manager.render_all_cards("bench", small=True), manager.render_cart("bench"))))
+            full_seconds += time.perf_counter() - started
+        rounds = args.rounds
+        print(f"{size:>6} {full_bytes // rounds:>12,} {full_seconds / rounds * 1000:>9.2f} "
+              f"{diff_bytes // rounds:>11,} {diff_seconds / rounds * 1000:>9.2f}")
@@ -0,0 +1,222 @@
+import re
+import time
+
+# Cart commands common enough to answer without the model. parse() returns the same
+# (tool name, args) pairs the agent's add_card/remove_card/update_card calls carry,
+# or None whenever the message is not fully understood, so the agent handles it.
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9,
+    'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'a': 1, 'an': 1, 'single': 1, 'couple': 2, 'pair': 2, 'few': 3, 'dozen': 12,
+}
+ALL_WORDS = {'all', 'every', 'everything'}
+
+# Multi-word phrases are rewritten to a single equivalent word before tokenizing
+PHRASES = {
+    'get rid of': 'remove', 'take out': 'remove', 'take away': 'remove', 'take off': 'remove',
+    'throw in': 'add', 'give me': 'add', 'get me': 'add', "i'd like": 'add', 'i would like': 'add',
+    'i want': 'add', 'i need': 'add', 'half a dozen': '6', 'a couple of': '2', 'a pair of': '2',
+    'a few': '3', 'a dozen': '12', 'all of the': 'all', 'all the': 'all', 'all of': 'all',
+}
+VERBS = {
+    'add': 'add_card', 'put': 'add_card', 'buy': 'add_card', 'get': 'add_card', 'grab': 'add_card',
+    'include': 'add_card', 'remove': 'remove_card', 'delete': 'remove_card', 'drop': 'remove_card',
+    'discard': 'remove_card', 'update': 'update_card', 'change': 'update_card', 'set': 'update_card',
+    'make': 'update_card', 'modify': 'update_card',
+}
+ATTRIBUTES = {'color': 'new_color', 'colour': 'new_color', 'quantity': 'quantity', 'qty': 'quantity',
+              'count': 'quantity', 'stock': 'quantity'}
+SEPARATORS = {',', 'and', 'then', 'also', 'plus', '&'}
+# Words that carry no meaning for a cart command
+FILLER = {
+    'please', 'pls', 'kindly', 'can', 'could', 'would', 'will', 'you', 'to', 'into', 'in', 'from', 'out', 'of',
+    'my', 'the', 'cart', 'basket', 'bag', 'card', 'cards', 'item', 'items', 'more', 'too', 'as', 'well',
+    'now', 'me', 'for', 'thanks', 'thank', 'it', 'its', 'is', 'be', 'with', 'just', 'same', 'again',
+}
+
+_PHRASE_PATTERN = re.compile(r'\b(' + '|'.join(sorted(map(re.escape, PHRASES), key=len, reverse=True)) + r')\b')
+# Digits joined by punctuation ("1.5", "2,5", "1/2", ".5") or signed ("-2") stay one token, which no rule
+# understands; so does any other symbol ("?", "-", "%"), sending questions and odd input to the agent
+_TOKEN_PATTERN = re.compile(r"[a-z']+|[-+]?\.?\d+(?:[.,/:]\d+)*|[^\s.!]")
+# "twenty-one", "re-add": hyphens between words only
+_WORD_HYPHEN = re.compile(r"(?<=[a-z])-(?=[a-z])")
+
+
+def singular_forms(word: str):
+    """The word and its likely singulars (bananas -> banana, berries -> berry, tomatoes -> tomato)."""
+    yield word
+    if word.endswith('ies'):
+        yield word[:-3] + 'y'
+    if word.endswith('es'):
+        yield word[:-2]
+    if word.endswith('s'):
+        yield word[:-1]
+
+
+class IntentParser:
+    """Deterministic fast path for simple add/remove/update cart commands."""
+
+    def __init__(self):
+        self.stats = {'local': 0, 'fallback': 0}
+
+    def local_share(self) -> float:
+        total = self.stats['local'] + self.stats['fallback']
+        return self.stats['local'] / total if total else 0.0
+
+    def parse(self, message: str, inventory: dict, colors=(), cart: dict = None) -> list:
+        """Operations for `message` against the session's `inventory` and `cart`, or None to fall back to the agent."""
+        operations = self._parse(message, inventory, set(colors), cart)
+        self.stats['local' if operations else 'fallback'] += 1
+        return operations
+
+    def _parse(self, message: str, inventory: dict, colors: set, cart: dict):
+        text = _PHRASE_PATTERN.sub(lambda m: PHRASES[m.group(1)], _WORD_HYPHEN.sub(' ', message.lower()))
+        tokens = _TOKEN_PATTERN.findall(text)
+        # Clauses separated by commas and conjunctions; a clause without a verb reuses the previous one
+        operations, action, clause = [], None, []
+        for token in tokens + [',']:
+            if token in SEPARATORS or token == ';':
+                if clause:
+                    result = self._clause(clause, action, inventory, colors, cart)
+                    if result is None:
+                        return None
+                    action, clause_operations = result
+                    operations += clause_operations
+                    clause = []
+            else:
+                clause.append(token)
+        return operations or None
+
+    def _clause(self, tokens: list, action, inventory: dict, colors: set, cart: dict):
+        """(action, operations) for one clause, or None if any word is not understood."""
+        # A trailing ", please" or ", thanks"
+        if all(token in FILLER for token in tokens):
+            return action, []
+        # "please add ...", "can you remove ..."
+        while len(tokens) > 1 and tokens[0] in FILLER:
+            tokens = tokens[1:]
+        if tokens[0] in VERBS:
+            action, tokens = VERBS[tokens[0]], tokens[1:]
+        if action is None:
+            return None
+        if action == 'update_card':
+            operations = self._update(tokens, inventory, colors, cart)
+            return (action, operations) if operations else None
+
+        operations, quantity, remove_all, article = [], None, False, False
+        for token in tokens:
+            item = next((form for form in singular_forms(token) if form in inventory), None)
+            if item is not None:
+                if action == 'add_card':
+                    # "add bananas" or "add all bananas" leave the amount to the agent
+                    if remove_all or (quantity is None and item != token):
+                        return None
+                    operations.append(('add_card', {
+                        'name': item, 'color': inventory[item]['color'], 'quantity': quantity or 1,
+                    }))
+                else:
+                    # "remove apples" (plural, no amount) means all of them
+                    every = remove_all or (quantity is None and item != token)
+                    operations.append(('remove_card', {'name': item, 'quantity': quantity or 1, 'remove_all': every}))
+                quantity, remove_all, article = None, False, False
+            elif token.isdigit() or token in NUMBER_WORDS:
+                value = int(token) if token.isdigit() else NUMBER_WORDS[token]
+                if quantity is None or article:
+                    # "a single apple", "a couple apples": the article gives way to the number
+                    quantity = value
+                elif quantity >= 20 and quantity % 10 == 0 and value < 10 and token not in ('a', 'an'):
+                    # "twenty one": a tens word followed by a unit
+                    quantity += value
+                else:
+                    # "add 2 3 bananas": never guess which amount was meant
+                    return None
+                article = token in ('a', 'an')
+                if quantity <= 0:
+                    return None
+            elif token in ALL_WORDS:
+                remove_all = True
+            elif token not in FILLER:
+                return None
+        # A dangling amount ("add 2") has nothing to apply to
+        if quantity is not None or remove_all or not operations:
+            return None
+        return action, operations
+
+    def _update(self, tokens: list, inventory: dict, colors: set, cart: dict):
+        """Operations for "change banana colour to green", "make grape red", "set apple stock to 40" (update_card)
+        and "set apples to 3", which is about the cart: the difference is added or removed."""
+        args = {}
+        for token in tokens:
+            item = next((form for form in singular_forms(token) if form in inventory), None)
+            if item is not None and 'name' not in args:
+                args['name'] = item
+            elif token in colors and 'new_color' not in args:
+                args['new_color'] = token
+            elif token.isdigit() and 'quantity' not in args:
+                args['quantity'] = int(token)
+            elif token in NUMBER_WORDS and token not in ('a', 'an') and 'quantity' not in args:
+                args['quantity'] = NUMBER_WORDS[token]
+            elif token not in FILLER and token not in ATTRIBUTES:
+                return None
+        # Exactly what the attribute word (if any) asked for
+        asked = {ATTRIBUTES[token] for token in tokens if token in ATTRIBUTES}
+        if 'name' not in args or not (args.keys() - {'name'}) or not asked <= args.keys():
+            return None
+        name = args['name']
+        if 'quantity' not in args:
+            return [('update_card', args)]
+        if 'stock' in tokens:
+            args['new_quantity'] = args.pop('quantity')
+            return [('update_card', args)]
+        # A cart amount can't be combined with a colour change, and needs the current cart to diff against
+        if 'new_color' in args or cart is None:
+            return None
+        wanted, held = args['quantity'], cart.get(name, {}).get('quantity', 0)
+        if wanted > held:
+            return [('add_card', {'name': name, 'color': inventory[name]['color'], 'quantity': wanted - held})]
+        if wanted < held:
+            return [('remove_card', {'name': name, 'quantity': held - wanted, 'remove_all': wanted == 0})]
+        return None
+
+
+def describe(operations: list) -> str:
+    """Chat reply for operations applied locally, like the agent's confirmations."""
+    def amount(args):
+        name = args['name']
+        if args.get('remove_all'):
+            return f"all {name}s"
+        return f"{args['quantity']} {name}{'s' if args['quantity'] != 1 else ''}"
+
+    added = [amount(args) for tool, args in operations if tool == 'add_card']
+    removed = [amount(args) for tool, args in operations if tool == 'remove_card']
+    parts = []
+    if added:
+        parts.append(f"Added {_join(added)} to your cart.")
+    if removed:
+        parts.append(f"Removed {_join(removed)} from your cart.")
+    for tool, args in operations:
+        if tool == 'update_card':
+            changes = [f"color to {args['new_color']}" if 'new_color' in args else '',
+                       f"quantity to {args['new_quantity']}" if 'new_quantity' in args else '']
+            parts.append(f"Updated {args['name']} {' and '.join(c for c in changes if c)}.")
+    return ' '.join(parts)
+
+
+def _join(items: list) -> str:
+    return items[0] if len(items) == 1 else ', '.join(items[:-1]) + f" and {items[-1]}"
+
+
+if __name__ == '__main__':
+    import sys
+
+    inventory = {'banana': {'color': 'yellow'}, 'apple': {'color': 'red'},
+                 'orange': {'color': 'orange'}, 'grape': {'color': 'purple'}}
+    cart = {'apple': {'quantity': 2}}
+    parser = IntentParser()
+    for message in sys.argv[1:]:
+        started = time.perf_counter()
+        operations = parser.parse(message, inventory, colors=('yellow', 'red', 'green', 'orange', 'purple'), cart=cart)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        print(f"{message!r}: {operations if operations else 'agent fallback'} ({elapsed_us:.0f} µs)")
@@ -4,7 +4,10 @@ import os
 import logfire
 from dotenv import load_dotenv
 import time
+from dataclasses import dataclass
+from typing import Optional
 from pydantic import BaseModel
+from cards import CardManager
 
 load_dotenv(override=True)
 logfire.configure()
@@ -19,10 +22,26 @@ class CardData(BaseModel):
     color: str
     description: str
 
-agent = Agent(model)
+@dataclass
+class ShopDeps:
+    """The session's cards, which the tools change directly, and what the run changed."""
+    cards: CardManager
+    session_id: str
+    cards_updated: bool = False
+    error_message: Optional[str] = None
+
+    def record(self, error: Optional[str]) -> str:
+        """Note a tool's outcome; returns the error (for the model) or an empty string."""
+        if error:
+            self.error_message = error
+            return error
+        self.cards_updated = True
+        return ""
+
+agent = Agent(model, deps_type=ShopDeps)
 
 @agent.tool
-def add_card(ctx: RunContext, name: str, color: str, quantity: int = 1) -> dict:
+def add_card(ctx: RunContext[ShopDeps], name: str, color: str, quantity: int = 1) -> str:
     """Add a card for the specified item. Determine the color based on the natural color of the fruit/item.
     For example: banana is yellow, apple is red, orange is orange, grape is purple, lime is green, etc.
     
@@ -32,17 +51,19 @@ def add_card(ctx: RunContext, name: str, color: str, quantity: int = 1) -> dict:
         quantity: The quantity of the item (default is 1)
     
     Returns:
-        A dictionary with card creation status including the name, color, and quantity
+        What happened: the new cart quantity and remaining stock, or why the item could not be added
     """
-    return {
-        "action": "add_card",
-        "name": name,
-        "color": color,
-        "quantity": quantity
-    }
+    deps = ctx.deps
+    error = deps.record(deps.cards.add_card(deps.session_id, name, color, quantity))
+    if error:
+        return error
+    name = name.lower()
+    in_cart = deps.cards.cart(deps.session_id)[name]['quantity']
+    in_stock = deps.cards.inventory(deps.session_id)[name]['quantity']
+    return f"Added {quantity} {name} to the cart ({in_cart} in cart, {in_stock} left in stock)."
 
 @agent.tool
-def remove_card(ctx: RunContext, name: str, quantity: int = 1, remove_all: bool = False) -> dict:
+def remove_card(ctx: RunContext[ShopDeps], name: str, quantity: int = 1, remove_all: bool = False) -> str:
     """Remove cards with the specified name.
     
     Args:
@@ -51,17 +72,18 @@ def remove_card(ctx: RunContext, name: str, quantity: int = 1, remove_all: bool
         remove_all: Set to True if user says 'all' or 'remove all' (default is False)
     
     Returns:
-        A dictionary with card removal status
+        What happened: the quantity left in the cart, or why nothing was removed
     """
-    return {
-        "action": "remove_card",
-        "name": name,
-        "quantity": quantity,
-        "remove_all": remove_all
-    }
+    deps = ctx.deps
+    error = deps.record(deps.cards.remove_card(deps.session_id, name, quantity, remove_all))
+    if error:
+        return error
+    name = name.lower()
+    left = deps.cards.cart(deps.session_id).get(name, {}).get('quantity', 0)
+    return f"Removed {name} from the cart ({left} left in cart)."
 
 @agent.tool
-def update_card(ctx: RunContext, name: str, new_color: str = None, new_quantity: int = None) -> dict:
+def update_card(ctx: RunContext[ShopDeps], name: str, new_color: str = None, new_quantity: int = None) -> str:
     """Update the color and/or quantity of an existing card.
     
     Args:
@@ -70,27 +92,25 @@ def update_card(ctx: RunContext, name: str, new_color: str = None, new_quantity:
         new_quantity: The new quantity for the card (optional)
     
     Returns:
-        A dictionary with card update status
+        The card's color and quantity after the update, or why it could not be updated
     """
-    result = {
-        "action": "update_card",
-        "name": name
-    }
-    if new_color:
-        result["color"] = new_color
-    if new_quantity is not None:
-        result["quantity"] = new_quantity
-    return result
+    deps = ctx.deps
+    error = deps.record(deps.cards.update_card(deps.session_id, name, new_color, new_quantity))
+    if error:
+        return error
+    card = deps.cards.inventory(deps.session_id)[name.lower()]
+    return f"Updated {card['name']}: color {card['color']}, quantity {card['quantity']}."
 
 time.sleep(2)  
 
 async def main():
     message_history = []
+    cards = CardManager()
     while True:
         message = input("You: ")
         if message.upper() in ["EXIT", "QUIT"]:
             break
-        response = await agent.run(message, message_history=message_history)
+        response = await agent.run(message, message_history=message_history, deps=ShopDeps(cards, "cli"))
         print("Agent: ", response.output)
 
         message_history = response.all_messages()
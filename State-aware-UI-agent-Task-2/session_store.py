@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, fields, is_dataclass
+
+# Bookkeeping for per-session state (cart, inventory, chat history) kept elsewhere.
+# The store decides when a session is dropped: after `ttl` idle seconds, or least
+# recently used first once the sessions together exceed `max_bytes`. Dropping calls
+# each `on_evict` callback with the session id so the owners can free the data.
+
+
+def approx_size(obj, _seen=None) -> int:
+    """Rough deep size in bytes of dicts, lists, dataclasses and pydantic-ai messages."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_size(k, _seen) + approx_size(v, _seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(item, _seen) for item in obj)
+    if is_dataclass(obj):
+        return size + sum(approx_size(getattr(obj, f.name, None), _seen) for f in fields(obj))
+    return size
+
+
+@dataclass
+class Session:
+    id: str
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+    nbytes: int = 0
+    users: int = 0  # requests holding or waiting for the lock; such sessions are never evicted
+
+
+class SessionStore:
+    """Idle TTL, LRU memory budget and a lock per session."""
+
+    def __init__(self, ttl: float = 1800.0, max_bytes: int = 64 * 1024 * 1024, sizer=None, on_evict=()):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizer = sizer  # session id -> bytes held for it
+        self.on_evict = list(on_evict)
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()  # least recently used first
+        self.total_bytes = 0
+        self.sweep_interval = min(ttl / 4, 60.0)
+        self._last_sweep = time.monotonic()
+        self.stats = {'evicted_ttl': 0, 'evicted_lru': 0}
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            ttl=float(os.getenv("SESSION_TTL", "1800")),
+            max_bytes=int(float(os.getenv("SESSION_MEMORY_MB", "64")) * 1024 * 1024),
+            **kwargs,
+        )
+
+    @asynccontextmanager
+    async def session(self, session_id: str):
+        """Hold the session's lock so its requests run one at a time; re-measure it afterwards."""
+        self.sweep()
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session(session_id)
+        session.users += 1
+        try:
+            async with session.lock:
+                self.touch(session)
+                try:
+                    yield session
+                finally:
+                    self.touch(session)
+                    self.measure(session)
+        finally:
+            session.users -= 1
+        self.enforce_budget()
+
+    def touch(self, session: Session):
+        session.last_used = time.monotonic()
+        if session.id in self.sessions:
+            self.sessions.move_to_end(session.id)
+
+    def measure(self, session: Session):
+        if self.sizer is None:
+            return
+        nbytes = self.sizer(session.id)
+        self.total_bytes += nbytes - session.nbytes
+        session.nbytes = nbytes
+
+    def sweep(self, force: bool = False):
+        """Drop sessions idle for longer than the TTL (at most every `sweep_interval` seconds)."""
+        now = time.monotonic()
+        if not force and now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        # Oldest first, so stop at the first session still within the TTL
+        for session in list(self.sessions.values()):
+            if now - session.last_used <= self.ttl:
+                break
+            if not session.users:
+                self.evict(session, 'evicted_ttl')
+
+    def enforce_budget(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for session in list(self.sessions.values()):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if not session.users:
+                self.evict(session, 'evicted_lru')
+
+    def evict(self, session: Session, reason: str):
+        del self.sessions[session.id]
+        self.total_bytes -= session.nbytes
+        self.stats[reason] += 1
+        for callback in self.on_evict:
+            callback(session.id)
+
+    def snapshot(self, top: int = 10) -> dict:
+        """Live session count, memory use, evictions and the largest sessions."""
+        largest = sorted(self.sessions.values(), key=lambda s: s.nbytes, reverse=True)[:top]
+        return {
+            'sessions': len(self.sessions),
+            'active': sum(1 for s in self.sessions.values() if s.users),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'avg_bytes_per_session': self.total_bytes // len(self.sessions) if self.sessions else 0,
+            'largest': {s.id: s.nbytes for s in largest},
+            **self.stats,
+        }
@@ -0,0 +1,420 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from session_store import approx_size
+
+# Where CardManager keeps inventory and carts, and ui.py keeps chat histories.
+# MemoryBackend is one process's dicts; SQLiteBackend is a WAL-mode database file
+# that any number of worker processes can share. Stock changes are single
+# conditional UPDATEs inside a write transaction, so two workers can never sell
+# the same unit twice. Histories carry a version and are saved with compare-and-set,
+# so a worker that loaded an older history cannot overwrite another worker's turn.
+
+
+def from_env():
+    """STATE_BACKEND=memory (default) or sqlite (at STATE_DB_PATH)."""
+    kind = os.getenv("STATE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("STATE_DB_PATH", "shop_state.db"), ttl=float(os.getenv("SESSION_TTL", "1800")))
+    if kind != "memory":
+        raise ValueError(f"Unknown STATE_BACKEND {kind!r} (expected memory or sqlite)")
+    return MemoryBackend()
+
+
+def dump_history(messages) -> bytes:
+    from pydantic_ai.messages import ModelMessagesTypeAdapter
+
+    return zlib.compress(ModelMessagesTypeAdapter.dump_json(messages, exclude_none=True), 6)
+
+
+def load_history(data: bytes) -> list:
+    from pydantic_ai.messages import ModelMessagesTypeAdapter
+
+    return ModelMessagesTypeAdapter.validate_json(zlib.decompress(data))
+
+
+def append_history(backend, session_id: str, history: list, version: int, new_messages: list):
+    """Save `history` plus one turn's messages; if another worker saved first, append to its history instead."""
+    while not backend.save_history(session_id, history + new_messages, version):
+        history, version = backend.load_history(session_id)
+
+
+class MemoryBackend:
+    """Per-process dicts; the fastest option, for a single worker."""
+
+    def __init__(self):
+        self.cards_storage = {}
+        self.cart_storage = {}  # Track items added to cart
+        self.histories = {}  # session -> (messages, version)
+        self.pending = {}  # token -> (message, session_id, received, expires)
+
+    def init_session(self, session_id: str, initial_inventory: dict):
+        if session_id not in self.cards_storage:
+            self.cards_storage[session_id] = {k: v.copy() for k, v in initial_inventory.items()}
+        if session_id not in self.cart_storage:
+            self.cart_storage[session_id] = {}
+
+    def inventory(self, session_id: str) -> dict:
+        return self.cards_storage[session_id]
+
+    def cart(self, session_id: str) -> dict:
+        return self.cart_storage[session_id]
+
+    def reserve(self, session_id: str, name: str, quantity: int):
+        """Move `quantity` of an item from stock into the cart if that much is in stock.
+
+        Returns the stock before the attempt, or None if the item is not in the inventory.
+        """
+        item = self.cards_storage[session_id].get(name)
+        if item is None:
+            return None
+        available = item['quantity']
+        if quantity > available:
+            return available
+        item['quantity'] -= quantity
+        cart = self.cart_storage[session_id]
+        if name in cart:
+            cart[name]['quantity'] += quantity
+        else:
+            cart[name] = {'name': name, 'color': item['color'], 'quantity': quantity, 'price': item['price']}
+        return available
+
+    def release(self, session_id: str, name: str, quantity: int, remove_all: bool = False) -> bool:
+        """Return items from the cart to stock (all of them if `remove_all` or `quantity` covers the cart)."""
+        cart = self.cart_storage[session_id]
+        if name not in cart:
+            return False
+        moved = cart[name]['quantity'] if remove_all else min(quantity, cart[name]['quantity'])
+        self.cards_storage[session_id][name]['quantity'] += moved
+        cart[name]['quantity'] -= moved
+        if not cart[name]['quantity']:
+            del cart[name]
+        return True
+
+    def update_item(self, session_id: str, name: str, color=None, quantity=None) -> bool:
+        item = self.cards_storage[session_id].get(name)
+        if item is None:
+            return False
+        if color:
+            item['color'] = color
+        if quantity is not None:
+            item['quantity'] = quantity
+        return True
+
+    def load_history(self, session_id: str):
+        """(messages, version); version 0 means nothing has been saved yet."""
+        messages, version = self.histories.get(session_id, ((), 0))
+        return list(messages), version
+
+    def save_history(self, session_id: str, messages: list, version: int) -> bool:
+        """Store the history if it is still at `version`; False if it was saved since it was loaded."""
+        if self.histories.get(session_id, ((), 0))[1] != version:
+            return False
+        self.histories[session_id] = (messages, version + 1)
+        return True
+
+    def put_pending(self, token: str, session_id: str, message: str, ttl: float):
+        """Park a message until its reply stream is opened; it is dropped after `ttl` seconds."""
+        now = time.time()
+        for stale in [t for t, entry in self.pending.items() if entry[3] < now]:
+            del self.pending[stale]
+        self.pending[token] = (message, session_id, now, now + ttl)
+
+    def take_pending(self, token: str):
+        """(message, session_id, received) for the token, once, or None if unknown or expired."""
+        entry = self.pending.pop(token, None)
+        if entry is None or entry[3] < time.time():
+            return None
+        return entry[:3]
+
+    def size(self, session_id: str) -> int:
+        """Bytes this process holds for the session."""
+        return (approx_size(self.cards_storage.get(session_id)) + approx_size(self.cart_storage.get(session_id))
+                + approx_size(self.histories.get(session_id)))
+
+    def evict(self, session_id: str):
+        self.cards_storage.pop(session_id, None)
+        self.cart_storage.pop(session_id, None)
+        self.histories.pop(session_id, None)
+        for token in [t for t, entry in self.pending.items() if entry[1] == session_id]:
+            del self.pending[token]
+
+    def stats(self) -> dict:
+        return {'backend': 'memory', 'sessions': len(self.cards_storage)}
+
+
+class SQLiteBackend:
+    """A WAL-mode SQLite file shared by every worker process on the host.
+
+    Nothing is held in process memory, so the session store's memory budget does not
+    apply; sessions idle for `ttl` seconds are deleted from the database instead.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (session TEXT PRIMARY KEY, updated REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS inventory (
+            session TEXT NOT NULL, name TEXT NOT NULL, color TEXT NOT NULL, quantity INTEGER NOT NULL,
+            price REAL NOT NULL, UNIQUE (session, name));
+        CREATE TABLE IF NOT EXISTS cart (
+            session TEXT NOT NULL, name TEXT NOT NULL, color TEXT NOT NULL, quantity INTEGER NOT NULL,
+            price REAL NOT NULL, UNIQUE (session, name));
+        CREATE TABLE IF NOT EXISTS history (session TEXT PRIMARY KEY, data BLOB NOT NULL, version INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS pending (
+            token TEXT PRIMARY KEY, session TEXT NOT NULL, message TEXT NOT NULL, received REAL NOT NULL,
+            expires REAL NOT NULL);
+    """
+
+    def __init__(self, path: str = "shop_state.db", ttl: float = 1800.0):
+        self.path = path
+        self.ttl = ttl
+        self.prune_interval = min(ttl / 4, 60.0)
+        self._last_prune = 0.0
+        self._local = threading.local()
+        self.db.executescript(self.SCHEMA)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # One connection per thread (and so per worker process)
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _write(self):
+        """A write transaction; BEGIN IMMEDIATE takes the write lock up front instead of failing mid-way."""
+        return _Transaction(self.db)
+
+    def init_session(self, session_id: str, initial_inventory: dict):
+        now = time.time()
+        with self._write() as db:
+            created = db.execute(
+                "INSERT OR IGNORE INTO sessions (session, updated) VALUES (?, ?)", (session_id, now)
+            ).rowcount
+            if created:
+                db.executemany(
+                    "INSERT INTO inventory (session, name, color, quantity, price) VALUES (?, ?, ?, ?, ?)",
+                    [(session_id, name, item['color'], item['quantity'], item['price'])
+                     for name, item in initial_inventory.items()],
+                )
+            else:
+                db.execute("UPDATE sessions SET updated = ? WHERE session = ?", (now, session_id))
+        if now - self._last_prune > self.prune_interval:
+            self._last_prune = now
+            self.prune(now - self.ttl)
+
+    def _items(self, table: str, session_id: str) -> dict:
+        rows = self.db.execute(
+            f"SELECT name, color, quantity, price FROM {table} WHERE session = ? ORDER BY rowid", (session_id,)
+        )
+        return {name: {'name': name, 'color': color, 'quantity': quantity, 'price': price}
+                for name, color, quantity, price in rows}
+
+    def inventory(self, session_id: str) -> dict:
+        return self._items("inventory", session_id)
+
+    def cart(self, session_id: str) -> dict:
+        return self._items("cart", session_id)
+
+    def reserve(self, session_id: str, name: str, quantity: int):
+        with self._write() as db:
+            row = db.execute(
+                "SELECT color, quantity, price FROM inventory WHERE session = ? AND name = ?", (session_id, name)
+            ).fetchone()
+            if row is None:
+                return None
+            color, available, price = row
+            if quantity > available:
+                return available
+            db.execute(
+                "UPDATE inventory SET quantity = quantity - ? WHERE session = ? AND name = ? AND quantity >= ?",
+                (quantity, session_id, name, quantity),
+            )
+            db.execute(
+                "INSERT INTO cart (session, name, color, quantity, price) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (session, name) DO UPDATE SET quantity = quantity + excluded.quantity",
+                (session_id, name, color, quantity, price),
+            )
+            return available
+
+    def release(self, session_id: str, name: str, quantity: int, remove_all: bool = False) -> bool:
+        with self._write() as db:
+            row = db.execute("SELECT quantity FROM cart WHERE session = ? AND name = ?", (session_id, name)).fetchone()
+            if row is None:
+                return False
+            moved = row[0] if remove_all else min(quantity, row[0])
+            db.execute(
+                "UPDATE inventory SET quantity = quantity + ? WHERE session = ? AND name = ?", (moved, session_id, name)
+            )
+            if moved == row[0]:
+                db.execute("DELETE FROM cart WHERE session = ? AND name = ?", (session_id, name))
+            else:
+                db.execute(
+                    "UPDATE cart SET quantity = quantity - ? WHERE session = ? AND name = ?", (moved, session_id, name)
+                )
+            return True
+
+    def update_item(self, session_id: str, name: str, color=None, quantity=None) -> bool:
+        with self._write() as db:
+            return bool(db.execute(
+                "UPDATE inventory SET color = COALESCE(?, color), quantity = COALESCE(?, quantity) "
+                "WHERE session = ? AND name = ?",
+                (color or None, quantity, session_id, name),
+            ).rowcount)
+
+    def load_history(self, session_id: str):
+        row = self.db.execute("SELECT data, version FROM history WHERE session = ?", (session_id,)).fetchone()
+        return (load_history(row[0]), row[1]) if row else ([], 0)
+
+    def save_history(self, session_id: str, messages: list, version: int) -> bool:
+        data = dump_history(messages)
+        with self._write() as db:
+            if version == 0:
+                return bool(db.execute(
+                    "INSERT OR IGNORE INTO history (session, data, version) VALUES (?, ?, 1)", (session_id, data)
+                ).rowcount)
+            return bool(db.execute(
+                "UPDATE history SET data = ?, version = version + 1 WHERE session = ? AND version = ?",
+                (data, session_id, version),
+            ).rowcount)
+
+    def put_pending(self, token: str, session_id: str, message: str, ttl: float):
+        now = time.time()
+        with self._write() as db:
+            db.execute("DELETE FROM pending WHERE expires < ?", (now,))
+            db.execute(
+                "INSERT INTO pending (token, session, message, received, expires) VALUES (?, ?, ?, ?, ?)",
+                (token, session_id, message, now, now + ttl),
+            )
+
+    def take_pending(self, token: str):
+        # Deleted in the same transaction, so only one worker gets to stream the reply
+        with self._write() as db:
+            row = db.execute(
+                "SELECT message, session, received FROM pending WHERE token = ? AND expires >= ?", (token, time.time())
+            ).fetchone()
+            db.execute("DELETE FROM pending WHERE token = ?", (token,))
+        return row
+
+    def size(self, session_id: str) -> int:
+        return 0  # nothing for this session stays in process memory
+
+    def evict(self, session_id: str):
+        pass  # other workers may still be serving the session; prune() removes it once idle
+
+    def drop_session(self, session_id: str):
+        with self._write() as db:
+            for table in ("sessions", "inventory", "cart", "history", "pending"):
+                db.execute(f"DELETE FROM {table} WHERE session = ?", (session_id,))
+
+    def prune(self, before: float) -> int:
+        """Delete sessions last used before the `before` timestamp; returns how many."""
+        with self._write() as db:
+            stale = [row[0] for row in db.execute("SELECT session FROM sessions WHERE updated < ?", (before,))]
+            for table in ("sessions", "inventory", "cart", "history", "pending"):
+                db.executemany(f"DELETE FROM {table} WHERE session = ?", [(session,) for session in stale])
+        return len(stale)
+
+    def stats(self) -> dict:
+        sessions, history_bytes = self.db.execute(
+            "SELECT (SELECT COUNT(*) FROM sessions), (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM history)"
+        ).fetchone()
+        return {'backend': 'sqlite', 'path': self.path, 'sessions': sessions, 'history_bytes': history_bytes}
+
+
+class _Transaction:
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _bench_worker(backend, worker: int, ops: int, history_every: int):
+    """Mixed cart traffic on one session shared by all workers and one session of the worker's own."""
+    from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+
+    inventory = {'banana': {'name': 'banana', 'color': 'yellow', 'quantity': 100, 'price': 50},
+                 'apple': {'name': 'apple', 'color': 'red', 'quantity': 100, 'price': 80}}
+    own = f"bench-{worker}"
+    for i in range(ops):
+        session_id = "bench-shared" if i % 2 else own
+        backend.init_session(session_id, inventory)
+        name = 'banana' if i % 3 else 'apple'
+        if i % 4 == 3:
+            backend.release(session_id, name, 1)
+        else:
+            backend.reserve(session_id, name, 1)
+        if i % history_every == 0:
+            turn = [ModelRequest(parts=[UserPromptPart(content=f"add 1 {name}")]),
+                    ModelResponse(parts=[TextPart(content=f"Added 1 {name} to your cart.")])]
+            history, version = backend.load_history(own)
+            backend.save_history(own, history[-38:] + turn, version)
+            if i % (history_every * 10) == 0:
+                # Every worker appends to the shared history; none of these turns may be lost
+                append_history(backend, "bench-shared", *backend.load_history("bench-shared"), turn)
+
+
+def _bench_process(path: str, worker: int, ops: int, history_every: int):
+    _bench_worker(SQLiteBackend(path), worker, ops, history_every)
+
+
+if __name__ == '__main__':
+    import argparse
+    import multiprocessing
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Throughput of the in-memory and SQLite state backends.")
+    parser.add_argument("--ops", type=int, default=5000, help="cart operations per worker")
+    parser.add_argument("--workers", type=int, default=4, help="SQLite worker processes sharing one file")
+    parser.add_argument("--history-every", type=int, default=10, help="save and reload the history every N operations")
+    args = parser.parse_args()
+
+    def report(label, backend, workers, seconds):
+        # Stock plus cart must still equal the starting stock: no unit was sold twice or lost
+        inventory, cart = backend.inventory("bench-shared"), backend.cart("bench-shared")
+        consistent = all(inventory[name]['quantity'] + cart.get(name, {}).get('quantity', 0) == 100
+                         and inventory[name]['quantity'] >= 0 for name in inventory)
+        # ... and every worker's turns made it into the shared history
+        consistent &= len(backend.load_history("bench-shared")[0]) == 2 * workers * len(
+            range(0, args.ops, args.history_every * 10))
+        total = args.ops * workers
+        print(f"{label:<28} {total / seconds:>10,.0f} ops/s  ({total} ops in {seconds:.2f} s, consistent: {consistent})")
+
+    load_history(dump_history([]))  # import and build the serializer before timing
+    started = time.perf_counter()
+    memory = MemoryBackend()
+    _bench_worker(memory, 0, args.ops, args.history_every)
+    report("memory, 1 process", memory, 1, time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        _bench_process(path, 0, args.ops, args.history_every)
+        report("sqlite, 1 process", SQLiteBackend(path), 1, time.perf_counter() - started)
+
+        path = os.path.join(tmp, "bench-shared.db")
+        SQLiteBackend(path)  # create the schema before the workers race to
+        workers = [multiprocessing.Process(target=_bench_process, args=(path, i, args.ops, args.history_every))
+                   for i in range(args.workers)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - started
+        backend = SQLiteBackend(path)
+        report(f"sqlite, {args.workers} processes", backend, args.workers, seconds)
+        print(f"compressed history: {backend.stats()['history_bytes'] // args.workers} bytes per session")
@@ -0,0 +1,48 @@
+"""Per-card swaps must target the ids of the fully rendered cards, whatever the item is called."""
+import re
+
+from fasthtml.common import Div, to_xml
+
+from cards import CardManager, card_id
+
+SESSION = 's1'
+
+
+def ids(element):
+    return re.findall(r'id="([^"]+)"', to_xml(element))
+
+
+def manager():
+    cards = CardManager()
+    cards.initial_inventory = {
+        'green apples': {'name': 'green apples', 'color': 'green', 'quantity': 5, 'price': 90},
+        "chef's knife": {'name': "chef's knife", 'color': 'blue', 'quantity': 2, 'price': 400},
+    }
+    cards.initialize_session(SESSION)
+    return cards
+
+
+def test_ids_are_valid_and_distinct():
+    names = ['green apples', 'green-apples', "chef's knife", 'Crème <b>']
+    dom_ids = [card_id('cart', name) for name in names]
+
+    assert len(set(dom_ids)) == len(names)
+    assert all(re.fullmatch(r'card-cart-[a-z0-9_-]+', dom_id) for dom_id in dom_ids)
+
+
+def test_swaps_target_the_full_render_ids():
+    cards = manager()
+    cards.add_card(SESSION, 'green apples', 'green', 2)
+    added = ids(Div(*cards.render_changes(SESSION)))
+    full = ids(cards.render_all_cards(SESSION, small=True)) + ids(cards.render_cart(SESSION))
+
+    assert card_id('inv', 'green apples') in added and card_id('cart', 'green apples') in added
+    assert set(added) - {'cart-container'} <= set(full)
+
+    cards.add_card(SESSION, 'green apples', 'green', 1)
+    updated = ids(Div(*cards.render_changes(SESSION)))
+    assert updated.count(card_id('cart', 'green apples')) == 1
+
+    cards.remove_card(SESSION, 'green apples', remove_all=True)
+    deleted = to_xml(Div(*cards.render_changes(SESSION)))
+    assert f'<div hx-swap-oob="delete" id="{card_id("cart", "green apples")}">' in deleted
@@ -0,0 +1,79 @@
+"""The local fast path: what it applies itself and what it leaves to the agent."""
+import pytest
+
+from intent_parser import IntentParser, describe
+
+INVENTORY = {'banana': {'color': 'yellow'}, 'apple': {'color': 'red'}, 'grape': {'color': 'purple'}}
+COLORS = ('yellow', 'red', 'green', 'purple')
+CART = {'apple': {'quantity': 2}}
+
+
+def parse(message, cart=CART):
+    return IntentParser().parse(message, INVENTORY, COLORS, cart)
+
+
+@pytest.mark.parametrize('message, operations', [
+    ('Add 2 bananas', [('add_card', {'name': 'banana', 'color': 'yellow', 'quantity': 2})]),
+    ('please add twenty-one apples!', [('add_card', {'name': 'apple', 'color': 'red', 'quantity': 21})]),
+    ('add a banana and 3 grapes, then remove all apples', [
+        ('add_card', {'name': 'banana', 'color': 'yellow', 'quantity': 1}),
+        ('add_card', {'name': 'grape', 'color': 'purple', 'quantity': 3}),
+        ('remove_card', {'name': 'apple', 'quantity': 1, 'remove_all': True}),
+    ]),
+    ('remove apples', [('remove_card', {'name': 'apple', 'quantity': 1, 'remove_all': True})]),
+    ('change banana colour to green', [('update_card', {'name': 'banana', 'new_color': 'green'})]),
+    ('set apple stock to 40', [('update_card', {'name': 'apple', 'new_quantity': 40})]),
+])
+def test_simple_commands_are_parsed(message, operations):
+    assert parse(message) == operations
+
+
+@pytest.mark.parametrize('message, operations', [
+    # Two apples are in the cart: the difference is added or removed
+    ('set apples to 5', [('add_card', {'name': 'apple', 'color': 'red', 'quantity': 3})]),
+    ('set apple quantity to 1', [('remove_card', {'name': 'apple', 'quantity': 1, 'remove_all': False})]),
+    ('set apples to 0', [('remove_card', {'name': 'apple', 'quantity': 2, 'remove_all': True})]),
+    ('set bananas to 4', [('add_card', {'name': 'banana', 'color': 'yellow', 'quantity': 4})]),
+])
+def test_setting_an_amount_changes_the_cart_not_the_stock(message, operations):
+    assert parse(message) == operations
+
+
+@pytest.mark.parametrize('message', [
+    'add -2 bananas',
+    'add +2 bananas',
+    'remove -1 apple',
+    'set apples to -3',
+    'add apples?',
+    'add 2 apples?',
+    'can you remove the grapes?',
+    'add 1.5 apples',
+    'add 2 3 bananas',
+    'add some apples',
+    'add 2 kiwis',
+    'set apples to 2',  # already in the cart
+    'make apples red and 3',
+])
+def test_unclear_messages_fall_back_to_the_agent(message):
+    assert parse(message) is None
+
+
+def test_cart_amounts_need_the_cart():
+    assert parse('set apples to 3', cart=None) is None
+
+
+def test_stats_count_local_and_fallback_messages():
+    parser = IntentParser()
+    parser.parse('add 2 bananas', INVENTORY, COLORS)
+    parser.parse('what is in stock?', INVENTORY, COLORS)
+
+    assert parser.stats == {'local': 1, 'fallback': 1}
+    assert parser.local_share() == 0.5
+
+
+def test_describe_confirms_what_was_done():
+    operations = parse('add 2 bananas and an apple, remove all grapes, make grape green')
+
+    assert describe(operations) == (
+        'Added 2 bananas and 1 apple to your cart. Removed all grapes from your cart. Updated grape color to green.'
+    )
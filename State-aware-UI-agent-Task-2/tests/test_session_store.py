@@ -0,0 +1,70 @@
+"""SessionStore: one request per session at a time, idle TTL and the LRU memory budget."""
+import asyncio
+import time
+
+from session_store import SessionStore
+
+
+def test_requests_for_one_session_run_one_at_a_time():
+    store, events = SessionStore(), []
+
+    async def request(session_id, name):
+        async with store.session(session_id):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(request("s1", "a"), request("s1", "b"), request("s2", "c"))
+
+    asyncio.run(run())
+
+    # c (another session) overlaps with a; b waits for a to finish
+    assert events.index("a end") < events.index("b start")
+    assert events.index("c start") < events.index("a end")
+
+
+def test_idle_sessions_expire(monkeypatch):
+    evicted = []
+    store = SessionStore(ttl=60, on_evict=[evicted.append])
+    now = time.monotonic()
+
+    async def use(session_id):
+        async with store.session(session_id):
+            pass
+
+    asyncio.run(use("old"))
+    monkeypatch.setattr(time, "monotonic", lambda: now + 120)
+    asyncio.run(use("new"))
+
+    assert evicted == ["old"] and list(store.sessions) == ["new"]
+    assert store.stats["evicted_ttl"] == 1
+
+
+def test_least_recently_used_sessions_go_first_over_budget():
+    sizes = {"a": 400, "b": 400, "c": 400}
+    evicted = []
+    store = SessionStore(max_bytes=1000, sizer=sizes.get, on_evict=[evicted.append])
+
+    async def use(*session_ids):
+        for session_id in session_ids:
+            async with store.session(session_id):
+                pass
+
+    asyncio.run(use("a", "b", "a", "c"))
+
+    assert evicted == ["b"] and list(store.sessions) == ["a", "c"]
+    assert store.snapshot()["bytes"] == 800 and store.stats["evicted_lru"] == 1
+
+
+def test_sessions_in_use_are_not_evicted():
+    store = SessionStore(max_bytes=100, sizer=lambda session_id: 400)
+
+    async def run():
+        async with store.session("busy"):
+            async with store.session("other"):
+                pass
+            return list(store.sessions)
+
+    # "busy" is over budget but still held; only the idle one can go
+    assert asyncio.run(run()) == ["busy"]
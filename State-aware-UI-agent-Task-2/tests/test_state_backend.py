@@ -0,0 +1,94 @@
+"""State backends: compare-and-set histories and stock that is never sold twice, across workers."""
+import threading
+
+import pytest
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+
+import state_backend
+from state_backend import MemoryBackend, SQLiteBackend
+
+INVENTORY = {'apple': {'name': 'apple', 'color': 'red', 'quantity': 20, 'price': 80}}
+
+
+def turn(text):
+    return [ModelRequest(parts=[UserPromptPart(content=text)]), ModelResponse(parts=[TextPart(content=f"ok {text}")])]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    return SQLiteBackend(str(tmp_path / 'state.db'))
+
+
+def test_stale_history_is_not_saved(backend):
+    history, version = backend.load_history('s1')
+    assert backend.save_history('s1', history + turn('first'), version)
+
+    # A worker still holding version 0 must not overwrite the saved turn
+    assert not backend.save_history('s1', history + turn('stale'), version)
+    messages, version = backend.load_history('s1')
+    assert [m.parts[0].content for m in messages] == ['first', 'ok first'] and version == 1
+
+
+def test_reserve_and_release_move_stock(backend):
+    backend.init_session('s1', INVENTORY)
+
+    assert backend.reserve('s1', 'apple', 5) == 20
+    assert backend.reserve('s1', 'apple', 50) == 15  # too many: nothing moves
+    assert backend.reserve('s1', 'pear', 1) is None
+    assert backend.release('s1', 'apple', 2)
+    assert backend.inventory('s1')['apple']['quantity'] == 17 and backend.cart('s1')['apple']['quantity'] == 3
+
+
+def test_pending_message_is_taken_once(backend):
+    backend.put_pending('token', 's1', 'add 2 apples', ttl=60)
+
+    message, session_id, _ = backend.take_pending('token')
+
+    assert (message, session_id) == ('add 2 apples', 's1')
+    assert backend.take_pending('token') is None
+
+
+def workers(count, target):
+    threads = [threading.Thread(target=target, args=(worker,)) for worker in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_turns_from_several_workers_are_all_kept(tmp_path):
+    path = str(tmp_path / 'state.db')
+    SQLiteBackend(path)
+
+    def worker(number):
+        backend = SQLiteBackend(path)  # its own connections, like another process
+        for i in range(5):
+            history, version = backend.load_history('s1')
+            state_backend.append_history(backend, 's1', history, version, turn(f"w{number}-{i}"))
+
+    workers(4, worker)
+
+    messages, version = SQLiteBackend(path).load_history('s1')
+    prompts = sorted(m.parts[0].content for m in messages if isinstance(m, ModelRequest))
+    assert prompts == sorted(f"w{number}-{i}" for number in range(4) for i in range(5))
+    assert version == 20
+
+
+def test_concurrent_workers_never_oversell(tmp_path):
+    path = str(tmp_path / 'state.db')
+    SQLiteBackend(path).init_session('s1', INVENTORY)
+    sold = []
+
+    def worker(number):
+        backend = SQLiteBackend(path)
+        for _ in range(10):
+            if backend.reserve('s1', 'apple', 1) >= 1:
+                sold.append(number)
+
+    workers(4, worker)
+
+    backend = SQLiteBackend(path)
+    assert len(sold) == 20
+    assert backend.inventory('s1')['apple']['quantity'] == 0 and backend.cart('s1')['apple']['quantity'] == 20
@@ -0,0 +1,48 @@
+"""Cart tools change the session's cards through ShopDeps and tell the model what really happened."""
+import asyncio
+
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import FunctionModel
+
+from cards import CardManager
+from main import ShopDeps, agent
+
+SESSION = 's1'
+
+
+def shopper(*calls):
+    """A model that makes `calls` in one turn, then replies with what the tools returned."""
+    def respond(messages, info):
+        returns = [part.content for part in messages[-1].parts if isinstance(part, ToolReturnPart)]
+        if returns:
+            return ModelResponse(parts=[TextPart(' | '.join(returns))])
+        return ModelResponse(parts=[ToolCallPart(name, args) for name, args in calls])
+    return FunctionModel(respond)
+
+
+def run(*calls):
+    deps = ShopDeps(CardManager(), SESSION)
+    with agent.override(model=shopper(*calls)):
+        result = asyncio.run(agent.run('shopping', deps=deps))
+    return deps, result.output
+
+
+def test_tools_apply_changes_and_report_the_new_state():
+    deps, reply = run(('add_card', {'name': 'Banana', 'color': 'yellow', 'quantity': 3}),
+                      ('update_card', {'name': 'apple', 'new_color': 'green'}))
+
+    assert deps.cards.cart(SESSION)['banana']['quantity'] == 3
+    assert deps.cards.inventory(SESSION)['apple']['color'] == 'green'
+    assert deps.cards_updated and deps.error_message is None
+    assert reply == ('Added 3 banana to the cart (3 in cart, 1 left in stock). | '
+                     'Updated apple: color green, quantity 5.')
+
+
+def test_model_sees_stock_errors_and_nothing_changes():
+    deps, reply = run(('add_card', {'name': 'grape', 'color': 'purple', 'quantity': 10}),
+                      ('remove_card', {'name': 'apple'}))
+
+    assert reply == ('Unable to add 10 grape(s). Only 6 available in stock. | '
+                     'Unable to remove apple. Item not in cart.')
+    assert deps.cards.cart(SESSION) == {} and deps.cards.inventory(SESSION)['grape']['quantity'] == 6
+    assert not deps.cards_updated and deps.error_message == 'Unable to remove apple. Item not in cart.'
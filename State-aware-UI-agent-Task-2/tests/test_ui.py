@@ -0,0 +1,79 @@
+"""Streamed replies: /send hands out a token, and /stream/{token} runs the agent for it exactly once."""
+import asyncio
+import re
+
+import httpx
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+import ui
+
+REPLY = "I added two grapes to your cart."
+
+
+def answered(messages):
+    return isinstance(messages[-1].parts[-1], ToolReturnPart)
+
+
+def respond(messages, info):
+    if answered(messages):
+        return ModelResponse(parts=[TextPart(REPLY)])
+    return ModelResponse(parts=[ToolCallPart('add_card', {'name': 'grape', 'color': 'purple', 'quantity': 2})])
+
+
+async def stream(messages, info):
+    if answered(messages):
+        for word in REPLY.split(' '):
+            await asyncio.sleep(0)
+            yield word + ' '
+    else:
+        yield {0: DeltaToolCall(name='add_card', json_args='{"name": "grape", "color": "purple", "quantity": 2}',
+                                tool_call_id='call-1')}
+
+
+async def events(client, url):
+    """(event, data) pairs of one server-sent event stream."""
+    received, event, data = [], None, []
+    async with client.stream('GET', url) as response:
+        async for line in response.aiter_lines():
+            if line.startswith('event:'):
+                event = line[len('event:'):].strip()
+            elif line.startswith('data:'):
+                data.append(line[len('data:'):].strip())
+            elif not line and event:
+                received.append((event, ' '.join(data)))
+                event, data = None, []
+    return received
+
+
+def chat(*requests):
+    """Send a message, then run `requests(client, stream_url)` against the app with the stand-in model."""
+    async def run():
+        transport = httpx.ASGITransport(app=ui.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://shop') as client:
+            with ui.agent.override(model=FunctionModel(respond, stream_function=stream)):
+                sent = await client.post('/send', data={'msg': 'I fancy some grapes', 'session_id': requests[0]})
+                url = re.search(r'sse-connect="([^"]+)"', sent.text).group(1)
+                return await asyncio.gather(*(events(client, url) for _ in requests[1:]))
+
+    return asyncio.run(run())
+
+
+def test_reply_streams_text_cards_and_the_final_bubble():
+    (received,) = chat('stream-1', 'once')
+
+    names = [event for event, _ in received]
+    assert names[-1] == 'done' and REPLY in received[-1][1]
+    assert 'cards' in names and names.index('cards') < names.index('text')
+    assert ui.card_manager.cart('stream-1')['grape']['quantity'] == 2
+
+
+def test_a_pending_message_is_streamed_exactly_once():
+    # Two connections for one token, e.g. a browser reconnecting while the first stream runs
+    first, second = chat('stream-2', 'first', 'second')
+
+    replies = [received for received in (first, second) if any(event == 'text' for event, _ in received)]
+    assert len(replies) == 1
+    other = second if replies[0] is first else first
+    assert other == [('done', other[0][1])] and 'no longer available' in other[0][1]
+    assert ui.card_manager.cart('stream-2')['grape']['quantity'] == 2  # the agent ran once
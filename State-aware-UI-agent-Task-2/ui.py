@@ -1,170 +1,69 @@
 from fasthtml.common import *
-from main import agent
+from main import ShopDeps, agent
+from cards import CardManager
+from intent_parser import IntentParser, describe
+from session_store import SessionStore
+import state_backend
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    FunctionToolResultEvent, ModelRequest, ModelResponse, PartDeltaEvent, PartStartEvent, TextPart, TextPartDelta,
+    UserPromptPart,
+)
+from collections import deque
+from uuid import uuid4
 import asyncio
+import os
+import time
 
 app, routes = fast_app(
     hdrs=(
         Script(src="https://cdn.tailwindcss.com", pico=False),
+        Script(src="https://cdn.jsdelivr.net/npm/htmx-ext-sse@2.2.2/sse.js"),
     )
 )
 
-# Store message history for each session
-message_histories = {}
+# Cart, inventory and message history for each session; STATE_BACKEND=sqlite shares them between workers
+backend = state_backend.from_env()
+card_manager = CardManager(backend)
+# Simple cart commands are applied directly instead of going through the model
+intent_parser = IntentParser()
 
-class CardManager:
-    """Manages card operations and storage."""
-    
-    def __init__(self):
-        self.cards_storage = {}
-        self.cart_storage = {}  # Track items added to cart
-        self.color_map = {
-            'yellow': 'bg-yellow-400', 'red': 'bg-red-500', 'green': 'bg-green-500',
-            'blue': 'bg-blue-500', 'orange': 'bg-orange-500', 'purple': 'bg-purple-500',
-            'pink': 'bg-pink-500', 'brown': 'bg-amber-700'
-        }
-        self.initial_inventory = {
-            'banana': {'name': 'banana', 'color': 'yellow', 'quantity': 4, 'price': 50},
-            'apple': {'name': 'apple', 'color': 'red', 'quantity': 5, 'price': 80},
-            'orange': {'name': 'orange', 'color': 'orange', 'quantity': 3, 'price': 60},
-            'grape': {'name': 'grape', 'color': 'purple', 'quantity': 6, 'price': 120}
-        }
-    
-    def initialize_session(self, session_id: str):
-        """Initialize a session with predefined inventory."""
-        if session_id not in self.cards_storage:
-            self.cards_storage[session_id] = {k: v.copy() for k, v in self.initial_inventory.items()}
-        if session_id not in self.cart_storage:
-            self.cart_storage[session_id] = {}
-    
-    def add_card(self, session_id: str, name: str, color: str, quantity: int = 1):
-        """Add items to cart and decrease inventory."""
-        self.initialize_session(session_id)
-        name = name.lower()
-        
-        if name in self.cards_storage[session_id]:
-            current_qty = self.cards_storage[session_id][name]['quantity']
-            if quantity > current_qty:
-                return f"Unable to add {quantity} {name}(s). Only {current_qty} available in stock."
-            
-            # Decrease inventory
-            self.cards_storage[session_id][name]['quantity'] -= quantity
-            
-            # Add to cart
-            if name in self.cart_storage[session_id]:
-                self.cart_storage[session_id][name]['quantity'] += quantity
-            else:
-                item_data = self.cards_storage[session_id][name]
-                self.cart_storage[session_id][name] = {
-                    'name': name,
-                    'color': item_data['color'],
-                    'quantity': quantity,
-                    'price': item_data['price']
-                }
-            return None
+# Idle sessions expire and the least recently used go first past the memory budget
+sessions = SessionStore.from_env(
+    sizer=backend.size, on_evict=(backend.evict, lambda session_id: card_manager.changes.pop(session_id, None))
+)
+
+# Agent replies stream into the chat over server-sent events; STREAMING=0 waits for the whole run instead
+STREAMING = os.getenv("STREAMING", "1") != "0"
+# Seconds a message waits in the backend for the browser to open its stream; any worker can serve it
+PENDING_TTL = 60.0
+# Seconds from receiving a message to the first reply text and to the full reply, per path (wall clock for
+# streamed replies, which another worker may serve)
+latencies = {name: deque(maxlen=1000) for name in ('blocking_reply', 'streamed_first_text', 'streamed_reply')}
+
+USER_STYLE = "bg-gradient-to-r from-blue-600 to-blue-500 text-white px-6 py-3 rounded-2xl rounded-tr-sm shadow-lg max-w-xl"
+BOT_STYLE = "px-6 py-3 rounded-2xl rounded-tl-sm shadow-md max-w-xl"
+ERROR_COLOR = "bg-red-50 border-l-4 border-red-500 text-red-800"
+REPLY_COLOR = "bg-white border-l-4 border-blue-500 text-gray-800"
+
+def apply_operations(session_id: str, operations):
+    """Apply (tool name, args) cart operations; returns (cards_updated, error_message)."""
+    cards_updated = False
+    error_message = None
+    for tool_name, args in operations:
+        if tool_name == 'add_card':
+            result = card_manager.add_card(session_id, args['name'], args.get('color', ''), args.get('quantity', 1))
+        elif tool_name == 'remove_card':
+            result = card_manager.remove_card(
+                session_id, args['name'], args.get('quantity', 1), args.get('remove_all', False)
+            )
         else:
-            return f"Unable to add {name}. Item not available in inventory."
-    
-    def remove_card(self, session_id: str, name: str, quantity: int = 1, remove_all: bool = False):
-        """Remove items from cart and restore to inventory."""
-        self.initialize_session(session_id)
-        name = name.lower()
-        
-        if name in self.cart_storage[session_id]:
-            cart_qty = self.cart_storage[session_id][name]['quantity']
-            
-            if remove_all:
-                # Remove all from cart, restore to inventory
-                self.cards_storage[session_id][name]['quantity'] += cart_qty
-                del self.cart_storage[session_id][name]
-            else:
-                # Remove specified quantity
-                if quantity >= cart_qty:
-                    # Remove all if quantity >= cart quantity
-                    self.cards_storage[session_id][name]['quantity'] += cart_qty
-                    del self.cart_storage[session_id][name]
-                else:
-                    # Partial removal
-                    self.cart_storage[session_id][name]['quantity'] -= quantity
-                    self.cards_storage[session_id][name]['quantity'] += quantity
+            result = card_manager.update_card(session_id, args['name'], args.get('new_color'), args.get('new_quantity'))
+        if result:  # Error message returned
+            error_message = result
         else:
-            return f"Unable to remove {name}. Item not in cart."
-    
-    def update_card(self, session_id: str, name: str, new_color: str = None, new_quantity: int = None):
-        """Update card color or quantity."""
-        if session_id not in self.cards_storage:
-            return
-        
-        name = name.lower()
-        if name in self.cards_storage[session_id]:
-            if new_color:
-                self.cards_storage[session_id][name]['color'] = new_color
-            if new_quantity is not None:
-                self.cards_storage[session_id][name]['quantity'] = new_quantity
-    
-    def create_card_element(self, name: str, color: str, quantity: int, card_id: str, price: float = 0.0, small: bool = False):
-        """Create a single card HTML element."""
-        color_class = self.color_map.get(color.lower(), 'bg-gray-500')
-        if small:
-            return Div(
-                Div(
-                    H4(name.title(), cls="text-xs font-bold text-gray-900 mb-1"),
-                    Div(
-                        P(f"₹{price:.0f}", cls="text-lg font-extrabold text-gray-900"),
-                        P(f"Stock: {quantity}", cls="text-xs font-medium text-gray-700 mt-0.5"),
-                        cls="text-center"
-                    ),
-                    cls="flex flex-col items-center justify-center h-full"
-                ),
-                cls=f"{color_class} rounded-xl shadow-md hover:shadow-xl transition-shadow duration-300 w-28 h-28 p-3 border-2 border-white",
-                id=f"card-{card_id}"
-            )
-        return Div(
-            Div(
-                H3(name.title(), cls="text-2xl font-bold text-gray-900 mb-2"),
-                Div(
-                    P(f"₹{price:.0f}", cls="text-3xl font-extrabold text-gray-900"),
-                    P(f"Qty: {quantity}", cls="text-base font-semibold text-gray-700 mt-2"),
-                    cls="text-center"
-                ),
-                cls="flex flex-col items-center justify-center h-full"
-            ),
-            cls=f"{color_class} rounded-2xl shadow-xl hover:shadow-2xl transition-all duration-300 hover:scale-105 w-44 h-44 p-5 border-4 border-white",
-            id=f"card-{card_id}"
-        )
-    
-    def render_all_cards(self, session_id: str, small: bool = False):
-        """Render all cards for a session."""
-        self.initialize_session(session_id)
-        
-        if not self.cards_storage[session_id]:
-            return Div(id="cards-container", cls="flex flex-wrap gap-4")
-        
-        cards = [
-            self.create_card_element(data['name'], data['color'], data['quantity'], card_id, data.get('price', 0.0), small)
-            for card_id, data in self.cards_storage[session_id].items()
-        ]
-        return Div(*cards, id="cards-container", cls="flex flex-wrap gap-2" if small else "flex flex-wrap gap-4")
-    
-    def render_cart(self, session_id: str):
-        """Render cart items with total price."""
-        self.initialize_session(session_id)
-        
-        if not self.cart_storage[session_id]:
-            return Div(id="cart-container", cls="flex flex-wrap gap-3")
-        
-        cards = [
-            self.create_card_element(
-                data['name'], 
-                data['color'], 
-                data['quantity'], 
-                card_id, 
-                data.get('price', 0.0) * data['quantity']  # Total price
-            )
-            for card_id, data in self.cart_storage[session_id].items()
-        ]
-        return Div(*cards, id="cart-container", cls="flex flex-wrap gap-3")
-
-card_manager = CardManager()
+            cards_updated = True
+    return cards_updated, error_message
 
 @routes("/")
 def index():
@@ -232,7 +131,7 @@ def index():
                         P("Items ready for checkout", cls="text-sm text-gray-600"),
                         cls="mb-4"
                     ),
-                    Div(id="cart-container", cls="flex flex-wrap gap-4 min-h-[100px]"),
+                    card_manager.render_cart(session_id),
                     cls="bg-white rounded-2xl shadow-lg p-6 border border-gray-100"
                 ),
                 cls="flex-1 overflow-y-auto px-4"
@@ -270,74 +169,128 @@ def index():
 
 @routes('/send')
 async def post(msg: str, session_id: str = "default"):
-    if session_id not in message_histories:
-        message_histories[session_id] = []
-    
-    card_manager.initialize_session(session_id)
-    response = await agent.run(msg, message_history=message_histories[session_id])
-    new_messages = response.new_messages()
-    message_histories[session_id] = response.all_messages()
-    
-    # Process card operations (always render to show updated inventory)
-    cards_updated = False
-    error_message = None
-    for message in new_messages:
-        if hasattr(message, 'parts'):
-            for part in message.parts:
-                if hasattr(part, 'tool_name') and hasattr(part, 'args'):
-                    
-                    if part.tool_name == 'add_card':
-                        result = card_manager.add_card(
-                            session_id,
-                            part.args.get('name', ''),
-                            part.args.get('color', ''),
-                            part.args.get('quantity', 1)
-                        )
-                        if result:  # Error message returned
-                            error_message = result
-                        else:
-                            cards_updated = True
-                    
-                    elif part.tool_name == 'remove_card':
-                        card_manager.remove_card(
-                            session_id,
-                            part.args.get('name', ''),
-                            part.args.get('quantity', 1),
-                            part.args.get('remove_all', False)
-                        )
-                        cards_updated = True
-                    
-                    elif part.tool_name == 'update_card':
-                        card_manager.update_card(
-                            session_id,
-                            part.args.get('name', ''),
-                            part.args.get('new_color'),
-                            part.args.get('new_quantity')
-                        )
-                        cards_updated = True
-    
-    inventory_html = card_manager.render_all_cards(session_id, small=True) if cards_updated else ""
-    cart_html = card_manager.render_cart(session_id) if cards_updated else ""
+    # One request per session at a time, so concurrent messages cannot interleave cart updates
+    async with sessions.session(session_id):
+        return await respond(msg, session_id)
+
+async def respond(msg: str, session_id: str):
+    """Chat bubbles (and any inventory/cart swaps) for one message; the caller holds the session lock."""
+    started = time.perf_counter()
+    # Backend calls may wait on another worker's SQLite write lock, so they run off the event loop
+    history, version = await asyncio.to_thread(backend.load_history, session_id)
     
-    # Prepare response output
-    bot_response = error_message if error_message else response.output
-    response_color = "bg-red-50 border-l-4 border-red-500 text-red-800" if error_message else "bg-white border-l-4 border-blue-500 text-gray-800"
+    await asyncio.to_thread(card_manager.initialize_session, session_id)
     
-    chat_bubbles = Div(
-        Div(
-            Div(msg, cls="bg-gradient-to-r from-blue-600 to-blue-500 text-white px-6 py-3 rounded-2xl rounded-tr-sm shadow-lg max-w-xl"),
-            cls="flex justify-end mb-3"
-        ),
-        Div(
-            Div(bot_response, cls=f"{response_color} px-6 py-3 rounded-2xl rounded-tl-sm shadow-md max-w-xl"),
-            cls="flex justify-start"
-        )
+    # Fast path: commands like "Add 2 bananas" or "remove all apples" need no model round-trip
+    inventory, cart = await asyncio.to_thread(
+        lambda: (card_manager.inventory(session_id), card_manager.cart(session_id))
     )
+    operations = intent_parser.parse(msg, inventory, card_manager.color_map, cart)
+    if operations is not None:
+        cards_updated, error_message = await asyncio.to_thread(apply_operations, session_id, operations)
+        output = describe(operations)
+        # Keep the exchange in the history so later messages to the agent have the context
+        await asyncio.to_thread(state_backend.append_history, backend, session_id, history, version, [
+            ModelRequest(parts=[UserPromptPart(content=msg)]),
+            ModelResponse(parts=[TextPart(content=output)]),
+        ])
+    elif STREAMING:
+        # The reply streams in over /stream/{token} once the browser opens it
+        token = uuid4().hex
+        await asyncio.to_thread(backend.put_pending, token, session_id, msg, PENDING_TTL)
+        return Div(user_bubble(msg), streaming_bubble(token))
+    else:
+        # The tools change the session's cards directly and show the model the real outcome
+        deps = ShopDeps(card_manager, session_id)
+        response = await agent.run(msg, message_history=history, deps=deps)
+        await asyncio.to_thread(
+            state_backend.append_history, backend, session_id, history, version, response.new_messages()
+        )
+        output = response.output
+        cards_updated, error_message = deps.cards_updated, deps.error_message
+        latencies['blocking_reply'].append(time.perf_counter() - started)
     
-    if inventory_html and cart_html:
-        inventory_html.attrs['hx-swap-oob'] = 'outerHTML'
-        cart_html.attrs['hx-swap-oob'] = 'outerHTML'
-        return Div(chat_bubbles, inventory_html, cart_html)
+    # The agent has already seen any error and explains it; the fast path shows it as is
+    bot_response = error_message if error_message and operations is not None else output
+    chat_bubbles = Div(user_bubble(msg), bot_bubble(bot_response, error=bool(error_message)))
+    if cards_updated:
+        return Div(chat_bubbles, *await asyncio.to_thread(card_manager.render_changes, session_id))
     return chat_bubbles
 
+def user_bubble(msg: str):
+    return Div(Div(msg, cls=USER_STYLE), cls="flex justify-end mb-3")
+
+def bot_bubble(content, error: bool = False):
+    return Div(Div(content, cls=f"{ERROR_COLOR if error else REPLY_COLOR} {BOT_STYLE}"), cls="flex justify-start")
+
+def streaming_bubble(token: str):
+    """Bot bubble that fills from /stream/{token}: "text" updates the bubble, "cards" carries
+    inventory/cart swaps, and "done" replaces the whole thing with the final bubble."""
+    return Div(
+        Div(Span("…", cls="animate-pulse"), sse_swap="text", hx_swap="innerHTML", cls=f"{REPLY_COLOR} {BOT_STYLE}"),
+        Div(sse_swap="cards", hx_swap="innerHTML", cls="hidden"),
+        hx_ext="sse", sse_connect=f"/stream/{token}", sse_swap="done", hx_swap="outerHTML", sse_close="done",
+        cls="flex justify-start"
+    )
+
+@routes('/stream/{token}')
+def get(token: str):
+    message = backend.take_pending(token)
+    if message is None:
+        # Already streamed (e.g. the browser reconnecting) or expired
+        return EventStream(iter([sse_message(bot_bubble("This reply is no longer available.", error=True), 'done')]))
+    return EventStream(stream_reply(*message))
+
+async def stream_reply(msg: str, session_id: str, received: float):
+    """Server-sent events for one agent run: reply text as it arrives, cards after each tool call."""
+    async with sessions.session(session_id):
+        deps = ShopDeps(card_manager, session_id)
+        text, first_text = "", True
+        try:
+            history, version = await asyncio.to_thread(backend.load_history, session_id)
+            async with agent.iter(msg, message_history=history, deps=deps) as run:
+                async for node in run:
+                    if Agent.is_model_request_node(node):
+                        async with node.stream(run.ctx) as events:
+                            async for event in events:
+                                if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                                    text = event.part.content  # a later answer replaces any text before tool calls
+                                elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                                    text += event.delta.content_delta
+                                else:
+                                    continue
+                                if text:
+                                    if first_text:
+                                        latencies['streamed_first_text'].append(time.time() - received)
+                                        first_text = False
+                                    yield sse_message(Span(text), 'text')
+                    elif Agent.is_call_tools_node(node):
+                        async with node.stream(run.ctx) as events:
+                            async for event in events:
+                                if isinstance(event, FunctionToolResultEvent) and deps.cards_updated:
+                                    deps.cards_updated = False
+                                    changes = await asyncio.to_thread(card_manager.render_changes, session_id)
+                                    yield sse_message(Div(*changes), 'cards')
+            await asyncio.to_thread(
+                state_backend.append_history, backend, session_id, history, version, run.result.new_messages()
+            )
+            output = run.result.output
+        except Exception as e:
+            deps.error_message = output = f"Sorry, something went wrong: {e}"
+        latencies['streamed_reply'].append(time.time() - received)
+        yield sse_message(bot_bubble(output, error=bool(deps.error_message)), 'done')
+
+@routes('/stats')
+def get():
+    """Share of messages handled by the local intent parser, live session memory use, and reply latency."""
+    return {**intent_parser.stats, 'local_share': round(intent_parser.local_share(), 3), 'sessions': sessions.snapshot(),
+            'backend': backend.stats(), 'latency_ms': {name: latency_summary(values) for name, values in latencies.items()}}
+
+def latency_summary(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    return {'count': len(ordered), 'p50': round(ordered[len(ordered) // 2] * 1000, 1),
+            'p95': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 1)}
+
 serve(port=1234)
\ No newline at end of file